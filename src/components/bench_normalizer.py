@@ -0,0 +1,90 @@
+import re
+import os
+import sys
+import time
+import argparse
+from reader import Reader
+from text_normalizer import normalize_page, strip_unsafe
+
+
+# The cleaners as they were before text_normalizer, kept here as the reference for
+# equivalence checks and as the baseline for timings.
+def legacy_preprocessor_clean(text):
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+    text = re.sub(r'[^\w\s\.\'"]', ' ', text)
+    return text
+
+
+def legacy_milvus_clean(text):
+    # pipeline_milvus ran Preprocessor.clean_text and then text_splitting cleaned again.
+    return legacy_preprocessor_clean(legacy_preprocessor_clean(text))
+
+
+def legacy_faiss_clean(text):
+    # ingest_pdf_data cleaned every page and process_text_data cleaned the result again.
+    for _ in range(2):
+        text = text.encode('utf-8', 'replace').decode('utf-8')
+        text = ''.join(c for c in text if ord(c) <= 0xFFFF)
+        text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
+    return text
+
+
+def load_corpus(path):
+    """
+    Extracts every page of every PDF in a directory.
+
+    Args:
+    - path (str): Directory containing the pdf files.
+
+    Returns:
+    - list: Page texts.
+    """
+    pages = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(".pdf"):
+            pages.extend(text for _, text in Reader(os.path.join(path, name)).iter_pages())
+    return pages
+
+
+def timed(fn, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in pages:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the text normalization engine.")
+    parser.add_argument("path", help="Directory of sample PDFs.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported).")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.path)
+    if not pages:
+        print(f"No PDF pages found in {args.path}")
+        return 1
+    chars = sum(len(p) for p in pages)
+    print(f"Corpus: {len(pages)} pages, {chars / 1e6:.2f}M characters")
+
+    failures = 0
+    for name, legacy, new in (
+        ("milvus", legacy_milvus_clean, normalize_page),
+        ("faiss", legacy_faiss_clean, strip_unsafe),
+    ):
+        mismatches = sum(1 for text in pages if legacy(text) != new(text))
+        failures += mismatches
+        old_time = timed(legacy, pages, args.repeat)
+        new_time = timed(new, pages, args.repeat)
+        print(
+            f"{name:>6}: legacy {len(pages) / old_time:10.1f} pages/s | new {len(pages) / new_time:10.1f} pages/s "
+            f"| speedup {old_time / new_time:5.2f}x | mismatching pages: {mismatches}"
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import time
+from pymilvus import BulkInsertState, Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+from index_version import bump_version
+from milvus_config import connection_args, load_index_config
+from writer import PARTITION_KEY_FIELD, SCALAR_INDEXES
+import metrics
+
+DEFAULT_BATCH_SIZE = 5000
+# Field names of collections created through langchain's Milvus, so the app reads both alike.
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+PRIMARY_FIELD = "pk"
+MAX_VARCHAR = 65_535
+IMPORT_POLL_SECONDS = 2
+
+
+def collection_schema(dim):
+    """
+    Schema of a chunk collection: the same fields `Writer` creates, with `pdf` as partition key.
+
+    Args:
+    - dim (int): Embedding dimension.
+
+    Returns:
+    - CollectionSchema: The schema.
+    """
+    return CollectionSchema(
+        [
+            FieldSchema("page", DataType.INT64),
+            FieldSchema("pdf", DataType.VARCHAR, max_length=MAX_VARCHAR),
+            FieldSchema(TEXT_FIELD, DataType.VARCHAR, max_length=MAX_VARCHAR),
+            FieldSchema(PRIMARY_FIELD, DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(VECTOR_FIELD, DataType.FLOAT_VECTOR, dim=dim),
+        ],
+        partition_key_field=PARTITION_KEY_FIELD,
+    )
+
+
+class BulkWriter:
+    """
+    Loads precomputed embeddings into Milvus column by column, in large batches, with the
+    index built once at the end instead of while the data arrives. Meant for nightly loads;
+    `Writer` stays the path for incremental writes.
+
+    With `defer_index`, a collection that already has an index is released and its index
+    dropped when the load starts, so it cannot be searched until `close` rebuilt it.
+
+    Attributes:
+    - collection_name (str): Name of the collection.
+    - index_params (dict): Vector index parameters (the tuned ones by default).
+    - batch_size (int): Rows per insert request.
+    - defer_index (bool): Build the indexes after the load instead of during it.
+    - rows (int): Rows inserted so far.
+    """
+
+    def __init__(self, collection_name, index_params=None, batch_size=DEFAULT_BATCH_SIZE, defer_index=True):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.collection_name = collection_name
+        self.index_params = index_params or load_index_config()["index_params"]
+        self.batch_size = batch_size
+        self.defer_index = defer_index
+        self.collection = None
+        self.rows = 0
+        self.insert_seconds = 0.0
+        self.index_seconds = 0.0
+        self._start = None
+        self._pending = {"page": [], "pdf": [], TEXT_FIELD: [], VECTOR_FIELD: []}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Rebuild the index even after a failure, so the collection is searchable again.
+        self.close()
+
+    def _open(self, dim):
+        connections.connect("default", **connection_args())
+        self._start = time.perf_counter()
+        if utility.has_collection(self.collection_name):
+            self.collection = Collection(self.collection_name)
+            if self.defer_index and self.collection.has_index():
+                print(f"Dropping the indexes of '{self.collection_name}' until the load finishes")
+                self.collection.release()
+                for index in list(self.collection.indexes):
+                    self.collection.drop_index(index_name=index.index_name)
+        else:
+            self.collection = Collection(self.collection_name, collection_schema(dim))
+            if not self.defer_index:
+                self._create_indexes()
+
+    def add(self, vectors, chunk_text, page, pdf):
+        """
+        Queues rows given as columns and inserts every full batch.
+
+        Args:
+        - vectors (list): Embeddings, one per chunk.
+        - chunk_text (list): Chunk texts.
+        - page (list): Page numbers.
+        - pdf (list): PDF file names.
+        """
+        if not len(vectors) == len(chunk_text) == len(page) == len(pdf):
+            raise ValueError("vectors, chunk_text, page and pdf must have the same length.")
+        if not len(vectors):
+            return
+        if self.collection is None:
+            self._open(len(vectors[0]))
+        self._pending["page"].extend(page)
+        self._pending["pdf"].extend(pdf)
+        self._pending[TEXT_FIELD].extend(chunk_text)
+        self._pending[VECTOR_FIELD].extend(vectors)
+        while len(self._pending["page"]) >= self.batch_size:
+            self._insert(self.batch_size)
+
+    def _insert(self, count):
+        columns = {field: values[:count] for field, values in self._pending.items()}
+        for values in self._pending.values():
+            del values[:count]
+        started = time.perf_counter()
+        self.collection.insert([
+            columns[field.name] for field in self.collection.schema.fields
+            if not field.auto_id and field.name in columns
+        ])
+        seconds = time.perf_counter() - started
+        metrics.record("bulk_insert", seconds, collection=self.collection_name)
+        self.insert_seconds += seconds
+        self.rows += count
+
+    def _create_indexes(self):
+        self.collection.create_index(VECTOR_FIELD, self.index_params)
+        for field, index_type in SCALAR_INDEXES.items():
+            self.collection.create_index(field, {"index_type": index_type}, index_name=f"{field}_idx")
+
+    def close(self):
+        """
+        Inserts the remaining rows, flushes once, builds the indexes and loads the collection.
+
+        Returns:
+        - dict: "rows", "seconds", "rows_per_s", "insert_seconds" and "index_seconds".
+        """
+        if self.collection is None:
+            return self.stats()
+        if self._pending["page"]:
+            self._insert(len(self._pending["page"]))
+        self.collection.flush()
+        if not self.collection.has_index():
+            started = time.perf_counter()
+            self._create_indexes()
+            utility.wait_for_index_building_complete(self.collection_name)
+            self.index_seconds = time.perf_counter() - started
+            metrics.record(
+                "index_build", self.index_seconds,
+                collection=self.collection_name, index=self.index_params.get("index_type"),
+            )
+        self.collection.load()
+        bump_version(self.collection_name)
+        stats = self.stats()
+        print(
+            f"Bulk loaded {stats['rows']} rows into '{self.collection_name}' in {stats['seconds']:.2f}s "
+            f"({stats['rows_per_s']:.0f} rows/s; insert {self.insert_seconds:.2f}s, index {self.index_seconds:.2f}s)"
+        )
+        self.collection = None
+        return stats
+
+    def stats(self):
+        """Returns the counters of the load so far."""
+        seconds = time.perf_counter() - self._start if self._start is not None else 0.0
+        return {
+            "rows": self.rows,
+            "seconds": seconds,
+            "rows_per_s": self.rows / seconds if seconds else 0.0,
+            "insert_seconds": self.insert_seconds,
+            "index_seconds": self.index_seconds,
+        }
+
+
+def write_import_files(directory, vectors, chunk_text, page, pdf):
+    """
+    Writes rows as Parquet files for Milvus's bulk import, the fastest path for very large
+    loads. The files must be uploaded to the bucket of Milvus's object storage before
+    `import_files` (pymilvus' RemoteBulkWriter writes there directly).
+
+    Args:
+    - directory (str): Local output directory.
+    - vectors (list): Embeddings, one per chunk.
+    - chunk_text (list): Chunk texts.
+    - page (list): Page numbers.
+    - pdf (list): PDF file names.
+
+    Returns:
+    - list: The written files, grouped as `import_files` expects them.
+    """
+    from pymilvus.bulk_writer import BulkFileType, LocalBulkWriter
+
+    writer = LocalBulkWriter(
+        schema=collection_schema(len(vectors[0])), local_path=directory, file_type=BulkFileType.PARQUET
+    )
+    for row in zip(vectors, chunk_text, page, pdf):
+        writer.append_row({VECTOR_FIELD: list(row[0]), TEXT_FIELD: row[1], "page": row[2], "pdf": row[3]})
+    writer.commit()
+    return writer.batch_files
+
+
+def import_files(collection_name, batch_files):
+    """
+    Runs Milvus bulk import tasks on uploaded files and waits for them.
+
+    Args:
+    - collection_name (str): Name of an existing collection with the `collection_schema` fields.
+    - batch_files (list): File groups from `write_import_files`, as paths in the Milvus bucket.
+
+    Returns:
+    - int: Number of imported rows.
+
+    Raises:
+    - RuntimeError: If a task fails.
+    """
+    connections.connect("default", **connection_args())
+    start = time.perf_counter()
+    tasks = [utility.do_bulk_insert(collection_name, files=files) for files in batch_files]
+    rows = 0
+    for task in tasks:
+        while True:
+            state = utility.get_bulk_insert_state(task)
+            if state.state in (BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned):
+                raise RuntimeError(f"Bulk import task {task} failed: {state.failed_reason}")
+            if state.state == BulkInsertState.ImportCompleted:
+                rows += state.row_count
+                break
+            time.sleep(IMPORT_POLL_SECONDS)
+    bump_version(collection_name)
+    elapsed = time.perf_counter() - start
+    print(f"Imported {rows} rows into '{collection_name}' in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+    return rows
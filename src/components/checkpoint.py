@@ -0,0 +1,75 @@
+import os
+import json
+import time
+
+CHECKPOINT_DIR = "ingest_checkpoints"
+
+
+class IngestCheckpoint:
+    """
+    Records how far a streaming ingestion got through each PDF, so an interrupted run can
+    resume after the last page that was written to the database.
+
+    Checkpoints are small JSON files keyed by the file's content hash and are replaced
+    atomically, so a crash never leaves a half-written checkpoint behind.
+
+    Attributes:
+    - directory (str): Directory holding the checkpoint files.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR):
+        """
+        Initializes the checkpoint store.
+
+        Args:
+        - directory (str): Directory holding the checkpoint files.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        """
+        Returns the last page that was fully written for a document.
+
+        Args:
+        - key (str): Content hash of the document.
+
+        Returns:
+        - int: Last written page number, or 0 if there is no checkpoint.
+        """
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return int(json.load(f)["last_page"])
+        except FileNotFoundError:
+            return 0
+
+    def save(self, key, name, last_page):
+        """
+        Atomically records that every page up to `last_page` has been written.
+
+        Args:
+        - key (str): Content hash of the document.
+        - name (str): File name, kept for humans reading the checkpoint.
+        - last_page (int): Last page number that is fully in the database.
+        """
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"pdf": name, "last_page": last_page, "updated_at": time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(key))
+
+    def clear(self, key):
+        """
+        Removes the checkpoint of a document once it has been fully ingested.
+
+        Args:
+        - key (str): Content hash of the document.
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
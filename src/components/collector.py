@@ -36,8 +36,24 @@ class InfoCollector:
         # Generate embeddings and prepare metadata
         for page, chunks in page_chunks.items():
             # chunk_embeddings = embedding_model.embed_documents(chunks)
-            chunk_metadata = [{"chunk_text": chunk, "page": page,'pdf':os.path.basename(pdf_document)} for chunk in chunks]
+            chunk_metadata = self.page_metadata(page, chunks, pdf_document)
 
             self.all_metadata.extend(chunk_metadata)
 
-        return self.all_metadata
\ No newline at end of file
+        return self.all_metadata
+
+    @staticmethod
+    def page_metadata(page, chunks, pdf_document):
+        """
+        Builds the metadata dictionaries for the chunks of a single page.
+
+        Args:
+        - page (int): Page number.
+        - chunks (list): Text chunks of the page.
+        - pdf_document (str): Path to the PDF document.
+
+        Returns:
+        - list: List of metadata dictionaries, one per chunk.
+        """
+        pdf = os.path.basename(pdf_document)
+        return [{"chunk_text": chunk, "page": page, 'pdf': pdf} for chunk in chunks]
@@ -0,0 +1,311 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+CACHE_DIR = "embedding_cache"
+# Vector files are preallocated: 200k x 768 float32 vectors take about 600 MB per model.
+DEFAULT_MAX_ENTRIES = 200_000
+
+# SQLite caps the number of bound parameters per statement.
+_MAX_PARAMS = 900
+# Seconds a process waits for another one to finish its cache transaction.
+_BUSY_TIMEOUT = 60
+# Bumped when the index layout changes; older caches are discarded on open.
+_SCHEMA_VERSION = 2
+
+
+def cache_key(model_name, text):
+    """
+    Returns the cache key of a text embedded by a given model.
+
+    Args:
+    - model_name (str): Name of the embedding model.
+    - text (str): The embedded text.
+
+    Returns:
+    - bytes: SHA-256 digest of the model name and text.
+    """
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).digest()
+
+
+def _vector_file(model_name, dim):
+    digest = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+    return f"vectors-{digest}-{dim}.f32"
+
+
+def _resize(path, size):
+    if os.path.getsize(path) < size:
+        os.truncate(path, size)
+        return
+    try:
+        os.truncate(path, size)
+    except OSError:
+        # Windows refuses to shrink a file another process still has mapped; the extra
+        # slots are simply left unused.
+        pass
+
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed cache of embeddings, safe to share between processes.
+
+    Each embedding model gets its own memory-mapped float32 file, named after the model and
+    its dimension, with a fixed number of slots; a SQLite index maps hash(model name, text)
+    to a slot and tracks when it was last used. When all slots of a model are taken, its
+    least recently used entries are overwritten. A model whose dimension changes starts
+    over with a new file.
+
+    Every lookup and store runs in one `BEGIN IMMEDIATE` transaction, which also covers the
+    reads and writes of the vector files, so processes sharing the directory (Streamlit
+    workers, ingestion runs) never hand out the same slot twice or read a slot while it is
+    being overwritten. The LRU clock and the cap live in the index too.
+
+    Attributes:
+    - directory (str): Directory holding the `vectors-*.f32` files and `index.sqlite`.
+    - max_entries (int): Size cap per model, in number of vectors.
+    - hits (int): Lookups answered from the cache (by this process).
+    - misses (int): Lookups that needed the embedding model (in this process).
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Opens (and creates if needed) the cache. A different `max_entries` than the cache was
+        last opened with grows or shrinks every vector file, for all processes using it.
+
+        Args:
+        - directory (str): Directory holding the cache files.
+        - max_entries (int): Maximum number of cached vectors per model.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # space id -> (dim, capacity, memmap) of the vector files mapped by this process
+        self._maps = {}
+
+        # Transactions are opened explicitly (see `_transaction`).
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), timeout=_BUSY_TIMEOUT,
+            isolation_level=None, check_same_thread=False,
+        )
+        with self._lock, self._transaction():
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._reset_schema()
+            self._set_capacity(max_entries)
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the database write lock up front, so the whole lookup or store,
+        # vector file access included, is serialized with the other processes.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _reset_schema(self):
+        # Caches from before per-model vector files (one `vectors.f32` for every model).
+        for table in ("entries", "spaces", "meta"):
+            self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+        try:
+            os.remove(os.path.join(self.directory, "vectors.f32"))
+        except OSError:
+            pass
+        self._conn.execute(
+            "CREATE TABLE spaces (id INTEGER PRIMARY KEY, model TEXT NOT NULL UNIQUE, dim INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE entries ("
+            " key BLOB PRIMARY KEY, space INTEGER NOT NULL, slot INTEGER NOT NULL,"
+            " last_used INTEGER NOT NULL, UNIQUE (space, slot))"
+        )
+        self._conn.execute("CREATE INDEX entries_last_used ON entries (space, last_used)")
+        self._conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT INTO meta (name, value) VALUES ('clock', 0), ('max_entries', 0)")
+        self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def _meta(self, name):
+        return self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()[0]
+
+    def _set_capacity(self, max_entries):
+        if self._meta("max_entries") == max_entries:
+            return
+        self._conn.execute("UPDATE meta SET value = ? WHERE name = 'max_entries'", (max_entries,))
+        # Drops entries that no longer fit; slots are dense, so the rest stay at 0..max_entries-1.
+        self._conn.execute("DELETE FROM entries WHERE slot >= ?", (max_entries,))
+        self._maps.clear()
+        for model, dim in self._conn.execute("SELECT model, dim FROM spaces").fetchall():
+            path = os.path.join(self.directory, _vector_file(model, dim))
+            if os.path.exists(path):
+                _resize(path, max_entries * dim * 4)
+
+    def _tick(self):
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'clock'")
+        return self._meta("clock")
+
+    def _space(self, model_name, dim=None):
+        """
+        Returns (space id, memmap) of a model's vector file, or (None, None) if the model has
+        no entries. With `dim`, a missing space is created and a space of another dimension
+        is emptied and moved to a new file. Called inside a transaction.
+        """
+        row = self._conn.execute("SELECT id, dim FROM spaces WHERE model = ?", (model_name,)).fetchone()
+        if row is None:
+            if dim is None:
+                return None, None
+            space = self._conn.execute("INSERT INTO spaces (model, dim) VALUES (?, ?)", (model_name, dim)).lastrowid
+        else:
+            space, stored_dim = row
+            if dim is not None and dim != stored_dim:
+                print(f"Embedding dimension of {model_name} changed from {stored_dim} to {dim}; dropping its cache.")
+                self._conn.execute("DELETE FROM entries WHERE space = ?", (space,))
+                self._conn.execute("UPDATE spaces SET dim = ? WHERE id = ?", (dim, space))
+                self._maps.pop(space, None)
+                try:
+                    os.remove(os.path.join(self.directory, _vector_file(model_name, stored_dim)))
+                except OSError:
+                    pass
+            else:
+                dim = stored_dim
+
+        # Another process may have changed the cap since this one mapped the file.
+        capacity = self._meta("max_entries")
+        mapped = self._maps.get(space)
+        if mapped is None or mapped[:2] != (dim, capacity):
+            path = os.path.join(self.directory, _vector_file(model_name, dim))
+            open(path, "ab").close()
+            if os.path.getsize(path) < capacity * dim * 4:
+                _resize(path, capacity * dim * 4)
+            vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+            self._maps[space] = mapped = (dim, capacity, vectors)
+        return space, mapped[2]
+
+    def _slots(self, space, keys):
+        slots = {}
+        for i in range(0, len(keys), _MAX_PARAMS):
+            batch = keys[i:i + _MAX_PARAMS]
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM entries WHERE space = ? AND key IN ({','.join('?' * len(batch))})",
+                [space] + batch,
+            ).fetchall())
+        return slots
+
+    def get_many(self, model_name, texts):
+        """
+        Looks up the embeddings of several texts.
+
+        Args:
+        - model_name (str): Name of the embedding model.
+        - texts (list): Texts to look up.
+
+        Returns:
+        - list: The cached vector (list of floats) for each text, or None on a miss.
+        """
+        keys = [cache_key(model_name, text) for text in texts]
+        results = [None] * len(texts)
+        if not keys:
+            return results
+        with self._lock, self._transaction():
+            space, vectors = self._space(model_name)
+            slots = self._slots(space, list(set(keys))) if space is not None else {}
+            if slots:
+                now = self._tick()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in slots]
+                )
+            for i, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is not None:
+                    results[i] = vectors[slot].tolist()
+        hits = sum(result is not None for result in results)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_name, texts, vectors):
+        """
+        Stores embeddings, evicting the least recently used entries of the model when its
+        vector file is full.
+
+        Args:
+        - model_name (str): Name of the embedding model.
+        - texts (list): The embedded texts.
+        - vectors (list): The embeddings, one per text.
+        """
+        if not texts:
+            return
+        entries = {cache_key(model_name, text): vector for text, vector in zip(texts, vectors)}
+        dim = len(next(iter(entries.values())))
+        with self._lock, self._transaction():
+            space, stored = self._space(model_name, dim)
+            capacity = len(stored)
+            existing = self._slots(space, list(entries))
+            now = self._tick()
+            # Marks updated entries as most recent first so eviction never picks them.
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in existing]
+            )
+            new_keys = [key for key in entries if key not in existing][:capacity - len(existing)]
+            slots = self._free_slots(space, capacity, len(new_keys))
+
+            rows = []
+            for key, slot in list(zip(new_keys, slots)) + list(existing.items()):
+                stored[slot] = np.asarray(entries[key], dtype=np.float32)
+                rows.append((key, space, slot, now))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, space, slot, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            # Flushed before the commit makes the new slots visible to other processes.
+            stored.flush()
+
+    def _free_slots(self, space, capacity, count):
+        """Returns `count` slots of a space to write to, evicting least recently used entries if needed."""
+        if count == 0:
+            return []
+        # Slots are handed out in order and evicted slots are reused at once, so the
+        # occupied slots are always 0..used-1.
+        used = self._conn.execute("SELECT COUNT(*) FROM entries WHERE space = ?", (space,)).fetchone()[0]
+        fresh = list(range(used, min(used + count, capacity)))
+        evict = count - len(fresh)
+        if evict <= 0:
+            return fresh
+        victims = self._conn.execute(
+            "SELECT key, slot FROM entries WHERE space = ? ORDER BY last_used LIMIT ?", (space, evict)
+        ).fetchall()
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+        return fresh + [slot for _, slot in victims]
+
+    def stats(self):
+        """
+        Returns the hit/miss counters.
+
+        Returns:
+        - dict: hits, misses, hit_rate and the number of stored entries (of every model).
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def close(self):
+        """Flushes the vectors and closes the index."""
+        with self._lock:
+            for _, _, vectors in self._maps.values():
+                vectors.flush()
+            self._maps.clear()
+            self._conn.close()
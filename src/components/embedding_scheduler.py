@@ -0,0 +1,275 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_RETRIES = 6
+
+try:
+    from google.api_core import exceptions as google_exceptions
+
+    _RETRYABLE_TYPES = (
+        TimeoutError, ConnectionError,
+        google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+except ImportError:
+    _RETRYABLE_TYPES = (TimeoutError, ConnectionError)
+
+# HTTP statuses (the `code` of API errors) and gRPC status names of transient failures.
+_RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_GRPC_CODES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"}
+# Phrases for clients that only report a message. Numbers are not matched: a message that
+# quotes a size or an id ("max 500 tokens") is not a server error.
+_RETRYABLE_PHRASES = (
+    "rate limit", "too many requests", "resource exhausted", "timed out", "temporarily unavailable",
+    "connection reset",
+)
+
+
+def _status(error):
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc.RpcError.code() returns a StatusCode
+        try:
+            code = code()
+        except Exception:
+            return None
+    if code is None:
+        code = getattr(error, "status_code", None)
+    return getattr(code, "name", code)
+
+
+def is_retryable(error):
+    """
+    Decides whether an embedding error is transient (rate limiting, timeouts, server hiccups),
+    by exception type, then status code, then a few unambiguous phrases of the message.
+
+    Args:
+    - error (Exception): The raised exception.
+
+    Returns:
+    - bool: True if the request should be retried.
+    """
+    if isinstance(error, _RETRYABLE_TYPES):
+        return True
+    status = _status(error)
+    if status is not None:
+        return status in _RETRYABLE_STATUSES or status in _RETRYABLE_GRPC_CODES
+    text = str(error).lower()
+    return any(phrase in text for phrase in _RETRYABLE_PHRASES)
+
+
+class EmbeddingError(RuntimeError):
+    """
+    Raised when some batches still fail after all retries.
+
+    Attributes:
+    - completed (dict): Index of each text that was embedded -> its vector.
+    - failed (list): Indexes of the texts that could not be embedded.
+    """
+
+    def __init__(self, message, completed, failed):
+        super().__init__(message)
+        self.completed = completed
+        self.failed = failed
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Each request takes one token; tokens refill at `rate` per second
+    up to `capacity`, which allows short bursts without exceeding the long-run quota.
+
+    Attributes:
+    - rate (float): Tokens added per second.
+    - capacity (float): Maximum number of stored tokens.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` tokens are available and takes them."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Wraps an embedding model and controls how it is called: texts are split into batches,
+    at most `max_in_flight` batches run at once, every request passes through a token bucket,
+    and failed batches are retried with jittered exponential backoff.
+
+    With a cache attached, texts whose embedding is already stored are served from it and only
+    the misses are sent to the model; every finished batch is written to the cache at once.
+
+    It is itself an `Embeddings`, so it can be handed to langchain vector stores in place of
+    the wrapped model.
+
+    Attributes:
+    - embedding_model (Embeddings): The wrapped embedding model.
+    - batch_size (int): Number of texts per embedding request.
+    - max_in_flight (int): Maximum number of concurrent requests.
+    - bucket (TokenBucket or None): Rate limiter shared by every request of this scheduler.
+    - cache (EmbeddingCache or None): Persistent cache consulted before calling the model.
+    - model_name (str): Name used in the cache key.
+    - stats (dict): Counters for requests, retries and failures.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        requests_per_minute=None,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=1.0,
+        max_delay=60.0,
+        retryable=is_retryable,
+        sleep=time.sleep,
+        cache=None,
+        model_name=None,
+    ):
+        """
+        Initializes the scheduler.
+
+        Args:
+        - embedding_model (Embeddings): Model used to embed the texts.
+        - batch_size (int): Number of texts per embedding request.
+        - max_in_flight (int): Maximum number of concurrent requests.
+        - requests_per_minute (float, optional): Request quota. No rate limiting if None.
+        - max_retries (int): Retries per batch before giving up.
+        - base_delay (float): Initial backoff in seconds; doubles on every retry.
+        - max_delay (float): Upper bound of the backoff in seconds.
+        - retryable (callable): Decides whether an exception is transient.
+        - sleep (callable): Sleep function, replaceable for tests and benchmarks.
+        - cache (EmbeddingCache, optional): Persistent embedding cache.
+        - model_name (str, optional): Name used in the cache key. Defaults to the model's `model` attribute.
+        """
+        if batch_size < 1 or max_in_flight < 1:
+            raise ValueError("batch_size and max_in_flight must be at least 1.")
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self._sleep = sleep
+        self.bucket = (
+            TokenBucket(requests_per_minute / 60.0, capacity=max_in_flight, sleep=sleep)
+            if requests_per_minute else None
+        )
+        self.cache = cache
+        self.model_name = model_name or getattr(embedding_model, "model", None) or type(embedding_model).__name__
+        self.stats = {"requests": 0, "retries": 0, "failed_batches": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _call(self, fn, arg):
+        """Calls `fn(arg)` through the rate limiter, retrying transient errors."""
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            self._count("requests")
+            try:
+                return fn(arg)
+            except Exception as e:
+                if attempt == self.max_retries or not self.retryable(e):
+                    raise
+                self._count("retries")
+                # Full jitter: spreads retries of concurrent batches instead of synchronising them.
+                self._sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def embed_documents(self, texts, on_batch=None):
+        """
+        Embeds texts in scheduled batches.
+
+        Args:
+        - texts (list): Texts to embed.
+        - on_batch (callable, optional): Called as `on_batch(indexes, vectors)` as soon as a batch
+          is available (cache hits first, then each embedded batch from its worker thread), so
+          callers can persist finished work before later batches complete.
+
+        Returns:
+        - list: One vector per text, in input order.
+
+        Raises:
+        - EmbeddingError: If any batch still fails after retries. Batches that succeeded are
+          available on the exception (and were already passed to `on_batch` and the cache).
+        """
+        texts = list(texts)
+        vectors = [None] * len(texts)
+        if not texts:
+            return vectors
+
+        if self.cache is not None:
+            vectors = self.cache.get_many(self.model_name, texts)
+        hits = [i for i, v in enumerate(vectors) if v is not None]
+        misses = [i for i, v in enumerate(vectors) if v is None]
+        if on_batch is not None:
+            for start in range(0, len(hits), self.batch_size):
+                indexes = hits[start:start + self.batch_size]
+                on_batch(indexes, [vectors[i] for i in indexes])
+
+        def run(indexes):
+            batch = [texts[i] for i in indexes]
+            result = self._call(self.embedding_model.embed_documents, batch)
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, batch, result)
+            if on_batch is not None:
+                on_batch(indexes, result)
+            return result
+
+        failed = []
+        errors = []
+        batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+                futures = {pool.submit(run, indexes): indexes for indexes in batches}
+                for future in as_completed(futures):
+                    indexes = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._count("failed_batches")
+                        failed.extend(indexes)
+                        errors.append(e)
+                        continue
+                    for i, vector in zip(indexes, result):
+                        vectors[i] = vector
+
+        if failed:
+            completed = {i: v for i, v in enumerate(vectors) if v is not None}
+            raise EmbeddingError(
+                f"{len(failed)} of {len(texts)} texts could not be embedded: {errors[0]}",
+                completed,
+                sorted(failed),
+            )
+        return vectors
+
+    def embed_query(self, text):
+        """Embeds a single query through the rate limiter and retry policy."""
+        return self._call(self.embedding_model.embed_query, text)
@@ -0,0 +1,216 @@
+import math
+import time
+import random
+import hashlib
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeRateLimitError(RuntimeError):
+    """Mimics the error raised by the Gemini API when the quota is exhausted."""
+
+    code = 429
+
+    def __init__(self):
+        super().__init__("429 Resource has been exhausted (e.g. check quota).")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    A local, deterministic stand-in for the embedding model, for offline runs and benchmarks.
+    The same text always maps to the same unit vector. Latency and failures can be injected.
+
+    Attributes:
+    - dim (int): Size of the returned vectors.
+    - model (str): Model name, used in embedding cache keys.
+    - latency (float): Seconds slept per request.
+    - error_rate (float): Probability that a request fails with `error`.
+    - calls (int): Number of requests made so far.
+    - texts_embedded (int): Number of texts embedded so far.
+    """
+
+    def __init__(self, dim=768, latency=0.0, error_rate=0.0, error=FakeRateLimitError, seed=0):
+        """
+        Initializes the fake model.
+
+        Args:
+        - dim (int): Size of the returned vectors.
+        - latency (float): Seconds slept per request.
+        - error_rate (float): Probability (0-1) that a request fails.
+        - error (callable): Builds the exception raised on an injected failure.
+        - seed (int): Seed for the failure injection.
+        """
+        self.dim = dim
+        self.model = f"fake-{dim}"
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error = error
+        self.calls = 0
+        self.texts_embedded = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _request(self, n_texts):
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise self.error()
+        with self._lock:
+            self.texts_embedded += n_texts
+
+    def _vector(self, text):
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dim)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        self._request(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._request(1)
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A local stand-in for the chat model that streams a canned answer word by word, for
+    offline runs and for measuring the streaming path. Delays are configurable.
+
+    Attributes:
+    - response (str): Answer returned for every prompt.
+    - first_token_delay (float): Seconds before the first token (models prompt processing).
+    - token_delay (float): Seconds between tokens.
+    - calls (int): Number of requests made so far.
+    """
+
+    response: str = "This is a fake answer generated locally for testing the streaming path."
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _tokens(self):
+        self.calls += 1
+        time.sleep(self.first_token_delay)
+        words = self.response.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = "".join(self._tokens())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class FakeCollection:
+    """
+    Column store behind FakeMilvus, standing in for a pymilvus Collection.
+
+    Attributes:
+    - fields (list): Field names in schema order.
+    - columns (dict): Field name -> list of values.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.columns = {field: [] for field in fields}
+        self._matrix = None
+
+    @property
+    def num_entities(self):
+        return len(self.columns["vector"])
+
+    def insert(self, data):
+        names = [field for field in self.fields if field != "pk"]
+        start = self.num_entities
+        for name, values in zip(names, data):
+            self.columns[name].extend(values)
+        self.columns["pk"].extend(range(start, self.num_entities))
+        self._matrix = None
+
+    def has_index(self, **kwargs):
+        return True
+
+    def matrix(self):
+        """Unit-normalized vectors for cosine search, rebuilt after inserts."""
+        if self._matrix is None:
+            matrix = np.asarray(self.columns["vector"], dtype=np.float32)
+            self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return self._matrix
+
+
+class FakeMilvus:
+    """
+    An in-process stand-in for langchain's Milvus vector store, covering what `Writer` and
+    `Retriever` use (lazy collection creation, column inserts, similarity search), for offline
+    benchmarks without a Milvus server. Collections live in the process, shared by name, and
+    are searched exactly (brute-force cosine). Filter expressions are not supported.
+    """
+
+    _collections = {}
+
+    def __init__(self, embedding_function=None, collection_name="LangChainCollection", search_params=None, **kwargs):
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.search_params = search_params
+        self._text_field = "text"
+        self._vector_field = "vector"
+        self._primary_field = "pk"
+        self.col = self._collections.get(collection_name)
+        self.fields = list(self.col.fields) if self.col is not None else []
+
+    @classmethod
+    def reset(cls):
+        """Drops every collection."""
+        cls._collections.clear()
+
+    def _init(self, embeddings=None, metadatas=None, **kwargs):
+        self.fields = list(metadatas[0]) + [self._text_field, self._primary_field, self._vector_field]
+        self.col = FakeCollection(self.fields)
+        self._collections[self.collection_name] = self.col
+
+    def similarity_search(self, query, k=4, expr=None, **kwargs):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k, expr)
+
+    def similarity_search_by_vector(self, embedding, k=4, expr=None, **kwargs):
+        if expr:
+            raise NotImplementedError("FakeMilvus does not support filter expressions.")
+        if self.col is None or not self.col.num_entities:
+            return []
+        vector = np.asarray(embedding, dtype=np.float32)
+        scores = self.col.matrix() @ (vector / max(np.linalg.norm(vector), 1e-12))
+        top = np.argsort(-scores)[:k]
+        metadata_fields = [f for f in self.fields if f not in (self._text_field, self._vector_field)]
+        return [
+            Document(
+                page_content=self.col.columns[self._text_field][i],
+                metadata={field: self.col.columns[field][i] for field in metadata_fields},
+            )
+            for i in top
+        ]
+
+    def delete_collection(self):
+        self._collections.pop(self.collection_name, None)
+        self.col = None
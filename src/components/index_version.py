@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+
+# Shared by the ingestion CLI (run from src/components) and the app (run from src), so the
+# default location is fixed relative to this file rather than the working directory.
+VERSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "index_versions")
+# Seconds a process waits for another one to finish its bump.
+_BUSY_TIMEOUT = 30
+
+# One connection per thread and directory: versions are read on every answer cache lookup.
+_local = threading.local()
+
+
+def version_dir():
+    """Returns the directory holding the counters: INDEX_VERSION_DIR, or VERSION_DIR."""
+    return os.getenv("INDEX_VERSION_DIR", VERSION_DIR)
+
+
+def _connect(directory, create=True):
+    connections = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(directory)
+    if conn is None:
+        path = os.path.join(directory, "versions.sqlite")
+        if not create and not os.path.exists(path):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=_BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        connections[directory] = conn
+    return conn
+
+
+def current_version(name, directory=None):
+    """
+    Returns the version counter of a collection or index. Caches built from its contents
+    must be dropped when the version changes.
+
+    Args:
+    - name (str): Collection name, or any other key (e.g. "faiss:<index dir>").
+    - directory (str, optional): Directory holding the counters. Defaults to `version_dir()`.
+
+    Returns:
+    - int: The version (0 if it was never bumped).
+    """
+    # Nothing was ever bumped without the database, which reads do not create.
+    conn = _connect(directory or version_dir(), create=False)
+    if conn is None:
+        return 0
+    row = conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_version(name, directory=None):
+    """
+    Increments the version counter of a collection or index after its contents changed.
+    The increment is one SQLite write transaction, so concurrent writers (threads or
+    processes) never lose a bump.
+
+    Args:
+    - name (str): Collection name, or any other key.
+    - directory (str, optional): Directory holding the counters. Defaults to `version_dir()`.
+
+    Returns:
+    - int: The new version.
+    """
+    conn = _connect(directory or version_dir())
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO versions (name, version) VALUES (?, 1)"
+            " ON CONFLICT (name) DO UPDATE SET version = version + 1",
+            (name,),
+        )
+        version = conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()[0]
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return version
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency histogram buckets in seconds (Prometheus "le" bounds), from cache hits to slow LLM calls.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_NAME = "rag_stage_seconds"
+# Each finished trace is appended here as a JSON line when set.
+TRACE_FILE = os.getenv("METRICS_TRACE_FILE")
+# The histograms are rewritten here in the Prometheus text format after each trace when set.
+METRICS_FILE = os.getenv("METRICS_FILE")
+
+_current = contextvars.ContextVar("current_trace", default=None)
+
+
+def size_bucket(n):
+    """
+    Rounds a collection size down to a power of ten, so it can be a label without creating
+    a new time series for every insert.
+
+    Args:
+    - n (int): Number of vectors.
+
+    Returns:
+    - str: "0", "1", "10", "100", ...
+    """
+    if not n or n < 1:
+        return "0"
+    return str(10 ** (len(str(int(n))) - 1))
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+class MetricsRegistry:
+    """
+    Process-wide latency histograms, one per (stage, labels) pair.
+
+    Attributes:
+    - buckets (tuple): Upper bounds of the histogram buckets in seconds.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}  # (stage, label key) -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, **labels):
+        """
+        Records one duration.
+
+        Args:
+        - stage (str): Stage name (e.g. "embed", "search", "generate").
+        - seconds (float): Duration.
+        - labels: Extra labels (e.g. path, k, nprobe, size); None values are left out.
+        """
+        key = (stage, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def snapshot(self):
+        """
+        Returns the histograms as plain data.
+
+        Returns:
+        - list: {"stage", "labels", "buckets", "sum", "count"} dicts, where "buckets" holds
+          cumulative counts per bound.
+        """
+        with self._lock:
+            return [
+                {"stage": stage, "labels": dict(labels), "buckets": list(counts), "sum": total, "count": count}
+                for (stage, labels), (counts, total, count) in sorted(self._histograms.items())
+            ]
+
+    def prometheus_text(self):
+        """Renders the histograms in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_NAME} Latency of RAG pipeline stages.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for row in self.snapshot():
+            labels = [("stage", row["stage"])] + sorted(row["labels"].items())
+
+            def render(extra=()):
+                pairs = labels + list(extra)
+                return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+            for bound, count in zip(self.buckets, row["buckets"]):
+                lines.append(f"{METRIC_NAME}_bucket{render([('le', repr(bound))])} {count}")
+            lines.append(f"{METRIC_NAME}_bucket{render([('le', '+Inf')])} {row['count']}")
+            lines.append(f"{METRIC_NAME}_sum{render()} {row['sum']:.6f}")
+            lines.append(f"{METRIC_NAME}_count{render()} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path):
+        """
+        Writes the Prometheus text to a file atomically (for node_exporter's textfile collector
+        or any local reader).
+
+        Args:
+        - path (str): Output file.
+        """
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        """Forgets every observation."""
+        with self._lock:
+            self._histograms.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Trace:
+    """
+    The spans of one request (a query or an ingested document), in the order they finished.
+
+    Attributes:
+    - name (str): Kind of request ("query", "ingest", ...).
+    - labels (dict): Labels of the request (e.g. the path: "milvus" or "faiss").
+    - spans (list): {"stage", "seconds", "labels"} dicts.
+    - started (float): Epoch seconds when the trace started.
+    """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.spans = []
+        self.started = time.time()
+        self.deferred = False
+        self._lock = threading.Lock()
+
+    def defer(self):
+        """
+        Keeps the trace open after its block ends, for work that finishes later (a streamed
+        answer); call `finish` when it is done.
+        """
+        self.deferred = True
+        return self
+
+    def add(self, stage, seconds, **labels):
+        """Adds a finished span (also used for stages that end after the trace, like streams)."""
+        with self._lock:
+            self.spans.append({"stage": stage, "seconds": seconds, "labels": labels})
+
+    @property
+    def total(self):
+        """Sum of the span durations."""
+        return sum(span["seconds"] for span in self.spans)
+
+    def to_dict(self):
+        return {"name": self.name, "labels": self.labels, "started": self.started, "spans": list(self.spans)}
+
+
+registry = MetricsRegistry()
+_last_traces = {}
+_last_lock = threading.Lock()
+
+
+@contextmanager
+def trace(name, **labels):
+    """
+    Starts a trace that the spans inside the block (in this thread or context) attach to,
+    and `finish`es it when the block ends unless it was deferred.
+
+    Args:
+    - name (str): Kind of request ("query", "ingest", ...).
+    - labels: Labels of the request.
+
+    Yields:
+    - Trace: The trace.
+    """
+    current = Trace(name, **labels)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        if not current.deferred:
+            finish(current)
+
+
+def finish(current):
+    """
+    Publishes a finished trace: it becomes the last trace of its name, is appended to
+    TRACE_FILE and the histograms are written to METRICS_FILE, when these are set.
+
+    Args:
+    - current (Trace): The trace.
+    """
+    with _last_lock:
+        _last_traces[current.name] = current
+    if TRACE_FILE:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(current.to_dict(), default=str) + "\n")
+    if METRICS_FILE:
+        registry.write_file(METRICS_FILE)
+
+
+@contextmanager
+def span(stage, **labels):
+    """
+    Times a stage: the duration goes to the latency histogram (with the labels of the
+    current trace plus `labels`) and to the current trace, if any.
+
+    Args:
+    - stage (str): Stage name.
+    - labels: Labels such as k, nprobe or size; they can also be set on the yielded dict
+      inside the block, when they are only known there.
+
+    Yields:
+    - dict: The span's labels.
+    """
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        record(stage, time.perf_counter() - start, **labels)
+
+
+def record(stage, seconds, current=None, **labels):
+    """
+    Records a duration measured elsewhere.
+
+    Args:
+    - stage (str): Stage name.
+    - seconds (float): Duration.
+    - current (Trace, optional): Trace to add the span to. Defaults to the current trace.
+    - labels: Labels of the span.
+    """
+    current = current or _current.get()
+    if current is not None:
+        current.add(stage, seconds, **labels)
+        labels = {**current.labels, **labels}
+    registry.observe(stage, seconds, **labels)
+
+
+def current_trace():
+    """Returns the trace of the running request, or None."""
+    return _current.get()
+
+
+def last_trace(name):
+    """Returns the last finished trace of a kind ("query", "ingest", ...), or None."""
+    with _last_lock:
+        return _last_traces.get(name)
+
+
+def serve(port, host="0.0.0.0"):
+    """
+    Serves the histograms on http://host:port/metrics for a Prometheus scraper, from a daemon
+    thread.
+
+    Args:
+    - port (int): Port to listen on.
+    - host (str): Interface to bind.
+
+    Returns:
+    - ThreadingHTTPServer: The running server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,72 @@
+import os
+import json
+import uuid
+
+# Shared by the ingestion CLI (run from src/components) and the app (run from src), like
+# the index version counters.
+INDEX_CONFIG_PATH = os.getenv(
+    "MILVUS_INDEX_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "milvus_index.json")
+)
+
+DEFAULT_INDEX_PARAMS = {
+    "index_type": "IVF_FLAT",
+    "metric_type": "COSINE",
+    "params": {"nlist": 128},
+}
+DEFAULT_SEARCH_PARAMS = {"metric_type": "COSINE", "params": {"nprobe": 20}}
+
+
+def connection_args():
+    """
+    Returns the Milvus connection arguments for langchain's Milvus and `connections.connect`.
+    MILVUS_URI (a server URI, or a local file path for Milvus Lite) takes precedence over
+    MILVUS_HOST/MILVUS_PORT.
+
+    Returns:
+    - dict: {"uri": ...} or {"host": ..., "port": ...}.
+    """
+    uri = os.getenv("MILVUS_URI")
+    if uri:
+        return {"uri": uri}
+    return {"host": os.getenv("MILVUS_HOST", "localhost"), "port": os.getenv("MILVUS_PORT", "19530")}
+
+
+def load_index_config(path=INDEX_CONFIG_PATH):
+    """
+    Reads the index and search parameters chosen by `milvus_tuner`.
+
+    Args:
+    - path (str): Path of the config file.
+
+    Returns:
+    - dict: {"index_params", "search_params"}, the defaults for anything not tuned yet.
+    """
+    config = {"index_params": DEFAULT_INDEX_PARAMS, "search_params": DEFAULT_SEARCH_PARAMS}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return config
+    except ValueError as e:
+        print(f"Ignoring unreadable Milvus index config {path}: {e}")
+        return config
+    config.update({key: saved[key] for key in config if key in saved})
+    return config
+
+
+def save_index_config(index_params, search_params, report=None, path=INDEX_CONFIG_PATH):
+    """
+    Writes the index and search parameters used by `Writer` and `Retriever` (atomically).
+
+    Args:
+    - index_params (dict): Milvus index parameters for new collections.
+    - search_params (dict): Milvus search parameters.
+    - report (dict, optional): Measurements behind the choice, stored for reference.
+    - path (str): Path of the config file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"index_params": index_params, "search_params": search_params, "report": report}, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,391 @@
+import sys
+import math
+import time
+import argparse
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+from milvus_config import INDEX_CONFIG_PATH, connection_args, load_index_config, save_index_config
+
+SOURCE_COLLECTION = "pdf_embeddings1"
+BENCH_SUFFIX = "_tune"
+METRIC_TYPE = "COSINE"
+INDEX_TYPES = ("HNSW", "IVF_FLAT", "IVF_SQ8", "IVF_PQ")
+TARGET_RECALL = 0.95
+INSERT_BATCH = 10000
+
+HNSW_M = (16, 32)
+HNSW_EF_CONSTRUCTION = (128, 256)
+HNSW_EF = (32, 64, 128, 256)
+NPROBE = (8, 16, 32, 64, 128)
+# IVF training wants a few dozen points per centroid.
+MIN_POINTS_PER_LIST = 39
+
+
+def vector_field(collection):
+    """Returns the name of a collection's float vector field."""
+    for field in collection.schema.fields:
+        if field.dtype == DataType.FLOAT_VECTOR:
+            return field.name
+    raise ValueError(f"Collection '{collection.name}' has no float vector field.")
+
+
+def sample_vectors(collection_name, limit):
+    """
+    Reads up to `limit` stored embeddings from a collection.
+
+    Args:
+    - collection_name (str): Name of the collection.
+    - limit (int): Maximum number of vectors.
+
+    Returns:
+    - np.ndarray: (n, dim) float32 vectors.
+    """
+    collection = Collection(collection_name)
+    field = vector_field(collection)
+    iterator = collection.query_iterator(batch_size=1000, limit=limit, output_fields=[field])
+    vectors = []
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+        vectors.extend(row[field] for row in rows)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(n, dim, seed=0):
+    """Clustered random unit vectors, a rough stand-in for text embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def ground_truth(base, queries, k):
+    """
+    Exact top-k neighbours by cosine similarity (brute force).
+
+    Args:
+    - base (np.ndarray): (n, dim) indexed vectors; row i has primary key i.
+    - queries (np.ndarray): (q, dim) query vectors.
+    - k (int): Neighbours per query.
+
+    Returns:
+    - list: One set of primary keys per query.
+    """
+    base = base / np.linalg.norm(base, axis=1, keepdims=True)
+    truth = []
+    for start in range(0, len(queries), 256):
+        block = queries[start:start + 256]
+        scores = (block / np.linalg.norm(block, axis=1, keepdims=True)) @ base.T
+        top = np.argpartition(-scores, min(k, base.shape[0] - 1), axis=1)[:, :k]
+        truth.extend(set(row.tolist()) for row in top)
+    return truth
+
+
+def candidate_indexes(n, dim, index_types=INDEX_TYPES):
+    """
+    Index configurations to try for `n` vectors of dimension `dim`.
+
+    Args:
+    - n (int): Number of vectors.
+    - dim (int): Vector dimension.
+    - index_types (tuple): Milvus index types to include.
+
+    Returns:
+    - list: Milvus index parameter dicts.
+    """
+    max_nlist = max(16, n // MIN_POINTS_PER_LIST)
+    nlists = sorted({min(max_nlist, max(16, int(f * math.sqrt(n)))) for f in (1, 4, 16)})
+    pq_ms = [m for m in (dim // 4, dim // 8) if m and dim % m == 0]
+    candidates = []
+    for index_type in index_types:
+        if index_type == "HNSW":
+            grid = [{"M": m, "efConstruction": ef} for m in HNSW_M for ef in HNSW_EF_CONSTRUCTION]
+        elif index_type == "IVF_PQ":
+            grid = [{"nlist": nlist, "m": m, "nbits": 8} for nlist in nlists for m in pq_ms]
+        else:
+            grid = [{"nlist": nlist} for nlist in nlists]
+        candidates.extend({"index_type": index_type, "metric_type": METRIC_TYPE, "params": p} for p in grid)
+    return candidates
+
+
+def search_grid(index_params, k):
+    """Search parameters to sweep for an index (HNSW needs ef >= k, IVF needs nprobe <= nlist)."""
+    if index_params["index_type"] == "HNSW":
+        return [{"metric_type": METRIC_TYPE, "params": {"ef": ef}} for ef in sorted({k, *HNSW_EF}) if ef >= k]
+    nlist = index_params["params"]["nlist"]
+    return [{"metric_type": METRIC_TYPE, "params": {"nprobe": nprobe}} for nprobe in NPROBE if nprobe <= nlist]
+
+
+def estimate_index_bytes(index_params, n, dim):
+    """
+    Estimates the memory of an index when Milvus does not report it.
+
+    Args:
+    - index_params (dict): Milvus index parameters.
+    - n (int): Number of vectors.
+    - dim (int): Vector dimension.
+
+    Returns:
+    - int: Estimated bytes.
+    """
+    index_type, params = index_params["index_type"], index_params["params"]
+    if index_type == "HNSW":
+        return n * (4 * dim + 8 * params["M"])
+    centroids = 4 * dim * params["nlist"]
+    if index_type == "IVF_SQ8":
+        return n * (dim + 8) + centroids
+    if index_type == "IVF_PQ":
+        return n * (params["m"] * params["nbits"] // 8 + 8) + centroids + 4 * dim * 256
+    return n * (4 * dim + 8) + centroids
+
+
+def create_bench_collection(name, vectors):
+    """
+    (Re)creates a scratch collection holding `vectors` with primary keys 0..n-1.
+
+    Args:
+    - name (str): Name of the scratch collection.
+    - vectors (np.ndarray): (n, dim) vectors.
+
+    Returns:
+    - Collection: The flushed, unindexed collection.
+    """
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema("id", DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema("vector", DataType.FLOAT_VECTOR, dim=vectors.shape[1]),
+    ])
+    collection = Collection(name, schema)
+    for start in range(0, len(vectors), INSERT_BATCH):
+        block = vectors[start:start + INSERT_BATCH]
+        collection.insert([list(range(start, start + len(block))), block.tolist()])
+    collection.flush()
+    return collection
+
+
+def build_index(collection, field, index_params):
+    """
+    Replaces the index of a collection and loads it.
+
+    Args:
+    - collection (Collection): The collection.
+    - field (str): Its vector field.
+    - index_params (dict): Milvus index parameters.
+
+    Returns:
+    - float: Build and load time in seconds.
+    """
+    collection.release()
+    if collection.has_index():
+        collection.drop_index()
+    start = time.perf_counter()
+    collection.create_index(field, index_params)
+    utility.wait_for_index_building_complete(collection.name)
+    collection.load()
+    return time.perf_counter() - start
+
+
+def index_memory(collection, index_params, n, dim):
+    """Memory of the loaded collection as reported by the query nodes, or an estimate."""
+    try:
+        reported = sum(segment.mem_size for segment in utility.get_query_segment_info(collection.name))
+    except Exception:
+        reported = 0
+    return reported or estimate_index_bytes(index_params, n, dim)
+
+
+def measure(collection, field, queries, truth, k, search_params):
+    """
+    Runs every query on its own (as the app does) and scores the results.
+
+    Args:
+    - collection (Collection): The loaded collection.
+    - field (str): Its vector field.
+    - queries (np.ndarray): (q, dim) query vectors.
+    - truth (list): Exact neighbour id sets, one per query.
+    - k (int): Neighbours per query.
+    - search_params (dict): Milvus search parameters.
+
+    Returns:
+    - dict: "recall", "p50_ms" and "p99_ms".
+    """
+    for query in queries[:5]:
+        collection.search([query.tolist()], field, search_params, limit=k)
+    latencies, found = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = collection.search([query.tolist()], field, search_params, limit=k)[0]
+        latencies.append(time.perf_counter() - start)
+        found += len(expected & set(hits.ids))
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "recall": found / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def pareto_front(results):
+    """
+    Keeps the configurations no other one beats on recall, p99 latency and memory at once.
+
+    Args:
+    - results (list): Result dicts with "recall", "p99_ms" and "memory_bytes".
+
+    Returns:
+    - list: The Pareto-optimal results, highest recall first.
+    """
+    def dominates(a, b):
+        no_worse = a["recall"] >= b["recall"] and a["p99_ms"] <= b["p99_ms"] and a["memory_bytes"] <= b["memory_bytes"]
+        better = a["recall"] > b["recall"] or a["p99_ms"] < b["p99_ms"] or a["memory_bytes"] < b["memory_bytes"]
+        return no_worse and better
+
+    front = [r for r in results if not any(dominates(other, r) for other in results)]
+    return sorted(front, key=lambda r: (-r["recall"], r["p99_ms"]))
+
+
+def recommend(front, target_recall=TARGET_RECALL):
+    """
+    Picks the fastest Pareto-optimal configuration that reaches the target recall (or the
+    most accurate one if none does).
+
+    Args:
+    - front (list): Pareto-optimal results.
+    - target_recall (float): Minimum recall@k.
+
+    Returns:
+    - dict: The chosen result.
+    """
+    good = [r for r in front if r["recall"] >= target_recall]
+    if good:
+        return min(good, key=lambda r: (r["p99_ms"], r["memory_bytes"]))
+    return max(front, key=lambda r: r["recall"])
+
+
+def tune(vectors, queries, k, index_types=INDEX_TYPES, bench_collection=SOURCE_COLLECTION + BENCH_SUFFIX):
+    """
+    Builds every candidate index on a scratch copy of `vectors` and sweeps its search
+    parameters.
+
+    Args:
+    - vectors (np.ndarray): (n, dim) vectors to index.
+    - queries (np.ndarray): (q, dim) query vectors (not part of `vectors`).
+    - k (int): Neighbours per query.
+    - index_types (tuple): Milvus index types to try.
+    - bench_collection (str): Name of the scratch collection (dropped afterwards).
+
+    Returns:
+    - list: One result dict per (index, search parameters) pair.
+    """
+    n, dim = vectors.shape
+    truth = ground_truth(vectors, queries, k)
+    collection = create_bench_collection(bench_collection, vectors)
+    results = []
+    try:
+        for index_params in candidate_indexes(n, dim, index_types):
+            try:
+                build_s = build_index(collection, "vector", index_params)
+            except Exception as e:
+                print(f"Skipping {index_params['index_type']} {index_params['params']}: {e}")
+                continue
+            memory = index_memory(collection, index_params, n, dim)
+            for search_params in search_grid(index_params, k):
+                result = measure(collection, "vector", queries, truth, k, search_params)
+                result.update(
+                    index_params=index_params, search_params=search_params,
+                    build_s=build_s, memory_bytes=memory,
+                )
+                results.append(result)
+                print(format_result(result))
+    finally:
+        utility.drop_collection(bench_collection)
+    return results
+
+
+def format_result(result):
+    """One report line for a result."""
+    index, search = result["index_params"], result["search_params"]["params"]
+    return (
+        f"{index['index_type']:>8} {str(index['params']):<38} {str(search):<16} "
+        f"recall {result['recall']:.3f} | p50 {result['p50_ms']:6.2f} ms | p99 {result['p99_ms']:6.2f} ms | "
+        f"{result['memory_bytes'] / 2**20:8.1f} MiB | build {result['build_s']:6.1f}s"
+    )
+
+
+def rebuild_source_index(collection_name, index_params):
+    """Rebuilds the index of the live collection with the chosen parameters (blocks searches)."""
+    collection = Collection(collection_name)
+    print(f"Rebuilding the index of '{collection_name}' as {index_params['index_type']} {index_params['params']}...")
+    elapsed = build_index(collection, vector_field(collection), index_params)
+    print(f"Rebuilt in {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Milvus index types and search parameters, and pick a Pareto-optimal configuration."
+    )
+    parser.add_argument("--collection", default=SOURCE_COLLECTION, help="Collection to sample vectors from.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of the collection.")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of synthetic vectors.")
+    parser.add_argument("--sample", type=int, default=200000, help="Maximum vectors read from the collection.")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors.")
+    parser.add_argument("--k", type=int, default=20, help="Neighbours per query (the app retrieves 20).")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="Comma-separated Milvus index types.")
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL, help="Minimum recall@k.")
+    parser.add_argument("--apply", action="store_true",
+                        help=f"Write the recommendation to {INDEX_CONFIG_PATH} for Writer and Retriever.")
+    parser.add_argument("--rebuild-index", action="store_true",
+                        help="Also rebuild the index of --collection with the recommended parameters.")
+    args = parser.parse_args()
+
+    args_conn = connection_args()
+    connections.connect("default", **args_conn)
+    if args_conn.get("uri", "").endswith(".db"):
+        # Milvus Lite serves every index type as FLAT, so only standalone gives meaningful numbers.
+        print("Warning: Milvus Lite ignores the index type; run against Milvus standalone to compare indexes.")
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries, args.dim)
+    else:
+        if not utility.has_collection(args.collection):
+            print(f"Collection '{args.collection}' does not exist.")
+            return 1
+        vectors = sample_vectors(args.collection, args.sample + args.queries)
+    if len(vectors) <= args.queries + args.k:
+        print(f"Not enough vectors ({len(vectors)}) for {args.queries} queries at k={args.k}.")
+        return 1
+    rng = np.random.default_rng(0)
+    rng.shuffle(vectors)
+    queries, base = vectors[:args.queries], vectors[args.queries:]
+    print(f"Tuning on {len(base)} vectors of dimension {base.shape[1]} with {len(queries)} queries, k={args.k}")
+
+    results = tune(base, queries, args.k, tuple(t.strip().upper() for t in args.types.split(",")),
+                   args.collection + BENCH_SUFFIX)
+    if not results:
+        print("No index could be built.")
+        return 1
+
+    front = pareto_front(results)
+    print("\nPareto-optimal configurations:")
+    for result in front:
+        print(format_result(result))
+    best = recommend(front, args.target_recall)
+    current = load_index_config()
+    print(f"\nRecommended (target recall {args.target_recall}):\n{format_result(best)}")
+    print(f"Current: index {current['index_params']}, search {current['search_params']}")
+
+    if args.apply:
+        report = {key: best[key] for key in ("recall", "p50_ms", "p99_ms", "memory_bytes", "build_s")}
+        report.update(vectors=len(base), k=args.k)
+        save_index_config(best["index_params"], best["search_params"], report)
+        print(f"Saved to {INDEX_CONFIG_PATH}")
+        if args.rebuild_index and not args.synthetic:
+            rebuild_source_index(args.collection, best["index_params"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
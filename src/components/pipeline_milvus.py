@@ -1,70 +1,518 @@
 import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from reader import Reader
 from preprocessor import Preprocessor
 from collector import InfoCollector
 from writer import Writer
+from bulk_writer import BulkWriter, DEFAULT_BATCH_SIZE as BULK_BATCH_SIZE
+from registry import IngestionRegistry
+from milvus_config import connection_args
+from checkpoint import IngestCheckpoint
+from embedding_scheduler import EmbeddingScheduler, DEFAULT_BATCH_SIZE, DEFAULT_MAX_IN_FLIGHT
+from embedding_cache import EmbeddingCache, CACHE_DIR, DEFAULT_MAX_ENTRIES
+import metrics
+from pymilvus import Collection, connections, utility
 import pandas as pd,os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def pipeline(pdf_path):
+COLLECTION_NAME = "pdf_embeddings1"
+EMBEDDING_MODEL_NAME = "models/embedding-001"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+STREAM_BATCH_SIZE = 256
+
+# specify the path where your data(pdf files) are located
+DATA_PATH = r'D:\project\Digital-Library\src\data'
+
+
+def build_scheduler(batch_size=DEFAULT_BATCH_SIZE, max_in_flight=DEFAULT_MAX_IN_FLIGHT, requests_per_minute=None,
+                    cache=None):
+    """
+    Builds the embedding scheduler shared by every write of a run.
+
+    Args:
+    - batch_size (int): Texts per embedding request.
+    - max_in_flight (int): Maximum concurrent embedding requests.
+    - requests_per_minute (float, optional): Embedding quota; no rate limiting if None.
+    - cache (EmbeddingCache, optional): Embedding cache checked before calling the model.
+
+    Returns:
+    - EmbeddingScheduler: Scheduler wrapping the Gemini embedding model.
+    """
+    return EmbeddingScheduler(
+        GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME),
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        requests_per_minute=requests_per_minute,
+        cache=cache,
+    )
+
+
+def pipeline(pdf_path, registry=None, embedding_model=None):
     start = time.time()
+    registry = registry or IngestionRegistry()
     # Step 1: Read the PDF
     print("Reading the PDF...")
     reader = Reader(pdf_path)
-    if reader.isthere():
+    if reader.isthere(registry):
         print(f"{os.path.basename(pdf_path)} is already in the Database")
-        return 
-    pdf_text = reader.extract_text()
+        return
 
-    # Step 2: Preprocess the text
-    print("Preprocessing the text...")
-    preprocessor = Preprocessor(pdf_text)
-    pdf_text = preprocessor.clean_text()
-    page_chunks = preprocessor.text_splitting(chunk_size=1000,chunk_overlap=200)
-  
+    with metrics.trace("ingest", path="milvus"):
+        with metrics.span("extract"):
+            pdf_text = reader.extract_text()
 
+        # Step 2: Preprocess the text
+        print("Preprocessing the text...")
+        with metrics.span("clean_split"):
+            preprocessor = Preprocessor(pdf_text)
+            pdf_text = preprocessor.clean_text()
+            page_chunks = preprocessor.text_splitting(chunk_size=CHUNK_SIZE,chunk_overlap=CHUNK_OVERLAP)
 
-    # Embedding model to be used.
-    embedding_model_instance = GoogleGenerativeAIEmbeddings(model = "models/embedding-001")
 
-    # Step 3: Embed the text
-    print("Embedding the text...")
-    collector = InfoCollector(model=embedding_model_instance)
-    metadata = collector.collect_metadata(page_chunks,pdf_path)
 
+        # Embedding model to be used.
+        embedding_model_instance = embedding_model or GoogleGenerativeAIEmbeddings(model = EMBEDDING_MODEL_NAME)
 
-    # Step 4: Write to database
-    print("Writing to the database...")
-    
-    writer = Writer(
-        collection_name="pdf_embeddings1",
-        embedding_model=embedding_model_instance,
-        index_params=None
-    )
-    
-    writer.save_to_vector_db(metadata)
+        # Step 3: Embed the text
+        print("Embedding the text...")
+        with metrics.span("metadata"):
+            collector = InfoCollector(model=embedding_model_instance)
+            metadata = collector.collect_metadata(page_chunks,pdf_path)
+
+
+        # Step 4: Write to database
+        print("Writing to the database...")
+
+        write(metadata, embedding_model_instance)
+    registry.record(pdf_path, len(pdf_text))
     end = time.time()
 
     print("Pipeline completed successfully!")
     print(f"pipeline completed within {end - start:.4f} seconds")
 
+
+def stream_pipeline(pdf_path, batch_size=STREAM_BATCH_SIZE, registry=None, checkpoints=None, embedding_model=None):
+    """
+    Ingests a PDF page by page: each page is extracted, cleaned, split and queued, and the
+    queue is embedded and written whenever it holds `batch_size` chunks. Peak memory is
+    bounded by one batch instead of the whole document.
+
+    After every written batch a checkpoint stores the last page that reached the database,
+    so rerunning after a crash resumes from the next page. Rows of later pages, written right
+    before the crash but not checkpointed, are deleted first, so no chunk is written twice.
+
+    Args:
+    - pdf_path (str): Path to the PDF document.
+    - batch_size (int): Number of chunks embedded and inserted per batch.
+    - registry (IngestionRegistry, optional): Registry used to skip and record files.
+    - checkpoints (IngestCheckpoint, optional): Checkpoint store used for resuming.
+    - embedding_model (obj, optional): Embedding model instance.
+
+    Returns:
+    - int: Number of chunks written.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    start = time.time()
+    registry = registry or IngestionRegistry()
+    checkpoints = checkpoints or IngestCheckpoint()
+    name = os.path.basename(pdf_path)
+
+    reader = Reader(pdf_path)
+    if reader.isthere(registry):
+        print(f"{name} is already in the Database")
+        return 0
+
+    key = registry.fingerprint(pdf_path)
+    last_page = checkpoints.load(key)
+    if last_page:
+        print(f"Resuming {name} after page {last_page}")
+
+    writer = Writer(
+        collection_name=COLLECTION_NAME,
+        embedding_model=embedding_model or GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME),
+        index_params=None
+    )
+
+    batch = []
+    written = 0
+    with metrics.trace("ingest", path="milvus", mode="stream"):
+        writer.delete_pdfs([name], after_page=last_page)
+        pages = reader.iter_pages(start=last_page + 1)
+        for page, chunks in Preprocessor.stream_chunks(pages, CHUNK_SIZE, CHUNK_OVERLAP):
+            batch.extend(InfoCollector.page_metadata(page, chunks, pdf_path))
+            last_page = page
+            # Flush on page boundaries so the checkpoint never splits a page.
+            if len(batch) >= batch_size:
+                written += len(batch)
+                with metrics.span("write"):
+                    writer.save_to_vector_db(batch)
+                checkpoints.save(key, name, last_page)
+                batch = []
+
+        if batch:
+            written += len(batch)
+            with metrics.span("write"):
+                writer.save_to_vector_db(batch)
+
+    registry.record(pdf_path, last_page)
+    checkpoints.clear(key)
+    print(f"Streamed {written} chunks from {name} in {time.time() - start:.4f} seconds")
+    return written
+
+
+def prepare(pdf_path):
+    """
+    Runs the CPU-bound stages (read, clean, split, collect metadata) for a single PDF.
+    Only uses picklable inputs and outputs so it can run inside a worker process.
+    Callers are expected to have filtered out already ingested files.
+
+    Args:
+    - pdf_path (str): Path to the PDF document.
+
+    Returns:
+    - dict: {"pdf_path", "pages", "metadata", "spans"} for the PDF, where "spans" are the
+      stage timings for the parent process to `record` (a worker's metrics are not shared).
+    """
+    with metrics.trace("ingest", path="milvus") as current:
+        # Left unfinished: the parent process records the spans and publishes the metrics.
+        current.defer()
+        with metrics.span("extract"):
+            reader = Reader(pdf_path)
+            pdf_text = reader.extract_text()
+
+        with metrics.span("clean_split"):
+            preprocessor = Preprocessor(pdf_text)
+            preprocessor.clean_text()
+            page_chunks = preprocessor.text_splitting(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+        # The collector does not embed anything, so no model is needed in the worker.
+        with metrics.span("metadata"):
+            collector = InfoCollector(model=None)
+            metadata = collector.collect_metadata(page_chunks, pdf_path)
+    return {"pdf_path": pdf_path, "pages": len(pdf_text), "metadata": metadata, "spans": current.spans}
+
+
+def record_spans(spans):
+    """
+    Records stage timings measured in a worker process (see `prepare`).
+
+    Args:
+    - spans (list): {"stage", "seconds", "labels"} dicts.
+    """
+    for span in spans:
+        metrics.record(span["stage"], span["seconds"], path="milvus", **span["labels"])
+
+
+def write(metadata, embedding_model):
+    """
+    Embeds the chunks and writes them to the Milvus collection.
+
+    Args:
+    - metadata (list): List of metadata dictionaries produced by InfoCollector.
+    - embedding_model (obj): Embedding model instance.
+    """
+    writer = Writer(
+        collection_name=COLLECTION_NAME,
+        embedding_model=embedding_model,
+        index_params=None
+    )
+    # Writer threads run outside the caller's trace, so the path label is set here too.
+    with metrics.span("write", path="milvus"):
+        # The files are not in the registry yet, so any rows they have are from a failed run.
+        writer.delete_pdfs(sorted({meta["pdf"] for meta in metadata}))
+        return writer.save_to_vector_db(metadata)
+
+
+class IngestProgress:
+    """
+    Tracks per-file progress and overall throughput of a parallel ingestion run.
+
+    Attributes:
+    - total (int): Number of files submitted.
+    - done (int): Number of files finished (written, skipped or failed).
+    - pages (int): Pages written so far.
+    - chunks (int): Chunks written so far.
+    - failures (dict): File path -> error message for files that failed.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.pages = 0
+        self.chunks = 0
+        self.skipped = 0
+        self.failures = {}
+        self.start = time.time()
+
+    def _rates(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        return self.pages / elapsed, self.chunks / elapsed
+
+    def completed(self, pdf_path, pages, chunks, started):
+        self.done += 1
+        self.pages += pages
+        self.chunks += chunks
+        pages_per_s, chunks_per_s = self._rates()
+        print(
+            f"[{self.done}/{self.total}] {os.path.basename(pdf_path)}: {pages} pages, {chunks} chunks "
+            f"in {time.time() - started:.2f}s | {pages_per_s:.1f} pages/s, {chunks_per_s:.1f} chunks/s"
+        )
+
+    def skip(self, pdf_path):
+        self.done += 1
+        self.skipped += 1
+        print(f"[{self.done}/{self.total}] {os.path.basename(pdf_path)} is already in the Database")
+
+    def fail(self, pdf_path, error):
+        self.done += 1
+        self.failures[pdf_path] = str(error)
+        print(f"[{self.done}/{self.total}] {os.path.basename(pdf_path)} failed: {error}")
+
+    def summary(self):
+        elapsed = time.time() - self.start
+        pages_per_s, chunks_per_s = self._rates()
+        print(
+            f"Ingested {self.done - self.skipped - len(self.failures)} files "
+            f"({self.skipped} skipped, {len(self.failures)} failed) in {elapsed:.2f} seconds"
+        )
+        print(f"Throughput: {pages_per_s:.1f} pages/s, {chunks_per_s:.1f} chunks/s")
+
+
+def ingest_parallel(pdf_paths, workers=4, writers=2, queue_depth=8, registry=None, embedding_model=None):
+    """
+    Ingests many PDFs with overlapping stages: reading and chunking run in a process pool
+    while embedding and writing run in a thread pool, so CPU-bound parsing and
+    network-bound embedding happen at the same time.
+
+    Args:
+    - pdf_paths (list): Paths of the PDF documents to ingest.
+    - workers (int): Number of worker processes for read/clean/split.
+    - writers (int): Number of concurrent embed/write threads.
+    - queue_depth (int): Maximum number of files in flight across both stages. Bounds the
+      memory held by prepared-but-not-yet-written chunks.
+    - registry (IngestionRegistry, optional): Registry used to skip and record files.
+    - embedding_model (obj, optional): Embedding model shared by all writer threads. Pass an
+      EmbeddingScheduler so every thread draws from the same rate limit.
+
+    Returns:
+    - IngestProgress: Counters for the run.
+    """
+    if workers < 1 or writers < 1 or queue_depth < 1:
+        raise ValueError("workers, writers and queue_depth must be at least 1.")
+
+    registry = registry or IngestionRegistry()
+    embedding_model_instance = embedding_model or build_scheduler()
+    progress = IngestProgress(len(pdf_paths))
+    new_paths = registry.new_files(pdf_paths)
+    for pdf_path in set(pdf_paths) - set(new_paths):
+        progress.skip(pdf_path)
+    pending = iter(new_paths)
+    preparing = {}  # future -> (pdf_path, start time)
+    writing = {}  # future -> (pdf_path, pages, chunks, start time)
+
+    with ProcessPoolExecutor(max_workers=workers) as prepare_pool, \
+            ThreadPoolExecutor(max_workers=writers) as write_pool:
+
+        def fill():
+            while len(preparing) + len(writing) < queue_depth:
+                pdf_path = next(pending, None)
+                if pdf_path is None:
+                    return
+                preparing[prepare_pool.submit(prepare, pdf_path)] = (pdf_path, time.time())
+
+        fill()
+        while preparing or writing:
+            done, _ = wait(list(preparing) + list(writing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in preparing:
+                    pdf_path, started = preparing.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        progress.fail(pdf_path, e)
+                        continue
+                    record_spans(result["spans"])
+                    chunks = len(result["metadata"])
+                    job = write_pool.submit(write, result["metadata"], embedding_model_instance)
+                    writing[job] = (pdf_path, result["pages"], chunks, started)
+                else:
+                    pdf_path, pages, chunks, started = writing.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        progress.fail(pdf_path, e)
+                        continue
+                    registry.record(pdf_path, pages)
+                    progress.completed(pdf_path, pages, chunks, started)
+            fill()
+
+    progress.summary()
+    return progress
+
+
+def bulk_ingest(pdf_paths, workers=4, batch_size=BULK_BATCH_SIZE, defer_index=True, registry=None,
+                embedding_model=None):
+    """
+    Nightly-load path: prepares the PDFs in a process pool, embeds each one and hands the
+    vectors to a BulkWriter as columns, which inserts them in large batches and builds the
+    index once at the end. Files are recorded in the registry only after the index is built.
+
+    Args:
+    - pdf_paths (list): Paths of the PDF documents to ingest.
+    - workers (int): Number of worker processes for read/clean/split.
+    - batch_size (int): Rows per insert request.
+    - defer_index (bool): Drop the index during the load and rebuild it once afterwards.
+    - registry (IngestionRegistry, optional): Registry used to skip and record files.
+    - embedding_model (obj, optional): Embedding model (an EmbeddingScheduler by default).
+
+    Returns:
+    - dict: BulkWriter stats ("rows", "seconds", "rows_per_s", ...).
+    """
+    registry = registry or IngestionRegistry()
+    embedding_model_instance = embedding_model or build_scheduler()
+    new_paths = registry.new_files(pdf_paths)
+    print(f"{len(pdf_paths) - len(new_paths)} of {len(pdf_paths)} files are already in the Database")
+
+    loaded = []
+    with BulkWriter(COLLECTION_NAME, batch_size=batch_size, defer_index=defer_index) as bulk, \
+            ProcessPoolExecutor(max_workers=workers) as prepare_pool:
+        for result in prepare_pool.map(prepare, new_paths):
+            record_spans(result["spans"])
+            metadata = result["metadata"]
+            texts = [meta["chunk_text"] for meta in metadata]
+            with metrics.span("embed", path="milvus"):
+                vectors = embedding_model_instance.embed_documents(texts)
+            bulk.add(vectors, texts, [meta["page"] for meta in metadata], [meta["pdf"] for meta in metadata])
+            loaded.append((result["pdf_path"], result["pages"]))
+        stats = bulk.close()
+
+    for pdf_path, pages in loaded:
+        registry.record(pdf_path, pages)
+    return stats
+
+
+def seed_registry(registry, pdf_paths, collection_name=COLLECTION_NAME):
+    """
+    One-time backfill for collections that were loaded before the registry existed.
+    Scans the collection once and records every given PDF whose name is already present.
+
+    Args:
+    - registry (IngestionRegistry): Registry to fill.
+    - pdf_paths (list): Paths of the local PDF documents.
+    - collection_name (str): Name of the Milvus collection.
+
+    Returns:
+    - int: Number of files recorded.
+    """
+    connections.connect("default", **connection_args())
+    if collection_name not in utility.list_collections():
+        print(f"Collection '{collection_name}' does not exist.")
+        return 0
+
+    last_page = {}
+    iterator = Collection(collection_name).query_iterator(
+        batch_size=1000, expr="page >= 0", output_fields=["pdf", "page"]
+    )
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+        for row in rows:
+            last_page[row["pdf"]] = max(last_page.get(row["pdf"], 0), row["page"])
+
+    recorded = 0
+    for pdf_path in pdf_paths:
+        name = os.path.basename(pdf_path)
+        if name in last_page:
+            registry.record(pdf_path, last_page[name])
+            recorded += 1
+    print(f"Recorded {recorded} already ingested files in the registry")
+    return recorded
+
+
 # Execute the pipeline
 if __name__ == "__main__":
-    # specify the path where your data(pdf files) are located
-    path = r'D:\project\Digital-Library\src\data'
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDFs into Milvus.")
+    parser.add_argument("path", nargs="?", default=DATA_PATH, help="Directory containing the pdf files.")
+    parser.add_argument("--parallel", action="store_true", help="Overlap read/split and embed/write stages.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for read/split.")
+    parser.add_argument("--writers", type=int, default=2, help="Concurrent embed/write threads.")
+    parser.add_argument("--queue-depth", type=int, default=8, help="Maximum files in flight.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream each PDF page by page with bounded memory and resumable checkpoints.")
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE, help="Chunks per streamed batch.")
+    parser.add_argument("--embed-batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Texts per embedding request.")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Maximum concurrent embedding requests.")
+    parser.add_argument("--rpm", type=float, default=None, help="Embedding requests per minute quota.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Directory of the embedding cache.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="Maximum cached embeddings.")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the embedding model.")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Columnar bulk load with the index built once at the end (nightly loads).")
+    parser.add_argument("--bulk-batch-size", type=int, default=BULK_BATCH_SIZE, help="Rows per bulk insert request.")
+    parser.add_argument("--keep-index", action="store_true",
+                        help="With --bulk, keep the existing index during the load (searchable, but slower).")
+    parser.add_argument("--registry", default="ingestion_registry.sqlite", help="Path of the ingestion registry.")
+    parser.add_argument("--seed-registry", action="store_true",
+                        help="Record files already present in the collection (run once on existing collections).")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write the per-stage latency histograms (Prometheus text format) here at the end.")
+    args = parser.parse_args()
+
+    path = args.path
     files = os.listdir(path)
-    
-    for file in range(len(files)):
-        print(os.path.basename(files[file]))
-        print(os.path.join(path, files[file]))
-        pipeline(os.path.join(path, files[file]))
-        print(f"completed executing file-{file+1}")
-    
-        
-
-    
+    pdf_paths = [os.path.join(path, f) for f in files]
+    registry = IngestionRegistry(args.registry)
+    cache = None if args.no_cache else EmbeddingCache(args.cache_dir, args.cache_size)
+    scheduler = build_scheduler(args.embed_batch_size, args.max_in_flight, args.rpm, cache)
+
+    if args.seed_registry:
+        seed_registry(registry, pdf_paths)
+
+    if args.bulk:
+        bulk_ingest(
+            pdf_paths,
+            workers=args.workers,
+            batch_size=args.bulk_batch_size,
+            defer_index=not args.keep_index,
+            registry=registry,
+            embedding_model=scheduler,
+        )
+    elif args.parallel:
+        ingest_parallel(
+            pdf_paths,
+            workers=args.workers,
+            writers=args.writers,
+            queue_depth=args.queue_depth,
+            registry=registry,
+            embedding_model=scheduler,
+        )
+    elif args.stream:
+        for pdf_path in registry.new_files(pdf_paths):
+            stream_pipeline(pdf_path, args.batch_size, registry, embedding_model=scheduler)
+    else:
+        new_paths = registry.new_files(pdf_paths)
+        print(f"{len(pdf_paths) - len(new_paths)} of {len(pdf_paths)} files are already in the Database")
+        for file in range(len(new_paths)):
+            print(os.path.basename(new_paths[file]))
+            print(new_paths[file])
+            pipeline(new_paths[file], registry, embedding_model=scheduler)
+            print(f"completed executing file-{file+1}")
+
+    if args.metrics_file:
+        metrics.registry.write_file(args.metrics_file)
+        print(f"Wrote stage latencies to {args.metrics_file}")
+
+
+
 
@@ -1,5 +1,5 @@
-import re,fitz
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from text_normalizer import normalize_page
 
 
 
@@ -22,14 +22,29 @@ class Preprocessor:
         """
         self.pdf_text = pdf_text  # Initialize with the dictionary extracted using Reader class in reader.py
         self.page_chunks = {}  # Initialize an empty dictionary for page chunks
+        self.cleaned = False  # Set once clean_text has run, so pages are cleaned only once
 
     
 
+    @staticmethod
+    def clean_page(text):
+        """
+        Cleans the text of a single page (see `clean_text`) in one pass.
+
+        Args:
+        - text (str): Raw page text.
+
+        Returns:
+        - str: Cleaned page text.
+        """
+        return normalize_page(text)
+
+
     def clean_text(self):
         """
         Cleans the text by removing extra whitespace, newlines, and special characters,
         while retaining single quotes (') and double quotes (").
-        Updates self.pdf_text with the cleaned text for each page.
+        Updates self.pdf_text with the cleaned text for each page. Calling it again is a no-op.
 
         Returns:
         - dict: The updated self.pdf_text dictionary with cleaned text.
@@ -39,24 +54,22 @@ class Preprocessor:
         """
         if not isinstance(self.pdf_text, dict):
             raise ValueError("self.pdf_text must be a dictionary. Call `extract_text` first.")
+        if self.cleaned:
+            return self.pdf_text
 
         for page_number, text in self.pdf_text.items():
             try:
                 if not isinstance(text, str):
                     raise ValueError(f"Text for page {page_number} is not a string: {type(text)} found.")
 
-                # Clean the text
-                text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces with a single space
-                text = text.strip()  # Remove leading and trailing spaces
-                text = re.sub(r'[^\w\s\.\'"]', ' ', text)  # Remove special characters except ., ', and "
-                
-                # Update the dictionary
-                self.pdf_text[page_number] = text
+                # Update the dictionary with the cleaned text
+                self.pdf_text[page_number] = self.clean_page(text)
 
             except Exception as e:
                 print(f"Error processing page {page_number}: {e}")
                 self.pdf_text[page_number] = ""  # Replace problematic text with an empty string
 
+        self.cleaned = True
         return self.pdf_text
     
 
@@ -86,6 +99,24 @@ class Preprocessor:
         return self.page_chunks
 
 
+    @staticmethod
+    def stream_chunks(pages, chunk_size, chunk_overlap):
+        """
+        Cleans and splits pages one at a time, without keeping earlier pages around.
+
+        Args:
+        - pages (iterable): (page_number, text) pairs, e.g. from `Reader.iter_pages`.
+        - chunk_size (int): The maximum size of each chunk.
+        - chunk_overlap (int): The overlap size between chunks.
+
+        Yields:
+        - (int, list): Page number and the chunks of that page.
+        """
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        for page, text in pages:
+            yield page, text_splitter.split_text(Preprocessor.clean_page(text))
+
+
 
 
 
@@ -1,6 +1,11 @@
-import os
 import fitz
-from pymilvus import Collection, connections,utility
+from registry import IngestionRegistry
+
+# Blocks reaching into this many points from the top or bottom edge are headers/footers.
+HEADER_MARGIN = 50
+# Default text flags without TEXT_PRESERVE_IMAGES, so image pixels are never copied out.
+BLOCK_FLAGS = fitz.TEXTFLAGS_BLOCKS & ~fitz.TEXT_PRESERVE_IMAGES
+SPAN_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
 
 class Reader:
 
@@ -8,42 +13,34 @@ class Reader:
         self.pdf_document = pdf_document
 
 
-    def isthere(self):
-        # Step 1: Connect to Milvus
-        connections.connect("default", host="localhost", port="19530")
-
-        # Step 2: Check if Collection Exists
-        collection_name = "pdf_embeddings1" 
-        if collection_name not in utility.list_collections():
-            print(f"Collection '{collection_name}' does not exist.")
-            return False  # Collection does not exist
+    def isthere(self, registry=None):
+        """
+        Checks whether this PDF has already been ingested, using the content-hash registry
+        instead of scanning the Milvus collection.
 
-        # Step 3: Access the Collection
-        collection = Collection(collection_name)
+        Args:
+        - registry (IngestionRegistry, optional): Registry to consult. Opens the default one if not given.
 
-        # Step 4: Query for Metadata
-        expr = "1 < page < 8"  # Modify this condition as needed
+        Returns:
+        - bool: True if a PDF with the same contents is already in the Database.
+        """
+        if registry is not None:
+            return registry.contains(self.pdf_document)
+        registry = IngestionRegistry()
         try:
-            results = collection.query(
-                expr=expr,  # Query condition
-                output_fields=["pdf"],  # Specify the "pdf" field
-            )
-        except Exception as e:
-            print(f"Error querying collection: {e}")
-            return False
-
-        # Step 5: Extract Unique PDF Values
-        pdf_values = {result["pdf"] for result in results if "pdf" in result}
-        return os.path.basename(self.pdf_document) in pdf_values
+            return registry.contains(self.pdf_document)
+        finally:
+            registry.close()
 
 
-    def extract_text(self):
+    def extract_text(self, fast=True):
         """
         Extracts text from a PDF, excluding page numbers typically found in headers or footers,
         and organizes the text by pages.
 
         Args:
         - pdf_document (str): Path to the PDF document.
+        - fast (bool, optional): Use block-level extraction (see `iter_pages`). Defaults to True.
 
         Returns:
         - pdf_text (dict): Dictionary with page numbers as keys and text content as values.
@@ -51,33 +48,73 @@ class Reader:
         #.......
         "Note...some problem with the page extraction and formating here!"
 
+        return dict(self.iter_pages(fast=fast))
+
+
+    def iter_pages(self, start=1, fast=True):
+        """
+        Lazily yields the text of each page, so only one page is held in memory at a time.
+
+        Blocks whose bounding box reaches into the top or bottom HEADER_MARGIN points are
+        treated as headers/footers and skipped. The fast path asks MuPDF for block-level text
+        only; the span path builds the full span dictionary and joins spans with spaces, which
+        is much slower but reproduces the historical output exactly. Both produce the same
+        lines per page; they differ only where one line is split into several spans (e.g. a
+        font change inside a word), where the span path inserts an extra space.
+
+        Args:
+        - start (int, optional): First (1-based) page number to yield. Defaults to 1.
+        - fast (bool, optional): Use block-level extraction. Defaults to True.
+
+        Yields:
+        - (int, str): Page number and the text content of that page.
+        """
+        page_text = self._page_text_fast if fast else self._page_text_spans
+
         # Open the PDF file
         document = fitz.open(self.pdf_document)
 
-        pdf_text = {}
-        for page_number in range(document.page_count):
-            page = document.load_page(page_number)
+        try:
+            for page_number in range(max(start, 1) - 1, document.page_count):
+                page = document.load_page(page_number)
+                yield page_number + 1, page_text(page)
+        finally:
+            # Close the document
+            document.close()
+
+
+    @staticmethod
+    def _page_text_fast(page):
+        top, bottom = HEADER_MARGIN, page.rect.height - HEADER_MARGIN
+
+        # (x0, y0, x1, y1, text, block_no, block_type); text lines end with "\n"
+        blocks = page.get_text("blocks", flags=BLOCK_FLAGS)
+        text = "".join(
+            block[4] for block in blocks
+            if block[6] == 0 and block[1] >= top and block[3] <= bottom
+        )
+        return text[:-1] if text.endswith("\n") else text
 
-            # Get the text and its bounding boxes
-            text_instances = page.get_text("dict")["blocks"]
 
-            page_text = []
-            for block in text_instances:
-                bbox = block.get("bbox", [])
-                text = block.get("lines", [])
+    @staticmethod
+    def _page_text_spans(page):
+        bottom = page.rect.height - HEADER_MARGIN
 
-                # Exclude text near the top or bottom (likely headers/footers)
-                if bbox and (bbox[1] < 50 or bbox[3] > page.rect.height - 50):
-                    continue
+        # Get the text and its bounding boxes (image blocks carry no text, so skip their pixels)
+        text_instances = page.get_text("dict", flags=SPAN_FLAGS)["blocks"]
 
-                # Collect text from the block
-                for line in text:
-                    page_text.append(" ".join([span["text"] for span in line["spans"]]))
+        page_text = []
+        for block in text_instances:
+            bbox = block.get("bbox", [])
+            text = block.get("lines", [])
 
-            # Join all lines for the page and store in the dictionary
-            pdf_text[page_number + 1] = "\n".join(page_text)
+            # Exclude text near the top or bottom (likely headers/footers)
+            if bbox and (bbox[1] < HEADER_MARGIN or bbox[3] > bottom):
+                continue
 
-        # Close the document
-        document.close()
+            # Collect text from the block
+            for line in text:
+                page_text.append(" ".join([span["text"] for span in line["spans"]]))
 
-        return pdf_text
\ No newline at end of file
+        # Join all lines for the page
+        return "\n".join(page_text)
@@ -0,0 +1,144 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+REGISTRY_PATH = "ingestion_registry.sqlite"
+
+# SQLite caps the number of bound parameters per statement.
+_MAX_PARAMS = 900
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Computes the SHA-256 hex digest of a file's contents.
+
+    Args:
+    - path (str): Path to the file.
+    - block_size (int): Number of bytes read per step.
+
+    Returns:
+    - str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionRegistry:
+    """
+    A persistent record of the PDFs already written to the vector database, keyed by the
+    SHA-256 of the file contents. Lookups are index hits in a local SQLite file, so checking
+    a file never touches Milvus and does not grow with the size of the collection.
+
+    Attributes:
+    - path (str): Location of the SQLite file.
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        """
+        Opens (and creates if needed) the registry.
+
+        Args:
+        - path (str): Location of the SQLite file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " sha256 TEXT PRIMARY KEY, name TEXT NOT NULL, size INTEGER NOT NULL,"
+                " pages INTEGER NOT NULL, ingested_at REAL NOT NULL)"
+            )
+            # Caches content hashes by (path, size, mtime) so reruns do not re-read unchanged files.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_hashes ("
+                " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                " sha256 TEXT NOT NULL)"
+            )
+
+    def fingerprint(self, pdf_path):
+        """
+        Returns the content hash of a file, reusing the cached value when its size and
+        modification time are unchanged.
+
+        Args:
+        - pdf_path (str): Path to the PDF document.
+
+        Returns:
+        - str: SHA-256 hex digest of the file.
+        """
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        sha256 = file_sha256(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256),
+            )
+        return sha256
+
+    def contains(self, pdf_path):
+        """
+        Checks whether a PDF with the same contents has already been ingested.
+
+        Args:
+        - pdf_path (str): Path to the PDF document.
+
+        Returns:
+        - bool: True if the file is already in the Database.
+        """
+        return not self.new_files([pdf_path])
+
+    def new_files(self, pdf_paths):
+        """
+        Answers "which of these files are new" in one pass.
+
+        Args:
+        - pdf_paths (list): Paths of the PDF documents to check.
+
+        Returns:
+        - list: The paths whose contents have not been ingested yet, in input order.
+        """
+        hashes = [self.fingerprint(p) for p in pdf_paths]
+        known = set()
+        unique = list(set(hashes))
+        with self._lock:
+            for i in range(0, len(unique), _MAX_PARAMS):
+                batch = unique[i:i + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT sha256 FROM documents WHERE sha256 IN ({placeholders})", batch
+                ).fetchall()
+                known.update(row[0] for row in rows)
+        return [p for p, h in zip(pdf_paths, hashes) if h not in known]
+
+    def record(self, pdf_path, pages):
+        """
+        Marks a PDF as ingested.
+
+        Args:
+        - pdf_path (str): Path to the PDF document.
+        - pages (int): Number of pages in the document.
+        """
+        sha256 = self.fingerprint(pdf_path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (sha256, name, size, pages, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, os.path.basename(pdf_path), os.path.getsize(pdf_path), pages, time.time()),
+            )
+
+    def close(self):
+        """Closes the underlying SQLite connection."""
+        self._conn.close()
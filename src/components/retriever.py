@@ -1,37 +1,158 @@
 
 from langchain_community.vectorstores import Milvus
 from langchain_huggingface import HuggingFaceEmbeddings
+import json
 import time
+import inspect
 
+# Imported as `components.retriever` by the app and as `retriever` from src/components.
+try:
+    from components.milvus_config import connection_args, load_index_config
+    from components import metrics
+except ImportError:
+    from milvus_config import connection_args, load_index_config
+    import metrics
+
+# Texts per embedding request, and query vectors per Milvus search request (well below the
+# server's nq limit of 16384, and keeping replies with k texts per query under the 64 MB
+# gRPC message limit).
+EMBED_BATCH_SIZE = 100
+SEARCH_BATCH_SIZE = 256
+
+
+def embed_queries(embedding_model, queries, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embeds many queries with one request per batch instead of one per query.
+
+    Args:
+    - embedding_model (obj): Embedding model. Models with their own `embed_queries` (such as
+      the app's query embedding cache) use it; Gemini is asked for query embeddings
+      (task_type "retrieval_query"); other models embed queries like documents.
+    - queries (list): Query texts.
+    - batch_size (int): Texts per embedding request.
+
+    Returns:
+    - list: One vector per query, in input order.
+    """
+    if hasattr(embedding_model, "embed_queries"):
+        return embedding_model.embed_queries(queries)
+    kwargs = {"task_type": "retrieval_query"} if _accepts_task_type(embedding_model) else {}
+    vectors = []
+    for start in range(0, len(queries), batch_size):
+        vectors.extend(embedding_model.embed_documents(queries[start:start + batch_size], **kwargs))
+    return vectors
+
+
+def _accepts_task_type(embedding_model):
+    # Checked up front so a TypeError raised inside the model is not mistaken for a missing argument.
+    try:
+        parameters = inspect.signature(embedding_model.embed_documents).parameters
+    except (TypeError, ValueError):
+        return False
+    return "task_type" in parameters
+
+
+
+def filter_expr(pdfs=None, pages=None):
+    """
+    Builds a Milvus boolean expression that limits a search to some documents and pages.
+    The `pdf` filter lets Milvus search only the partitions holding those documents (it is
+    the partition key), and `page` ranges use its scalar index.
+
+    Args:
+    - pdfs (list, optional): PDF file names to search in.
+    - pages (tuple or list, optional): A (first, last) page range, inclusive, or a list of them.
+
+    Returns:
+    - str or None: The expression, or None when nothing is filtered.
+    """
+    clauses = []
+    if pdfs:
+        # JSON string literals are valid Milvus string literals, quotes escaped.
+        clauses.append(f"pdf in [{', '.join(json.dumps(pdf) for pdf in pdfs)}]")
+    if pages:
+        ranges = [pages] if isinstance(pages[0], int) else pages
+        for first, last in ranges:
+            if first > last:
+                raise ValueError(f"Invalid page range {first}-{last}.")
+        clauses.append("(" + " or ".join(f"(page >= {int(first)} and page <= {int(last)})" for first, last in ranges) + ")")
+    return " and ".join(clauses) or None
 
 
 class Retriever:
-    def __init__(self, collection_name, embedding_model,search_params):
+    def __init__(self, collection_name, embedding_model,search_params,milvus_args=None):
         
 
         self.collection_name = collection_name
         self.embedding_model = embedding_model
-        self.search_params = search_params
-
+        # Parameters chosen by milvus_tuner (or the defaults) unless given.
+        self.search_params = search_params or load_index_config()["search_params"]
+        self.milvus_args = milvus_args or connection_args()
+        self.vectorstore = None
+        self.size = 0
 
-    def search(self,query,k):
-        
-        
-        try:
-            connection_args = {
-                "host": "localhost",
-                "port": "19530",
-            }
 
+    def _get_vectorstore(self):
+        # Built once and reused, so repeated searches do not reload the collection.
+        if self.vectorstore is None:
             # Initialize the Milvus vector store
-            vectorstore = Milvus(
-                embedding_function = self.embedding_model,
-                collection_name=self.collection_name,
-                connection_args=connection_args,
-                search_params=self.search_params
-            )
+            with metrics.span("connect", collection=self.collection_name):
+                self.vectorstore = Milvus(
+                    embedding_function = self.embedding_model,
+                    collection_name=self.collection_name,
+                    connection_args=self.milvus_args,
+                    search_params=self.search_params
+                )
+                col = self.vectorstore.col
+                # Read once per connection: a size label for the search latency histograms.
+                self.size = col.num_entities if col is not None else 0
+        return self.vectorstore
+
+
+    def _search_labels(self, k):
+        params = (self.vectorstore.search_params or {}).get("params", {})
+        return {
+            "collection": self.collection_name,
+            "size": metrics.size_bucket(self.size),
+            "k": k,
+            "nprobe": params.get("nprobe"),
+            "ef": params.get("ef"),
+        }
+
+
+    @property
+    def alias(self):
+        """The pymilvus connection alias langchain's Milvus searches with (None before the first search)."""
+        return getattr(self.vectorstore, "alias", None)
+
+
+    def reset(self):
+        """Drops the cached vector store so the next search reconnects."""
+        self.vectorstore = None
+
+
+    def search(self,query,k,pdfs=None,pages=None):
+        """
+        Retrieves the k chunks most similar to a query.
+
+        Args:
+        - query (str): The query text.
+        - k (int): Number of chunks.
+        - pdfs (list, optional): Only search these PDF file names.
+        - pages (tuple or list, optional): Only search this (first, last) page range, or these ranges.
+
+        Returns:
+        - (list, list): Chunk texts and their {"page", "pdf"} metadata.
+        """
+        try:
+            vectorstore = self._get_vectorstore()
+            expr = filter_expr(pdfs, pages)
             start = time.time()
-            result = vectorstore.similarity_search(query,k=k)
+            # Embedding and ANN search are timed apart, so a slow answer can be attributed.
+            with metrics.span("embed"):
+                vector = self.embedding_model.embed_query(query)
+            with metrics.span("search", filtered=expr is not None, **self._search_labels(k)):
+                result = vectorstore.similarity_search_by_vector(vector,k=k,expr=expr)
             end = time.time()
             metadata_list = [{'page': doc.metadata['page'], 'pdf': doc.metadata['pdf']} for doc in result]
             page_content_list = [doc.page_content for doc in result]
@@ -41,6 +162,69 @@ class Retriever:
         
         except Exception as e:
             raise RuntimeError(f"Failed to retrieve data from the db: {e}")
+
+
+    def search_many(self,queries,k,pdfs=None,pages=None,batch_size=SEARCH_BATCH_SIZE):
+        """
+        Retrieves the k most similar chunks for each of many queries. The queries are embedded
+        in batches and searched as multi-vector Milvus requests of `batch_size` vectors, so the
+        number of round trips grows with len(queries) / batch_size rather than len(queries).
+
+        Args:
+        - queries (list): Query texts.
+        - k (int): Number of chunks per query.
+        - pdfs (list, optional): Only search these PDF file names.
+        - pages (tuple or list, optional): Only search this (first, last) page range, or these ranges.
+        - batch_size (int): Query vectors per search request.
+
+        Returns:
+        - list: One (texts, metadata) pair per query, like `search`, where each metadata dict
+          also has the similarity "score".
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        queries = list(queries)
+        if not queries:
+            return []
+        try:
+            vectorstore = self._get_vectorstore()
+            if vectorstore.col is None:
+                return [([], []) for _ in queries]
+            expr = filter_expr(pdfs, pages)
+            start = time.time()
+            with metrics.span("embed_many"):
+                vectors = embed_queries(self.embedding_model, queries)
+            embedded = time.time()
+
+            fields = [vectorstore._text_field, "page", "pdf"]
+            results = []
+            for offset in range(0, len(vectors), batch_size):
+                with metrics.span("search_many", filtered=expr is not None, **self._search_labels(k)):
+                    hits_per_query = vectorstore.col.search(
+                        data=vectors[offset:offset + batch_size],
+                        anns_field=vectorstore._vector_field,
+                        param=vectorstore.search_params,
+                        limit=k,
+                        expr=expr,
+                        output_fields=fields,
+                    )
+                for hits in hits_per_query:
+                    texts = [hit.entity.get(vectorstore._text_field) for hit in hits]
+                    metadata = [
+                        {'page': hit.entity.get('page'), 'pdf': hit.entity.get('pdf'), 'score': hit.score}
+                        for hit in hits
+                    ]
+                    results.append((texts, metadata))
+            end = time.time()
+            print(
+                f"Searched {len(queries)} queries in {end - start:.4f} seconds "
+                f"(embedding {embedded - start:.4f}s, search {end - embedded:.4f}s, "
+                f"{len(queries) / max(end - start, 1e-9):.1f} queries/s)"
+            )
+            return results
+
+        except Exception as e:
+            raise RuntimeError(f"Failed to retrieve data from the db: {e}")
         
 
 
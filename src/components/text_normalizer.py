@@ -0,0 +1,68 @@
+import re
+
+# Shared text normalization for both ingestion paths. Every per-character decision is made
+# once per distinct code point and cached in a `str.translate` table, so cleaning a page is a
+# single C-level translate pass (plus one split/join for whitespace in the Milvus path).
+
+# Characters kept by the Milvus cleaner; anything else becomes a space.
+_KEPT = re.compile(r'[\w\s\.\'"]')
+
+
+class _SpecialsToSpace(dict):
+    """translate() table mapping every character outside [\\w\\s.'"] to a space."""
+
+    def __missing__(self, code):
+        value = code if _KEPT.match(chr(code)) else 0x20
+        self[code] = value
+        return value
+
+
+class _UnsafeCharacters(dict):
+    """
+    translate() table for the FAISS cleaner: control characters and characters outside the
+    Basic Multilingual Plane are removed, lone surrogates (which cannot be encoded as UTF-8)
+    become '?'.
+    """
+
+    def __missing__(self, code):
+        if 0xD800 <= code <= 0xDFFF:
+            value = "?"
+        elif code > 0xFFFF or code <= 0x1F or 0x7F <= code <= 0x9F:
+            value = None
+        else:
+            value = code
+        self[code] = value
+        return value
+
+
+SPECIALS_TO_SPACE = _SpecialsToSpace()
+UNSAFE_CHARACTERS = _UnsafeCharacters()
+
+
+def normalize_page(text):
+    """
+    Milvus-path cleaning: replaces special characters (anything but word characters,
+    whitespace, '.', ' and ") with spaces and collapses every whitespace run into a single
+    space, without leading or trailing spaces.
+
+    Args:
+    - text (str): Raw page text.
+
+    Returns:
+    - str: Normalized page text.
+    """
+    return " ".join(text.translate(SPECIALS_TO_SPACE).split())
+
+
+def strip_unsafe(text):
+    """
+    FAISS-path cleaning: removes control characters and characters outside the Basic
+    Multilingual Plane, and replaces unencodable surrogates with '?'.
+
+    Args:
+    - text (str): Raw page text.
+
+    Returns:
+    - str: Cleaned text.
+    """
+    return text.translate(UNSAFE_CHARACTERS)
@@ -1,7 +1,20 @@
 from langchain_community.vectorstores import Milvus
-from langchain.schema import Document
+from embedding_scheduler import EmbeddingScheduler
+from index_version import bump_version
+from milvus_config import connection_args, load_index_config
+import metrics
+import threading
+import json
 import time
 
+# Serializes collection creation when several writers start on an empty database.
+_CREATE_LOCK = threading.Lock()
+
+# Chunks are partitioned by document, so per-book searches only touch that book's partition.
+PARTITION_KEY_FIELD = "pdf"
+# Scalar indexes for filtered searches and queries (field -> Milvus index type).
+SCALAR_INDEXES = {"pdf": "INVERTED", "page": "STL_SORT"}
+
 
 class Writer:
     """
@@ -10,6 +23,7 @@ class Writer:
     Attributes:
     - collection_name (str): Name of the collection in the Milvus database.
     - embedding_model (HuggingFaceEmbeddings): The embedding model instance used for creating vector embeddings.
+    - scheduler (EmbeddingScheduler): Batches, rate-limits and retries the embedding requests.
     """
 
     def __init__(self, collection_name, embedding_model,index_params):
@@ -18,16 +32,67 @@ class Writer:
 
         Args:
         - collection_name (str): Name of the collection in the vector database.
-        - embedding_model (HuggingFaceEmbeddings): The embedding model instance.
+        - embedding_model (HuggingFaceEmbeddings): The embedding model instance. Pass an
+          EmbeddingScheduler to share its rate limit between several writers.
         """
 
         self.collection_name = collection_name
         self.embedding_model = embedding_model
-        self.index_params = index_params or {
-            "index_type": "IVF_FLAT",
-            "metric_type": "COSINE",  # Specified here for index creation
-            "params": {"nlist": 128},
-        }
+        self.scheduler = (
+            embedding_model if isinstance(embedding_model, EmbeddingScheduler)
+            else EmbeddingScheduler(embedding_model)
+        )
+        # Parameters chosen by milvus_tuner, or IVF_FLAT/COSINE with nlist 128 until it ran.
+        self.index_params = index_params or load_index_config()["index_params"]
+        self.vectorstore = None
+
+
+    def _get_vectorstore(self):
+        """
+        Returns the Milvus vector store, creating it on first use so repeated batch writes
+        through the same Writer share one connection.
+        """
+        if self.vectorstore is None:
+            # Initialize the Milvus vector store
+            with metrics.span("connect"):
+                self.vectorstore = Milvus(
+                    embedding_function = self.scheduler,
+                    collection_name=self.collection_name,
+                    connection_args=connection_args(),
+                    index_params=self.index_params,
+                    auto_id=True,
+                    partition_key_field=PARTITION_KEY_FIELD,
+                )
+            if self.vectorstore.col is not None:
+                # Collections created before the scalar indexes existed get them on first write.
+                self._ensure_scalar_indexes(self.vectorstore)
+        return self.vectorstore
+
+
+    def _ensure_scalar_indexes(self, vectorstore):
+        """
+        Creates the missing SCALAR_INDEXES on the collection. Milvus 2.5 builds scalar indexes
+        on a loaded collection, so searches keep running meanwhile; a server that refuses
+        leaves the collection unindexed (filters still work, only slower) rather than
+        failing the ingestion.
+
+        Args:
+        - vectorstore (Milvus): The vector store whose collection is indexed.
+        """
+        col = vectorstore.col
+        missing = [
+            field for field in SCALAR_INDEXES
+            if field in vectorstore.fields and not col.has_index(index_name=f"{field}_idx")
+        ]
+        if not missing:
+            return
+        for field in missing:
+            try:
+                col.create_index(field, {"index_type": SCALAR_INDEXES[field]}, index_name=f"{field}_idx")
+            except Exception as e:
+                print(f"Warning: could not index '{field}' of collection '{self.collection_name}': {e}")
+                continue
+            print(f"Created {SCALAR_INDEXES[field]} index on '{field}' of collection '{self.collection_name}'.")
 
 
     def save_to_vector_db(self,metadata):
@@ -53,35 +118,84 @@ class Writer:
         #     raise ValueError("Embeddings and metadata must have the same length.")
         
         try:
-            connection_args = {
-                "host": "localhost",
-                "port": "19530",
-            }
-
-            # Initialize the Milvus vector store
-            vectorstore = Milvus(
-                embedding_function = self.embedding_model,
-                collection_name=self.collection_name,
-                connection_args=connection_args,
-                index_params=self.index_params,
-                auto_id=True
-            )
-
-            # Convert metadata and embeddings into the required format
-            documents = [
-                Document(page_content=meta.pop("chunk_text"), metadata=meta)
-                for meta in metadata
-            ]
-
-            # Add data to the vector store
-            vectorstore.add_documents(documents)
-
-            print(f"Successfully added {len(documents)} embeddings to collection '{self.collection_name}'.")
+            vectorstore = self._get_vectorstore()
+
+            texts = [meta.pop("chunk_text") for meta in metadata]
+            inserted = []
+
+            def insert(indexes, vectors):
+                # Insert every batch as soon as it is embedded, so a later failure keeps earlier work.
+                self._insert(vectorstore, [texts[i] for i in indexes], vectors, [metadata[i] for i in indexes])
+                inserted.append(len(indexes))
+
+            try:
+                self.scheduler.embed_documents(texts, on_batch=insert)
+                print(f"Successfully added {sum(inserted)} embeddings to collection '{self.collection_name}'.")
+            except Exception:
+                # The rows already inserted stay; callers delete them (`delete_pdfs`) before retrying.
+                print(f"Added {sum(inserted)} of {len(texts)} embeddings to collection '{self.collection_name}' before failing.")
+                raise
+            finally:
+                if inserted:
+                    # Cached answers were generated from the collection's old contents.
+                    bump_version(self.collection_name)
+                if self.scheduler.cache is not None:
+                    print(f"Embedding cache: {self.scheduler.cache.stats()}")
             return vectorstore
 
         except Exception as e:
             raise RuntimeError(f"Failed to save data to vector database: {e}")
-        
+
+
+    def delete_pdfs(self, pdfs, after_page=0):
+        """
+        Deletes the rows of some documents, such as the ones left by a write that failed
+        halfway, so writing the documents again does not duplicate their chunks.
+
+        Args:
+        - pdfs (list): PDF file names whose rows are deleted.
+        - after_page (int): Only delete the rows of pages after this one (0 deletes every page).
+
+        Returns:
+        - int: Number of rows deleted.
+        """
+        vectorstore = self._get_vectorstore()
+        if vectorstore.col is None or not pdfs:
+            return 0
+        # JSON string literals are valid Milvus string literals, quotes escaped.
+        expr = f"pdf in [{', '.join(json.dumps(pdf) for pdf in pdfs)}] and page > {int(after_page)}"
+        with metrics.span("delete", collection=self.collection_name):
+            deleted = vectorstore.col.delete(expr).delete_count
+        if deleted:
+            print(f"Deleted {deleted} rows left over from an earlier write of {', '.join(pdfs)}.")
+            bump_version(self.collection_name)
+        return deleted
+
+
+    def _insert(self, vectorstore, texts, vectors, metadata):
+        """
+        Inserts precomputed vectors with their text and metadata.
+
+        Args:
+        - vectorstore (Milvus): The vector store to write to.
+        - texts (list): Chunk texts.
+        - vectors (list): Embeddings of the chunk texts.
+        - metadata (list): Metadata dictionaries for the chunks.
+        """
+        if vectorstore.col is None:
+            with _CREATE_LOCK:
+                if vectorstore.col is None:
+                    # The first batch decides the schema, as it would for `add_documents`.
+                    vectorstore._init(embeddings=vectors, metadatas=metadata)
+                    self._ensure_scalar_indexes(vectorstore)
+
+        columns = {vectorstore._text_field: texts, vectorstore._vector_field: vectors}
+        for meta in metadata:
+            for key, value in meta.items():
+                columns.setdefault(key, []).append(value)
+        with metrics.span("insert", collection=self.collection_name):
+            vectorstore.col.insert([columns[field] for field in vectorstore.fields if field in columns])
+
 
     def delete(self,collection_name):
 
@@ -99,4 +213,5 @@ class Writer:
         vectorstore = Milvus(collection_name=collection_name)
 
         # Perform deletion
-        vectorstore.delete_collection()
\ No newline at end of file
+        vectorstore.delete_collection()
+        bump_version(collection_name)
\ No newline at end of file
@@ -0,0 +1,74 @@
+import os
+import sys
+import argparse
+import numpy as np
+import faiss
+from components_all.faiss_index import INDEX_TYPES, format_report, index_kind, recall_report
+from components_all.faiss_store import INDEX_FILE, data_dir
+
+
+def load_vectors(index_dir):
+    """
+    Reads the vectors of a saved FAISS index. Only flat indexes store them exactly; the
+    others reconstruct approximations (or nothing), which would skew the comparison.
+
+    Args:
+        index_dir (str): Namespace directory of an `IncrementalFaissStore` (or a directory
+            written by `save_local`).
+
+    Returns:
+        np.ndarray: The vectors.
+
+    Raises:
+        ValueError: If the index is not a flat index.
+    """
+    index = faiss.read_index(os.path.join(data_dir(index_dir), INDEX_FILE))
+    kind = index_kind(index)
+    if kind != "flat":
+        raise ValueError(
+            f"{index_dir} holds a {kind} index, whose vectors cannot be read back exactly; "
+            "rebuild it with FAISS_INDEX_TYPE=flat or use --synthetic."
+        )
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(n, dim, clusters, seed):
+    """Clustered unit vectors, which behave more like text embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall@k and latency of FAISS index types against exact search.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--index-dir", help="Saved flat FAISS index to take the corpus vectors from.")
+    source.add_argument("--synthetic", type=int, metavar="N", help="Use N synthetic clustered vectors.")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query.")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES, help="Index types to compare.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.index_dir:
+        try:
+            vectors = load_vectors(args.index_dir)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dim, max(1, args.synthetic // 200), args.seed)
+
+    # Queries are perturbed corpus vectors: close to real documents, but not exact copies.
+    rng = np.random.default_rng(args.seed + 1)
+    picks = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32)
+
+    print(f"Corpus: {len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries")
+    print(format_report(recall_report(vectors, queries, args.types, args.k), args.k))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from typing import Any, Callable, Dict, List, Tuple
+
+# Benchmark runs must not bump the version counters of real collections and indexes.
+os.environ.setdefault("INDEX_VERSION_DIR", os.path.join(tempfile.gettempdir(), "bench_index_versions"))
+
+# The ingestion modules in components/ import each other by bare name (they are run from that
+# directory), so that directory must be importable too.
+COMPONENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "components")
+if COMPONENTS_DIR not in sys.path:
+    sys.path.insert(0, COMPONENTS_DIR)
+
+import fitz
+import writer as writer_module
+import retriever as retriever_module
+from reader import Reader
+from preprocessor import Preprocessor
+from collector import InfoCollector
+from fakes import FakeChatModel, FakeEmbeddings, FakeMilvus
+from components_all.processing import process_text_data
+from components_all.faiss_store import IncrementalFaissStore
+from components_all.query_engine import QueryEngine
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_TOLERANCE = 0.25
+# Slowdowns smaller than this are timer noise, whatever their ratio.
+MIN_REGRESSION_SECONDS = 0.01
+STAGES = (
+    "extraction", "cleaning_splitting", "metadata", "write",
+    "faiss_build", "faiss_load", "retrieval_milvus", "retrieval_faiss",
+)
+
+_WORDS = (
+    "library archive catalogue manuscript chapter volume edition index reference citation "
+    "history science theory method analysis result evidence argument source author reader "
+    "river mountain city harbour empire trade language music painting garden engine signal "
+    "memory network protein climate ocean planet energy matter light sound number proof"
+).split()
+
+
+def make_corpus(directory: str, n_pdfs: int, pages: int, seed: int = 0) -> List[str]:
+    """
+    Writes a deterministic synthetic PDF corpus: pages of generated prose with a running
+    header and a page-number footer (which the extraction drops).
+
+    Args:
+        directory (str): Output directory.
+        n_pdfs (int): Number of PDFs.
+        pages (int): Pages per PDF.
+        seed (int, optional): Seed of the text generator. Defaults to 0.
+
+    Returns:
+        List[str]: Paths of the PDFs.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for book in range(n_pdfs):
+        document = fitz.open()
+        for number in range(1, pages + 1):
+            page = document.new_page()
+            page.insert_text((72, 30), f"Synthetic Book {book}", fontsize=9)
+            sentences = []
+            for _ in range(28):
+                words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 16))]
+                sentences.append(" ".join(words).capitalize() + ".")
+            page.insert_textbox(fitz.Rect(72, 72, 540, 760), " ".join(sentences), fontsize=10)
+            page.insert_text((300, 820), str(number), fontsize=9)
+        path = os.path.join(directory, f"book_{book:03d}.pdf")
+        document.save(path)
+        document.close()
+        paths.append(path)
+    return paths
+
+
+class Suite:
+    """
+    One run of every stage on a synthetic corpus, fully offline: a deterministic fake
+    embedder and chat model, and Milvus Lite or the in-process FakeMilvus.
+
+    Attributes:
+        workdir (str): Scratch directory for FAISS indexes.
+        queries (int): Queries per retrieval stage.
+        k (int): Chunks retrieved per query.
+    """
+
+    def __init__(self, workdir: str, pdfs: List[str], queries: int, k: int, run: int):
+        self.workdir = workdir
+        self.pdfs = pdfs
+        self.queries = queries
+        self.k = k
+        self.collection = f"bench_{run}"
+        self.embeddings = FakeEmbeddings()
+        self.state: Dict[str, Any] = {}
+
+    def extraction(self) -> Tuple[int, str]:
+        self.state["pdf_text"] = {path: Reader(path).extract_text() for path in self.pdfs}
+        return sum(len(pages) for pages in self.state["pdf_text"].values()), "pages"
+
+    def cleaning_splitting(self) -> Tuple[int, str]:
+        page_chunks = {}
+        for path, pages in self.state["pdf_text"].items():
+            preprocessor = Preprocessor(dict(pages))
+            preprocessor.clean_text()
+            page_chunks[path] = preprocessor.text_splitting(CHUNK_SIZE, CHUNK_OVERLAP)
+        self.state["page_chunks"] = page_chunks
+        # The FAISS side splits the page records produced by ingest_pdf_data.
+        records = [
+            {"text": text, "pdf": os.path.basename(path), "page": page}
+            for path, pages in self.state["pdf_text"].items()
+            for page, text in pages.items() if text.strip()
+        ]
+        self.state["records"] = process_text_data(records)
+        return sum(len(c) for chunks in page_chunks.values() for c in chunks.values()), "chunks"
+
+    def metadata(self) -> Tuple[int, str]:
+        metadata = []
+        for path, page_chunks in self.state["page_chunks"].items():
+            metadata.extend(InfoCollector(model=None).collect_metadata(page_chunks, path))
+        self.state["metadata"] = metadata
+        return len(metadata), "chunks"
+
+    def write(self) -> Tuple[int, str]:
+        metadata = [dict(meta) for meta in self.state["metadata"]]
+        writer = writer_module.Writer(self.collection, self.embeddings, None)
+        writer.save_to_vector_db(metadata)
+        return len(metadata), "chunks"
+
+    def faiss_build(self) -> Tuple[int, str]:
+        index_dir = os.path.join(self.workdir, f"{self.collection}_faiss")
+        store = IncrementalFaissStore(index_dir, self.embeddings)
+        fingerprints = {os.path.basename(path): os.path.basename(path) for path in self.pdfs}
+        store.add_chunks(self.state["records"], fingerprints)
+        store.save()
+        self.state["faiss_dir"] = index_dir
+        return len(self.state["records"]), "chunks"
+
+    def faiss_load(self) -> Tuple[int, str]:
+        self.state["faiss"] = IncrementalFaissStore.load(self.state["faiss_dir"], self.embeddings)
+        return 1, "loads"
+
+    def _queries(self) -> List[str]:
+        rng = random.Random(1)
+        records = self.state["records"]
+        return [rng.choice(records)["chunk_text"][:120] for _ in range(self.queries)]
+
+    def retrieval_milvus(self) -> Tuple[int, str]:
+        retriever = retriever_module.Retriever(self.collection, self.embeddings, None)
+        for query in self._queries():
+            retriever.search(query, self.k)
+        return self.queries, "queries"
+
+    def retrieval_faiss(self) -> Tuple[int, str]:
+        # The query_vector_store path: search, context assembly and (fake) generation.
+        engine = QueryEngine(
+            self.collection, "fake",
+            chat_model=FakeChatModel(), embeddings=self.embeddings,
+        )
+        vector_store = self.state["faiss"].vector_store
+        for query in self._queries():
+            engine.query_vector_store(vector_store, query)
+        return self.queries, "queries"
+
+
+def use_backend(backend: str, workdir: str) -> None:
+    """Points Writer and Retriever at Milvus Lite (a file in `workdir`) or at FakeMilvus."""
+    if backend == "lite":
+        os.environ["MILVUS_URI"] = os.path.join(workdir, "milvus_lite.db")
+    else:
+        FakeMilvus.reset()
+        writer_module.Milvus = FakeMilvus
+        retriever_module.Milvus = FakeMilvus
+
+
+def run_suite(
+    n_pdfs: int, pages: int, queries: int, k: int, repeat: int, backend: str, verbose: bool = False
+) -> Dict[str, Any]:
+    """
+    Runs every stage `repeat` times on fresh state and keeps the median time of each.
+
+    Args:
+        n_pdfs (int): PDFs in the synthetic corpus.
+        pages (int): Pages per PDF.
+        queries (int): Queries per retrieval stage.
+        k (int): Chunks retrieved per query.
+        repeat (int): Runs per stage.
+        backend (str): "fake" or "lite".
+        verbose (bool, optional): Show the output of the stages. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: "config", "environment" and "stages" (name -> "seconds" (median),
+            "runs", "items", "unit" and "per_second").
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    runs: Dict[str, List[float]] = {name: [] for name in STAGES}
+    items: Dict[str, Tuple[int, str]] = {}
+    try:
+        corpus_dir = os.path.join(workdir, "corpus")
+        os.makedirs(corpus_dir)
+        pdfs = make_corpus(corpus_dir, n_pdfs, pages)
+        use_backend(backend, workdir)
+        for run in range(repeat):
+            suite = Suite(workdir, pdfs, queries, k, run)
+            for name in STAGES:
+                stage: Callable[[], Tuple[int, str]] = getattr(suite, name)
+                output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+                with output:
+                    start = time.perf_counter()
+                    items[name] = stage()
+                    runs[name].append(time.perf_counter() - start)
+            print(f"Run {run + 1}/{repeat}: " + ", ".join(f"{name} {runs[name][-1]:.3f}s" for name in STAGES))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stages = {}
+    for name in STAGES:
+        seconds = statistics.median(runs[name])
+        count, unit = items[name]
+        stages[name] = {
+            "seconds": seconds, "runs": runs[name], "items": count, "unit": unit,
+            "per_second": count / seconds if seconds else None,
+        }
+    return {
+        "config": {"pdfs": n_pdfs, "pages": pages, "queries": queries, "k": k, "backend": backend},
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+        "stages": stages,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Finds the stages that got slower than the baseline allows.
+
+    Args:
+        results (Dict[str, Any]): Output of `run_suite`.
+        baseline (Dict[str, Any]): A stored `run_suite` output, optionally with a
+            "tolerance" mapping of stage -> allowed relative slowdown.
+        tolerance (float): Allowed relative slowdown for stages without their own.
+
+    Returns:
+        List[str]: One message per regressed stage.
+
+    Raises:
+        ValueError: If the baseline was recorded with a different configuration.
+    """
+    if baseline.get("config") != results["config"]:
+        raise ValueError(f"Baseline config {baseline.get('config')} differs from this run's {results['config']}.")
+    regressions = []
+    for name, stage in results["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            continue
+        allowed = baseline.get("tolerance", {}).get(name, tolerance)
+        limit = base["seconds"] * (1 + allowed)
+        if stage["seconds"] > limit and stage["seconds"] - base["seconds"] >= MIN_REGRESSION_SECONDS:
+            regressions.append(
+                f"{name}: {stage['seconds']:.3f}s vs baseline {base['seconds']:.3f}s (limit {limit:.3f}s, +{allowed:.0%})"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end ingestion and retrieval benchmark with regression thresholds."
+    )
+    parser.add_argument("--pdfs", type=int, default=8, help="PDFs in the synthetic corpus.")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF.")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per retrieval stage.")
+    parser.add_argument("--k", type=int, default=20, help="Chunks retrieved per query.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (the median is kept).")
+    parser.add_argument("--backend", choices=("auto", "fake", "lite"), default="auto",
+                        help="Milvus Lite, the in-process FakeMilvus, or Lite when installed.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Stored baseline to compare against.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown per stage before failing.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the stages.")
+    args = parser.parse_args()
+
+    backend = args.backend
+    if backend == "auto":
+        try:
+            import milvus_lite  # noqa: F401
+            backend = "lite"
+        except ImportError:
+            backend = "fake"
+
+    results = run_suite(args.pdfs, args.pages, args.queries, args.k, args.repeat, backend, args.verbose)
+    for name, stage in results["stages"].items():
+        print(f"{name:>18}: {stage['seconds']:8.3f}s | {stage['per_second']:10.1f} {stage['unit']}/s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Stored the baseline in {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one.")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    try:
+        regressions = compare(results, baseline, args.tolerance)
+    except ValueError as e:
+        print(e)
+        return 2
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        return 1
+    print("No stage regressed past the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Context budget in (estimated) tokens for the retrieved text put into a prompt.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_MMR = os.getenv("CONTEXT_MMR", "0") == "1"
+
+# Chunks are written with chunk_overlap=200; look for shared text a bit beyond that.
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 20
+DUPLICATE_THRESHOLD = 0.8
+MMR_LAMBDA = 0.7
+SHINGLE_SIZE = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of a text (~4 characters per token for English prose)."""
+    return (len(text) + 3) // 4
+
+
+def _shingles(text: str) -> frozenset:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _covered(a: frozenset, b: frozenset) -> float:
+    # Share of a's shingles that also appear in b (1.0 when a is a part of b).
+    if not a:
+        return 1.0
+    return len(a & b) / len(a)
+
+
+def merge_overlap(first: str, second: str) -> Optional[str]:
+    """
+    Joins two chunks when one contains the other or the end of `first` is the start of
+    `second` (as with chunks split with an overlap).
+
+    Args:
+        first (str): Earlier chunk.
+        second (str): Later chunk.
+
+    Returns:
+        Optional[str]: The merged text, or None if the chunks do not overlap.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+    head = second[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return None
+    window = max(0, len(first) - MAX_OVERLAP_CHARS)
+    start = first.find(head, window)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first[:start] + second
+        start = first.find(head, start + 1)
+    return None
+
+
+class ContextBudgeter:
+    """
+    Assembles retrieved chunks into prompt context: merges overlapping chunks of the same
+    pdf page, drops near-duplicates, optionally reorders for diversity (lexical MMR), and
+    packs the result into a token budget, most relevant first.
+
+    Attributes:
+        token_budget (int): Maximum estimated tokens of context.
+        duplicate_threshold (float): Share of a chunk's word shingles already present in a
+            more relevant chunk above which it is dropped as a near-duplicate.
+        mmr (bool): Reorder with maximal marginal relevance.
+        mmr_lambda (float): MMR trade-off between relevance (1.0) and diversity (0.0).
+    """
+
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        duplicate_threshold: float = DUPLICATE_THRESHOLD,
+        mmr: bool = CONTEXT_MMR,
+        mmr_lambda: float = MMR_LAMBDA,
+    ):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.mmr = mmr
+        self.mmr_lambda = mmr_lambda
+
+    def assemble(
+        self, texts: List[str], metadatas: List[Dict[str, Any]]
+    ) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Builds the context for one query.
+
+        Args:
+            texts (List[str]): Retrieved chunk texts, most relevant first.
+            metadatas (List[Dict[str, Any]]): Their metadata ("pdf", "page").
+
+        Returns:
+            Tuple[List[str], List[Dict[str, Any]], Dict[str, int]]: The context texts and
+                their metadata, most relevant first, and a report with "chunks_in",
+                "chunks_out", "tokens_in", "tokens_out" and "tokens_saved".
+        """
+        items = self._merge(list(zip(texts, metadatas)))
+        items = self._dedupe(items)
+        if self.mmr:
+            items = self._mmr(items)
+        items = self._pack(items)
+
+        tokens_in = sum(estimate_tokens(text) for text in texts)
+        tokens_out = sum(estimate_tokens(text) for text, _, _ in items)
+        report = {
+            "chunks_in": len(texts),
+            "chunks_out": len(items),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
+        print(
+            f"Context: {report['chunks_in']} -> {report['chunks_out']} chunks, "
+            f"~{tokens_in} -> ~{tokens_out} tokens (saved ~{report['tokens_saved']})"
+        )
+        return [text for text, _, _ in items], [metadata for _, metadata, _ in items], report
+
+    def _merge(self, pairs: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any], frozenset]]:
+        # A merged chunk keeps the rank of its best-ranked part.
+        merged: List[List[Any]] = []
+        for text, metadata in pairs:
+            key = (metadata.get("pdf"), metadata.get("page"))
+            for item in merged:
+                if item[2] != key:
+                    continue
+                joined = merge_overlap(item[0], text) or merge_overlap(text, item[0])
+                if joined is not None:
+                    item[0] = joined
+                    break
+            else:
+                merged.append([text, metadata, key])
+        # A merge can make two earlier entries overlap through the new text; repeat until stable.
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(merged)):
+                for j in range(i + 1, len(merged)):
+                    if merged[i][2] != merged[j][2]:
+                        continue
+                    joined = merge_overlap(merged[i][0], merged[j][0]) or merge_overlap(merged[j][0], merged[i][0])
+                    if joined is not None:
+                        merged[i][0] = joined
+                        del merged[j]
+                        changed = True
+                        break
+                if changed:
+                    break
+        return [(text, metadata, _shingles(text)) for text, metadata, _ in merged]
+
+    def _dedupe(self, items: List[Tuple[str, Dict[str, Any], frozenset]]) -> List[Tuple[str, Dict[str, Any], frozenset]]:
+        kept = []
+        for item in items:
+            if all(_covered(item[2], other[2]) < self.duplicate_threshold for other in kept):
+                kept.append(item)
+        return kept
+
+    def _mmr(self, items: List[Tuple[str, Dict[str, Any], frozenset]]) -> List[Tuple[str, Dict[str, Any], frozenset]]:
+        # Relevance is taken from the retrieval rank (1.0 for the best hit, falling linearly).
+        n = len(items)
+        remaining = list(range(n))
+        chosen: List[int] = []
+        while remaining:
+            def score(i):
+                relevance = 1.0 - i / n
+                redundancy = max((_jaccard(items[i][2], items[j][2]) for j in chosen), default=0.0)
+                return self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+            best = max(remaining, key=score)
+            chosen.append(best)
+            remaining.remove(best)
+        return [items[i] for i in chosen]
+
+    def _pack(self, items: List[Tuple[str, Dict[str, Any], frozenset]]) -> List[Tuple[str, Dict[str, Any], frozenset]]:
+        packed, used = [], 0
+        for text, metadata, shingles in items:
+            tokens = estimate_tokens(text)
+            if used + tokens <= self.token_budget:
+                packed.append((text, metadata, shingles))
+                used += tokens
+            elif not packed:
+                # The best hit alone is over budget: keep its head, cut at a word boundary.
+                head = text[:self.token_budget * 4].rsplit(" ", 1)[0]
+                packed.append((head, metadata, shingles))
+                break
+        return packed
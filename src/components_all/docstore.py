@@ -0,0 +1,155 @@
+import os
+import json
+from typing import Any, Dict, Iterable, List, Union
+import numpy as np
+from langchain.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+# On-disk layout of a compact docstore. Row i holds the chunk at FAISS position i.
+TEXTS_FILE = "texts.bin"          # every chunk text, UTF-8, back to back
+OFFSETS_FILE = "offsets.npy"      # int64[n + 1] byte offsets into texts.bin
+IDS_FILE = "ids.npy"              # unicode[n] docstore ids
+PDF_CODES_FILE = "pdf_codes.npy"  # int32[n] index into pdfs.json, -1 if none
+PAGES_FILE = "pages.npy"          # int32[n] page number, -1 if none
+PDFS_FILE = "pdfs.json"           # distinct pdf names
+
+METADATA_COLUMNS = ("pdf", "page")
+
+
+def write_docstore(documents: Iterable[Document], ids: List[str], directory: str) -> None:
+    """
+    Writes documents in the compact layout: one text blob with an offset table, and the
+    metadata as integer columns. Nothing is pickled, and every file can be memory-mapped.
+
+    Args:
+        documents (Iterable[Document]): Documents in FAISS position order.
+        ids (List[str]): Their docstore ids.
+        directory (str): Target directory (must exist).
+
+    Raises:
+        ValueError: If a document has metadata other than "pdf" and "page".
+    """
+    offsets = [0]
+    pdf_names: Dict[str, int] = {}
+    pdf_codes, pages = [], []
+    with open(os.path.join(directory, TEXTS_FILE), "wb") as f:
+        for doc in documents:
+            extra = set(doc.metadata) - set(METADATA_COLUMNS)
+            if extra:
+                raise ValueError(f"Compact docstore only stores {METADATA_COLUMNS} metadata, got {sorted(extra)}.")
+            data = doc.page_content.encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            pdf = doc.metadata.get("pdf")
+            pdf_codes.append(-1 if pdf is None else pdf_names.setdefault(pdf, len(pdf_names)))
+            page = doc.metadata.get("page")
+            pages.append(-1 if page is None else page)
+
+    np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(directory, IDS_FILE), np.asarray(ids, dtype=str))
+    np.save(os.path.join(directory, PDF_CODES_FILE), np.asarray(pdf_codes, dtype=np.int32))
+    np.save(os.path.join(directory, PAGES_FILE), np.asarray(pages, dtype=np.int32))
+    with open(os.path.join(directory, PDFS_FILE), "w", encoding="utf-8") as f:
+        json.dump(list(pdf_names), f)
+
+
+def has_docstore(directory: str) -> bool:
+    """Returns True if `directory` holds a compact docstore."""
+    return os.path.exists(os.path.join(directory, OFFSETS_FILE))
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    Read-mostly docstore over the files written by `write_docstore`. The text blob and the
+    columns are memory-mapped, so opening is cheap, only the pages that searches touch are
+    read, and processes serving the same index share them through the OS page cache.
+
+    Documents added or deleted after opening are kept in an in-memory overlay until the
+    store is written again.
+
+    Attributes:
+        directory (str): Directory the docstore was read from.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._texts = np.memmap(os.path.join(directory, TEXTS_FILE), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(directory, TEXTS_FILE)) else np.zeros(0, dtype=np.uint8)
+        self._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self._pdf_codes = np.load(os.path.join(directory, PDF_CODES_FILE), mmap_mode="r")
+        self._pages = np.load(os.path.join(directory, PAGES_FILE), mmap_mode="r")
+        with open(os.path.join(directory, PDFS_FILE), "r", encoding="utf-8") as f:
+            self._pdfs = json.load(f)
+        self.ids: List[str] = np.load(os.path.join(directory, IDS_FILE)).tolist()
+        self._rows = {id_: row for row, id_ in enumerate(self.ids)}
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+
+    def __len__(self) -> int:
+        return len(self._rows) - len(self._deleted) + len(self._added)
+
+    def search(self, search: str) -> Union[str, Document]:
+        """
+        Looks up a document by id.
+
+        Args:
+            search (str): Docstore id.
+
+        Returns:
+            Union[str, Document]: The document, or a message if it is not found (the same
+                contract as langchain's InMemoryDocstore).
+        """
+        if search in self._added:
+            return self._added[search]
+        row = self._rows.get(search)
+        if row is None or search in self._deleted:
+            return f"ID {search} not found."
+        start, end = self._offsets[row], self._offsets[row + 1]
+        metadata: Dict[str, Any] = {}
+        if self._pdf_codes[row] >= 0:
+            metadata["pdf"] = self._pdfs[self._pdf_codes[row]]
+        if self._pages[row] >= 0:
+            metadata["page"] = int(self._pages[row])
+        text = self._texts[start:end].tobytes().decode("utf-8")
+        return Document(id=search, page_content=text, metadata=metadata)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """
+        Adds documents to the overlay.
+
+        Args:
+            texts (Dict[str, Document]): Documents by id.
+
+        Raises:
+            ValueError: If an id is already present.
+        """
+        overlapping = [id_ for id_ in texts if self._exists(id_)]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids: List) -> None:
+        """
+        Deletes documents by id.
+
+        Args:
+            ids (List): Docstore ids.
+
+        Raises:
+            ValueError: If an id is not present.
+        """
+        missing = [id_ for id_ in ids if not self._exists(id_)]
+        if missing:
+            raise ValueError(f"Tried to delete ids that do not exist: {missing}")
+        for id_ in ids:
+            if self._added.pop(id_, None) is None:
+                self._deleted.add(id_)
+
+    def _exists(self, id_: str) -> bool:
+        return id_ in self._added or (id_ in self._rows and id_ not in self._deleted)
+
+    def resident_bytes(self) -> int:
+        """Approximate heap memory held outside the memory-mapped files (ids and overlay)."""
+        overlay = sum(len(doc.page_content) for doc in self._added.values())
+        return 100 * len(self._rows) + overlay
+
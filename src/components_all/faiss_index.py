@@ -0,0 +1,246 @@
+import math
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import faiss
+
+# Index types accepted by `new_faiss_index`. "auto" picks one from the corpus size.
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sqfp16")
+
+# Corpus sizes (number of chunks) at which "auto" moves to a cheaper index.
+AUTO_THRESHOLDS = (
+    (20_000, "flat"),
+    (200_000, "hnsw"),
+    (1_000_000, "ivf_flat"),
+)
+AUTO_LARGEST = "ivf_pq"
+
+TRAIN_SAMPLE_SIZE = 50_000
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+
+# Only flat indexes support langchain's in-place delete (remove_ids with renumbering).
+DELETABLE_TYPES = ("flat",)
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """
+    Picks an index type for a corpus size: exact search while it is cheap, then HNSW, then
+    IVF, and product quantization once the float vectors no longer fit comfortably in RAM.
+
+    Args:
+        n_vectors (int): Number of vectors in the corpus.
+
+    Returns:
+        str: One of INDEX_TYPES.
+    """
+    for limit, index_type in AUTO_THRESHOLDS:
+        if n_vectors < limit:
+            return index_type
+    return AUTO_LARGEST
+
+
+def resolve_index_type(index_type: str, n_vectors: int) -> str:
+    """
+    Resolves "auto" and validates the index type.
+
+    Args:
+        index_type (str): Configured index type or "auto".
+        n_vectors (int): Number of vectors in the corpus.
+
+    Returns:
+        str: One of INDEX_TYPES.
+
+    Raises:
+        ValueError: If the index type is unknown.
+    """
+    index_type = (index_type or "auto").lower()
+    if index_type == "auto":
+        return choose_index_type(n_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'. Expected 'auto' or one of {INDEX_TYPES}.")
+    return index_type
+
+
+def _ivf_lists(n_train: int) -> int:
+    # ~4*sqrt(n) lists, with at least 39 training points per list as faiss recommends.
+    return max(1, min(int(4 * math.sqrt(n_train)), n_train // 39))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    for m in (96, 64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 4:
+            return m
+    return 1
+
+
+def factory_string(index_type: str, dim: int, n_train: int) -> str:
+    """
+    Builds the `faiss.index_factory` description for an index type.
+
+    Args:
+        index_type (str): One of INDEX_TYPES.
+        dim (int): Vector dimension.
+        n_train (int): Number of training vectors available.
+
+    Returns:
+        str: Factory string, e.g. "IVF256,PQ48x8np".
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M}"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "sqfp16":
+        return "SQfp16"
+    nlist = _ivf_lists(n_train)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    # 8-bit codes need 256 centroids per sub-quantizer; use fewer bits on small samples.
+    nbits = max(1, min(8, int(math.log2(max(2, n_train // 39)))))
+    # "np" skips polysemous training, which only helps Hamming-filtered search (not used here).
+    return f"IVF{nlist},PQ{_pq_subquantizers(dim)}x{nbits}np"
+
+
+def new_faiss_index(
+    vectors: Sequence[Sequence[float]],
+    index_type: str = "auto",
+    sample_size: int = TRAIN_SAMPLE_SIZE,
+    seed: int = 0,
+) -> Any:
+    """
+    Creates an empty FAISS index of the requested type, trained on a random sample of
+    `vectors` if the type needs training. The vectors themselves are not added, so the
+    result can be handed to langchain's FAISS, which adds them along with the docstore.
+
+    Args:
+        vectors (Sequence[Sequence[float]]): Corpus vectors (used for the dimension, the
+            auto choice and training).
+        index_type (str, optional): One of INDEX_TYPES or "auto". Defaults to "auto".
+        sample_size (int, optional): Maximum number of training vectors. Defaults to TRAIN_SAMPLE_SIZE.
+        seed (int, optional): Seed for the training sample. Defaults to 0.
+
+    Returns:
+        faiss.Index: Trained, empty index using L2 distance.
+    """
+    data = np.asarray(vectors, dtype=np.float32)
+    index_type = resolve_index_type(index_type, len(data))
+    if len(data) > sample_size:
+        rng = np.random.default_rng(seed)
+        sample = data[rng.choice(len(data), sample_size, replace=False)]
+    else:
+        sample = data
+
+    index = faiss.index_factory(data.shape[1], factory_string(index_type, data.shape[1], len(sample)))
+    if not index.is_trained:
+        index.train(sample)
+    set_search_params(index)
+    return index
+
+
+def set_search_params(index: Any, ef_search: int = HNSW_EF_SEARCH, nprobe: int = IVF_NPROBE) -> None:
+    """
+    Sets the query-time knobs of an approximate index (no-op for exact indexes).
+
+    Args:
+        index (faiss.Index): The index.
+        ef_search (int, optional): HNSW candidate list size. Defaults to HNSW_EF_SEARCH.
+        nprobe (int, optional): IVF lists probed per query. Defaults to IVF_NPROBE.
+    """
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+
+
+def index_kind(index: Any) -> str:
+    """
+    Names the type of an existing index.
+
+    Args:
+        index (faiss.Index): The index.
+
+    Returns:
+        str: One of INDEX_TYPES.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sqfp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
+
+
+def recall_report(
+    vectors: Sequence[Sequence[float]],
+    queries: Sequence[Sequence[float]],
+    index_types: Sequence[str] = INDEX_TYPES,
+    k: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    Measures recall@k and query latency of each index type against exact search.
+
+    Args:
+        vectors (Sequence[Sequence[float]]): Corpus vectors.
+        queries (Sequence[Sequence[float]]): Query vectors.
+        index_types (Sequence[str], optional): Index types to compare. Defaults to INDEX_TYPES.
+        k (int, optional): Neighbours per query. Defaults to 10.
+
+    Returns:
+        List[Dict[str, Any]]: One row per index type with "index_type", "factory", "recall",
+            "ms_per_query", "build_s" and "bytes" (serialized index size).
+    """
+    data = np.asarray(vectors, dtype=np.float32)
+    query_data = np.asarray(queries, dtype=np.float32)
+    exact = faiss.IndexFlatL2(data.shape[1])
+    exact.add(data)
+    _, truth = exact.search(query_data, k)
+
+    rows = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = new_faiss_index(data, index_type)
+        index.add(data)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, found = index.search(query_data, k)
+        elapsed = time.perf_counter() - start
+
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        rows.append({
+            "index_type": index_type,
+            "factory": factory_string(index_type, data.shape[1], min(len(data), TRAIN_SAMPLE_SIZE)),
+            "recall": hits / (len(query_data) * k),
+            "ms_per_query": 1000 * elapsed / len(query_data),
+            "build_s": build_s,
+            "bytes": faiss.serialize_index(index).size,
+        })
+    return rows
+
+
+def format_report(rows: List[Dict[str, Any]], k: Optional[int] = 10) -> str:
+    """
+    Formats `recall_report` rows as a table.
+
+    Args:
+        rows (List[Dict[str, Any]]): Report rows.
+        k (int, optional): The k the report was run with, for the header. Defaults to 10.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'index':>9} {'factory':>16} {f'recall@{k}':>10} {'ms/query':>9} {'build s':>8} {'size MiB':>9}"]
+    for row in rows:
+        lines.append(
+            f"{row['index_type']:>9} {row['factory']:>16} {row['recall']:10.3f} {row['ms_per_query']:9.3f} "
+            f"{row['build_s']:8.2f} {row['bytes'] / 2**20:9.1f}"
+        )
+    return "\n".join(lines)
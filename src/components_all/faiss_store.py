@@ -0,0 +1,418 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from typing import Any, Dict, List, Optional
+import faiss
+from langchain.vectorstores import FAISS
+from langchain.docstore.in_memory import InMemoryDocstore
+from components_all.faiss_index import (
+    DELETABLE_TYPES, choose_index_type, index_kind, new_faiss_index, set_search_params
+)
+from components_all.docstore import CompactDocstore, has_docstore, write_docstore
+from components.index_version import bump_version
+from components import metrics
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+# Names the version directory an index is served from (see `IncrementalFaissStore.save`).
+POINTER_FILE = "CURRENT"
+
+
+def fingerprint(pdf: Any) -> str:
+    """
+    Returns the SHA-256 of an uploaded file's contents.
+
+    Args:
+        pdf (Any): Uploaded file (Streamlit UploadedFile or any object with getvalue/read).
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    data = pdf.getvalue() if hasattr(pdf, "getvalue") else pdf.read()
+    return hashlib.sha256(data).hexdigest()
+
+
+def faiss_from_embeddings(
+    texts: List[str],
+    vectors: List[List[float]],
+    embeddings: Any,
+    metadatas: Optional[List[Dict[str, Any]]] = None,
+    ids: Optional[List[str]] = None,
+    index_type: str = "auto",
+) -> FAISS:
+    """
+    Builds a langchain FAISS store on an index of the requested type (see `faiss_index`),
+    trained on a sample of `vectors` when the type needs training.
+
+    Args:
+        texts (List[str]): Chunk texts.
+        vectors (List[List[float]]): Their embeddings.
+        embeddings: Embeddings used for queries.
+        metadatas (List[Dict[str, Any]], optional): Metadata of each chunk.
+        ids (List[str], optional): Docstore ids of each chunk.
+        index_type (str, optional): Index type or "auto". Defaults to "auto".
+
+    Returns:
+        FAISS: The store.
+    """
+    vector_store = FAISS(embeddings, new_faiss_index(vectors, index_type), InMemoryDocstore(), {})
+    vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    return vector_store
+
+
+def load_faiss(index_dir: str, embeddings: Any) -> Optional[FAISS]:
+    """
+    Opens a persisted FAISS store. The compact format is memory-mapped read-only: the index
+    codes, chunk texts and metadata columns stay in the OS page cache, which every process
+    serving the same index shares. Directories written by langchain's `save_local` (pickled
+    docstore) are still read, and are converted to the compact format on their next save.
+
+    Args:
+        index_dir (str): Directory the index is persisted to.
+        embeddings: Embeddings used for queries.
+
+    Returns:
+        Optional[FAISS]: The store, or None if there is no index in `index_dir`.
+    """
+    index_dir = data_dir(index_dir)
+    index_path = os.path.join(index_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    if not has_docstore(index_dir):
+        vector_store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    else:
+        docstore = CompactDocstore(index_dir)
+        vector_store = FAISS(embeddings, _read_index_mapped(index_path), docstore, dict(enumerate(docstore.ids)))
+    set_search_params(vector_store.index)
+    return vector_store
+
+
+def save_faiss(vector_store: FAISS, index_dir: str) -> None:
+    """
+    Writes a FAISS store in the compact format (see `docstore`), without pickling.
+
+    Args:
+        vector_store (FAISS): The store.
+        index_dir (str): Target directory (must exist).
+    """
+    ids = [vector_store.index_to_docstore_id[position] for position in sorted(vector_store.index_to_docstore_id)]
+    write_docstore((vector_store.docstore.search(id_) for id_ in ids), ids, index_dir)
+    faiss.write_index(vector_store.index, os.path.join(index_dir, INDEX_FILE))
+
+
+def read_pointer(index_dir: str) -> Optional[str]:
+    """Returns the version directory an index is served from, or None for an unversioned one."""
+    try:
+        with open(os.path.join(index_dir, POINTER_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def data_dir(index_dir: str) -> str:
+    """Returns the directory holding an index's files: its current version, or `index_dir` itself."""
+    version = read_pointer(index_dir)
+    return os.path.join(index_dir, version) if version else index_dir
+
+
+def _write_pointer(index_dir: str, version: str) -> None:
+    tmp_path = os.path.join(index_dir, f".{POINTER_FILE}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    for attempt in range(10):
+        try:
+            os.replace(tmp_path, os.path.join(index_dir, POINTER_FILE))
+            return
+        except PermissionError:
+            # Windows refuses while another process is reading the pointer; it reads it briefly.
+            if attempt == 9:
+                raise
+            time.sleep(0.05)
+
+
+def _remove_old_versions(index_dir: str, older_than: str) -> None:
+    """
+    Deletes version directories (and unversioned files) older than `older_than`. Versions
+    still mapped by another process cannot be deleted on Windows; they are retried on a
+    later save. Newer ones may be being written by another process and are left alone.
+    """
+    for entry in os.scandir(index_dir):
+        name = entry.name
+        if name == POINTER_FILE or name.startswith(f".{POINTER_FILE}."):
+            continue
+        if entry.is_dir():
+            version = name[1:-len(".tmp")] if name.startswith(".") and name.endswith(".tmp") else name
+            if version < older_than:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            # Files of the layout before versioned saves.
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def version_key(index_dir: str) -> str:
+    """Key of an index directory's version counter (see `components.index_version`)."""
+    return f"faiss:{os.path.abspath(index_dir)}"
+
+
+def is_mapped(vector_store: Optional[FAISS]) -> bool:
+    """Returns True if the store is backed by memory-mapped (read-only) files."""
+    return vector_store is not None and isinstance(vector_store.docstore, CompactDocstore)
+
+
+def _read_index_mapped(index_path: str) -> Any:
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(index_path, flags)
+    except RuntimeError:
+        # Older faiss builds cannot map every index type; fall back to reading it into RAM.
+        return faiss.read_index(index_path)
+
+
+class IncrementalFaissStore:
+    """
+    A FAISS index that is updated in place instead of rebuilt: it remembers which files it
+    holds (by name and content hash) and the docstore ids of each file's chunks, so new
+    files are embedded and appended, changed files are replaced and a single file can be
+    removed. Each save writes a new version directory and then switches the `CURRENT`
+    pointer file to it with `os.replace`, so a crash never leaves a half-written index behind
+    and files still memory-mapped by readers are never renamed or deleted in place (which
+    Windows refuses). Old versions are deleted lazily by later saves.
+
+    With `index_type="auto"` the index starts exact and is rebuilt as a cheaper approximate
+    index once the corpus crosses the size thresholds in `faiss_index`. Index types that
+    cannot delete in place are rebuilt without the removed file.
+
+    A loaded index is memory-mapped read-only; the first change copies the index into RAM
+    (the docstore keeps changes in an overlay), and saving maps the new files again.
+
+    Attributes:
+        index_dir (str): Directory the index is persisted to.
+        embeddings: Embeddings used for new chunks and for queries.
+        index_type (str): Configured index type or "auto".
+        vector_store (Optional[FAISS]): The index, or None while it is empty.
+        files (Dict[str, Dict[str, Any]]): File name -> {"sha256", "ids"}.
+        version (Optional[str]): Version directory the store was loaded from or saved to.
+    """
+
+    def __init__(self, index_dir: str, embeddings: Any, index_type: str = "auto"):
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.index_type = index_type
+        self.vector_store: Optional[FAISS] = None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.version: Optional[str] = None
+        self._mapped = False
+
+    @classmethod
+    def load(cls, index_dir: str, embeddings: Any, index_type: str = "auto") -> "IncrementalFaissStore":
+        """
+        Opens the index persisted in `index_dir`, or an empty store if there is none.
+
+        Args:
+            index_dir (str): Directory the index is persisted to.
+            embeddings: Embeddings used for new chunks and for queries.
+            index_type (str, optional): Index type or "auto". Defaults to "auto".
+
+        Returns:
+            IncrementalFaissStore: The store.
+        """
+        store = cls(index_dir, embeddings, index_type)
+        _recover_interrupted_swap(index_dir)
+        store.version = read_pointer(index_dir)
+        store.vector_store = load_faiss(store.data_dir, embeddings)
+        store._mapped = is_mapped(store.vector_store)
+        manifest = os.path.join(store.data_dir, MANIFEST_FILE)
+        if os.path.exists(manifest):
+            with open(manifest, "r", encoding="utf-8") as f:
+                store.files = json.load(f)["files"]
+        return store
+
+    def changed_files(self, pdf_docs: List[Any]) -> Dict[str, str]:
+        """
+        Finds the uploads that are not indexed yet or whose contents changed.
+
+        Args:
+            pdf_docs (List[Any]): Uploaded files.
+
+        Returns:
+            Dict[str, str]: File name -> content hash for the files that need indexing.
+        """
+        changed = {}
+        for pdf in pdf_docs:
+            sha256 = fingerprint(pdf)
+            if self.files.get(pdf.name, {}).get("sha256") != sha256:
+                changed[pdf.name] = sha256
+        return changed
+
+    def add_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        fingerprints: Dict[str, str],
+        vectors: Optional[List[List[float]]] = None,
+    ) -> int:
+        """
+        Embeds and appends chunk records, replacing earlier versions of the same files.
+
+        Args:
+            chunks (List[Dict[str, Any]]): Chunk records from `process_text_data`.
+            fingerprints (Dict[str, str]): File name -> content hash, from `changed_files`.
+            vectors (List[List[float]], optional): Embeddings of the chunks, if they were
+                computed beforehand (see `jobs`); embedded here otherwise.
+
+        Returns:
+            int: Number of chunks added.
+        """
+        texts = [chunk["chunk_text"] for chunk in chunks]
+        metadatas = [{k: v for k, v in chunk.items() if k != "chunk_text"} for chunk in chunks]
+        ids = [str(uuid.uuid4()) for _ in chunks]
+        # Embed before touching the index, so a failed call leaves the store as it was.
+        if vectors is None:
+            with metrics.span("embed"):
+                vectors = self.embeddings.embed_documents(texts) if texts else []
+
+        for name in fingerprints:
+            if name in self.files:
+                self.remove_file(name)
+        # Files without text still get an entry, so they are not parsed again next time.
+        for name, sha256 in fingerprints.items():
+            self.files[name] = {"sha256": sha256, "ids": []}
+        if not texts:
+            return 0
+
+        with metrics.span("index") as labels:
+            if self.vector_store is None:
+                self.vector_store = faiss_from_embeddings(
+                    texts, vectors, self.embeddings, metadatas, ids, self.index_type
+                )
+            else:
+                self._own_index()
+                self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+                if self.index_type == "auto" and choose_index_type(self.vector_store.index.ntotal) != self.kind:
+                    self._rebuild(set())
+            labels["index"] = self.kind
+
+        for chunk, id_ in zip(chunks, ids):
+            self.files.setdefault(chunk["pdf"], {"sha256": None, "ids": []})["ids"].append(id_)
+        return len(chunks)
+
+    def remove_file(self, name: str) -> int:
+        """
+        Removes every chunk of one file from the index.
+
+        Args:
+            name (str): File name.
+
+        Returns:
+            int: Number of chunks removed.
+        """
+        entry = self.files.pop(name, None)
+        if not entry or self.vector_store is None:
+            return 0
+        if len(entry["ids"]) >= self.vector_store.index.ntotal:
+            self.vector_store = None
+            self._mapped = False
+        elif entry["ids"] and self.kind in DELETABLE_TYPES:
+            self._own_index()
+            self.vector_store.delete(entry["ids"])
+        elif entry["ids"]:
+            self._rebuild(set(entry["ids"]))
+        return len(entry["ids"])
+
+    @property
+    def kind(self) -> Optional[str]:
+        """Type of the current index (see `faiss_index.INDEX_TYPES`), or None if empty."""
+        return index_kind(self.vector_store.index) if self.vector_store is not None else None
+
+    @property
+    def data_dir(self) -> str:
+        """Directory holding the files this store was loaded from or saved to."""
+        return os.path.join(self.index_dir, self.version) if self.version else self.index_dir
+
+    def is_current(self) -> bool:
+        """False once another store (e.g. in another process) saved a newer version."""
+        return read_pointer(self.index_dir) == self.version
+
+    @property
+    def version_key(self) -> str:
+        """Key of this index's version counter, bumped on every save."""
+        return version_key(self.index_dir)
+
+    @property
+    def index_mapped(self) -> bool:
+        """True while the index is served from memory-mapped files (not copied into RAM)."""
+        return self._mapped
+
+    def _own_index(self) -> None:
+        """Replaces a memory-mapped (read-only) index with an in-memory copy before a change."""
+        if self._mapped:
+            index = faiss.deserialize_index(faiss.serialize_index(self.vector_store.index))
+            set_search_params(index)
+            self.vector_store.index = index
+            self._mapped = False
+
+    def _rebuild(self, drop_ids: set) -> None:
+        """Rebuilds the index without `drop_ids`, picking the index type for the new size."""
+        old = self.vector_store
+        keep = [
+            (position, doc_id) for position, doc_id in sorted(old.index_to_docstore_id.items())
+            if doc_id not in drop_ids
+        ]
+        docs = [old.docstore.search(doc_id) for _, doc_id in keep]
+        texts = [doc.page_content for doc in docs]
+        if self.kind in ("flat", "hnsw"):
+            # Exact vectors are still in the index.
+            vectors = [old.index.reconstruct(position) for position, _ in keep]
+        else:
+            # Quantized indexes only hold approximations; re-embed (served by the embedding cache).
+            vectors = self.embeddings.embed_documents(texts)
+        self.vector_store = faiss_from_embeddings(
+            texts, vectors, self.embeddings, [doc.metadata for doc in docs],
+            [doc_id for _, doc_id in keep], self.index_type,
+        )
+        self._mapped = False
+
+    def save(self) -> None:
+        """
+        Persists the index and manifest as a new version directory, then points `CURRENT` at
+        it atomically. Readers keep the previous version until they reload.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Named by time so versions sort in save order.
+        version = f"v{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        tmp_dir = os.path.join(self.index_dir, f".{version}.tmp")
+        os.makedirs(tmp_dir)
+        try:
+            if self.vector_store is not None:
+                save_faiss(self.vector_store, tmp_dir)
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump({"files": self.files}, f)
+            # Nothing maps the new directory yet, so renaming it is safe on every platform.
+            os.rename(tmp_dir, os.path.join(self.index_dir, version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        previous = read_pointer(self.index_dir)
+        _write_pointer(self.index_dir, version)
+        self.version = version
+        # Answers cached for the old contents are stale now.
+        bump_version(self.version_key)
+        # Serve from the mapped files again, releasing the in-memory copies.
+        self.vector_store = load_faiss(self.data_dir, self.embeddings)
+        self._mapped = is_mapped(self.vector_store)
+        # The previous version is kept for readers that just resolved the pointer.
+        _remove_old_versions(self.index_dir, min(previous or version, version))
+
+
+def _recover_interrupted_swap(index_dir: str) -> None:
+    """Restores the previous index if a save of the unversioned layout stopped between its two renames."""
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    old_dir = os.path.join(parent, f".{os.path.basename(os.path.abspath(index_dir))}.old")
+    if not os.path.exists(index_dir) and os.path.exists(old_dir):
+        os.rename(old_dir, index_dir)
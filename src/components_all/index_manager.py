@@ -0,0 +1,366 @@
+import os
+import re
+import time
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from components_all.faiss_store import IncrementalFaissStore, is_mapped, version_key
+from components.index_version import bump_version
+
+DEFAULT_BUDGET_BYTES = 1024 * 2**20
+
+_NAMESPACE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Namespaces generated per browser session (see `session.get_namespace`); tenant names are
+# chosen by users and never expire.
+_SESSION_NAMESPACE = re.compile(r"^[0-9a-f]{32}$")
+# Seconds between two sweeps for expired namespaces, and between two refreshes of a
+# namespace directory's last-use time on disk.
+SWEEP_INTERVAL = 600
+TOUCH_INTERVAL = 60
+
+
+def validate_namespace(namespace: str) -> str:
+    """
+    Checks that a namespace is safe to use as a directory name.
+
+    Args:
+        namespace (str): Session id or tenant name.
+
+    Returns:
+        str: The namespace.
+
+    Raises:
+        ValueError: If it contains anything but letters, digits, '_' and '-' (or is too long).
+    """
+    if not isinstance(namespace, str) or not _NAMESPACE.match(namespace):
+        raise ValueError(f"Invalid index namespace {namespace!r}: use 1-64 letters, digits, '_' or '-'.")
+    return namespace
+
+
+def estimate_memory(store: IncrementalFaissStore) -> Dict[str, int]:
+    """
+    Estimates the memory a store holds.
+
+    Args:
+        store (IncrementalFaissStore): The store.
+
+    Returns:
+        Dict[str, int]: "resident_bytes" (private heap: in-memory index codes and graph,
+            docstore, id maps) and "mapped_bytes" (memory-mapped index files, shared with
+            other processes and reclaimable by the OS).
+    """
+    vector_store = store.vector_store
+    if vector_store is None:
+        return {"resident_bytes": 0, "mapped_bytes": 0}
+
+    mapped = is_mapped(vector_store)
+    mapped_bytes = 0
+    if mapped and os.path.isdir(store.data_dir):
+        mapped_bytes = sum(entry.stat().st_size for entry in os.scandir(store.data_dir) if entry.is_file())
+
+    index = vector_store.index
+    resident = 100 * len(vector_store.index_to_docstore_id)
+    if not store.index_mapped:
+        try:
+            code_size = index.sa_code_size()
+        except RuntimeError:
+            code_size = 4 * index.d
+        resident += index.ntotal * code_size
+        if hasattr(index, "hnsw"):
+            resident += index.ntotal * index.hnsw.nb_neighbors(0) * 4
+    docstore = vector_store.docstore
+    if mapped:
+        resident += docstore.resident_bytes()
+    else:
+        resident += sum(200 + len(doc.page_content) for doc in getattr(docstore, "_dict", {}).values())
+    return {"resident_bytes": resident, "mapped_bytes": mapped_bytes}
+
+
+class IndexManager:
+    """
+    Process-wide owner of the FAISS stores of every namespace (one per session or tenant),
+    each persisted in its own directory under `root`. Stores are opened on demand and kept in
+    an LRU; when their combined resident memory exceeds `budget_bytes` the least recently
+    used ones that are not in use are dropped from memory (they are always saved after a
+    change, so they are simply reopened from disk on their next use). Memory-mapped index
+    files do not count: they are page cache the OS reclaims by itself, so evicting their
+    store frees nothing. A store's memory is estimated when it is opened, swapped in or
+    changed, and the budget is only checked then, not on every use.
+
+    Sessions must not keep their own references to stores, or evicted memory is not freed:
+    ask the manager for the store on every use.
+
+    With a `session_ttl`, the indexes of browser sessions (not tenants) that were not used
+    for that long are deleted from disk, so abandoned sessions do not fill it up. Their last
+    use is the modification time of their directory, which every use refreshes, so it is
+    shared by all processes.
+
+    Attributes:
+        root (str): Directory holding one subdirectory per namespace.
+        budget_bytes (int): Budget for the resident memory of all open stores.
+        session_ttl (Optional[float]): Seconds after which an idle session namespace is dropped.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        embeddings_factory: Callable[[], Any],
+        index_type: str = "auto",
+        budget_bytes: int = DEFAULT_BUDGET_BYTES,
+        session_ttl: Optional[float] = None,
+    ):
+        """
+        Args:
+            root (str): Directory holding one subdirectory per namespace.
+            embeddings_factory (Callable[[], Any]): Returns the embeddings for a store.
+            index_type (str, optional): Index type for new stores. Defaults to "auto".
+            budget_bytes (int, optional): Memory budget. Defaults to DEFAULT_BUDGET_BYTES.
+            session_ttl (float, optional): Seconds after which an idle session namespace is
+                deleted. Defaults to None (never).
+        """
+        self.root = root
+        self.embeddings_factory = embeddings_factory
+        self.index_type = index_type
+        self.budget_bytes = budget_bytes
+        self.session_ttl = session_ttl
+        self._last_touched: Dict[str, float] = {}
+        self._last_sweep = 0.0
+        self._stores: "OrderedDict[str, IncrementalFaissStore]" = OrderedDict()
+        self._memory: Dict[str, Dict[str, int]] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._namespace_locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def index_dir(self, namespace: str) -> str:
+        """Returns the directory of a namespace's index."""
+        return os.path.join(self.root, validate_namespace(namespace))
+
+    def get(self, namespace: str) -> IncrementalFaissStore:
+        """
+        Returns a namespace's store, opening it if it is not in memory, or reopening it if
+        another process saved a newer version since it was opened.
+
+        Args:
+            namespace (str): Session id or tenant name.
+
+        Returns:
+            IncrementalFaissStore: The store (possibly empty).
+        """
+        index_dir = self.index_dir(namespace)
+        store = self._cached(namespace)
+        if store is None:
+            # Loaded under the namespace's lock only, so other namespaces are served meanwhile.
+            with self._namespace_lock(namespace):
+                store = self._cached(namespace)
+                if store is None:
+                    store = IncrementalFaissStore.load(index_dir, self.embeddings_factory(), self.index_type)
+                    self._put(namespace, store)
+        self._touch(namespace)
+        self.expire_idle()
+        return store
+
+    def _cached(self, namespace: str) -> Optional[IncrementalFaissStore]:
+        # The open store if it is still the saved version, marked as just used.
+        with self._lock:
+            store = self._stores.get(namespace)
+        # Reads the pointer file, so outside the global lock.
+        if store is None or not store.is_current():
+            return None
+        with self._lock:
+            if namespace in self._stores:
+                self._stores.move_to_end(namespace)
+            self._last_used[namespace] = time.time()
+        return store
+
+    def _put(self, namespace: str, store: IncrementalFaissStore) -> None:
+        memory = estimate_memory(store)
+        with self._lock:
+            self._stores[namespace] = store
+            self._memory[namespace] = memory
+            self._stores.move_to_end(namespace)
+            self._last_used[namespace] = time.time()
+        self.enforce_budget(keep=namespace)
+
+    def _touch(self, namespace: str) -> None:
+        # Refreshes the directory's modification time, the last use seen by every process.
+        now = time.time()
+        with self._lock:
+            if now - self._last_touched.get(namespace, 0.0) < TOUCH_INTERVAL:
+                return
+            self._last_touched[namespace] = now
+        try:
+            os.utime(self.index_dir(namespace))
+        except OSError:
+            pass  # nothing saved yet
+
+    def _namespace_lock(self, namespace: str) -> threading.RLock:
+        # Reentrant: `locked` opens the store through `get`, which may take it to load it.
+        with self._lock:
+            return self._namespace_locks.setdefault(namespace, threading.RLock())
+
+    @contextmanager
+    def locked(self, namespace: str) -> Iterator[IncrementalFaissStore]:
+        """
+        Gives exclusive use of a namespace's store for a change (sessions of one tenant may
+        update it concurrently). The store is not evicted while it is held.
+
+        Args:
+            namespace (str): Session id or tenant name.
+
+        Yields:
+            IncrementalFaissStore: The store.
+        """
+        validate_namespace(namespace)
+        lock = self._namespace_lock(namespace)
+        with self._lock:
+            self._in_use[namespace] = self._in_use.get(namespace, 0) + 1
+        store = None
+        try:
+            with lock:
+                store = self.get(namespace)
+                yield store
+                # The holder may have changed the store.
+                memory = estimate_memory(store)
+                with self._lock:
+                    if self._stores.get(namespace) is store:
+                        self._memory[namespace] = memory
+        finally:
+            with self._lock:
+                self._in_use[namespace] -= 1
+            if store is not None:
+                self.enforce_budget(keep=namespace)
+
+    def swap(self, namespace: str, store: IncrementalFaissStore) -> None:
+        """
+        Serves a namespace from another store from now on, e.g. one a background job built
+        and saved. Searches that already hold the old store finish on it.
+
+        Args:
+            namespace (str): Session id or tenant name.
+            store (IncrementalFaissStore): The new store.
+        """
+        validate_namespace(namespace)
+        self._put(namespace, store)
+
+    def enforce_budget(self, keep: Optional[str] = None) -> None:
+        """
+        Drops least recently used stores until the resident memory of the open ones fits in
+        the budget, using the estimates taken when they were opened or last changed.
+
+        Args:
+            keep (str, optional): Namespace that must stay open (the one being served).
+        """
+        with self._lock:
+            total = sum(self._memory[ns]["resident_bytes"] for ns in self._stores)
+            for namespace in list(self._stores):
+                if total <= self.budget_bytes:
+                    break
+                if namespace == keep or self._in_use.get(namespace):
+                    continue
+                resident = self._memory.pop(namespace)["resident_bytes"]
+                del self._stores[namespace]
+                total -= resident
+                self.evictions += 1
+                print(f"Evicted FAISS namespace '{namespace}' ({resident / 2**20:.1f} MiB)")
+
+    def evict(self, namespace: str) -> None:
+        """Drops a namespace's store from memory (it stays on disk)."""
+        with self._lock:
+            self._stores.pop(namespace, None)
+            self._memory.pop(namespace, None)
+
+    def drop(self, namespace: str) -> bool:
+        """
+        Deletes a namespace's store from memory and disk. Waits for a change in progress (such
+        as a background job saving the index), so the index is not saved back afterwards.
+
+        Args:
+            namespace (str): Session id or tenant name.
+
+        Returns:
+            bool: True if there was an index on disk.
+        """
+        index_dir = self.index_dir(namespace)
+        with self._namespace_lock(namespace):
+            with self._lock:
+                self._stores.pop(namespace, None)
+                self._memory.pop(namespace, None)
+                self._last_used.pop(namespace, None)
+                self._last_touched.pop(namespace, None)
+            if not os.path.exists(index_dir):
+                return False
+            shutil.rmtree(index_dir)
+        bump_version(version_key(index_dir))
+        return True
+
+    def expire_idle(self, force: bool = False) -> List[str]:
+        """
+        Deletes the session namespaces that were not used for `session_ttl` seconds. Runs at
+        most once per SWEEP_INTERVAL unless forced; namespaces in use are kept.
+
+        Args:
+            force (bool, optional): Sweep even if the last sweep was recent. Defaults to False.
+
+        Returns:
+            List[str]: The deleted namespaces.
+        """
+        now = time.time()
+        with self._lock:
+            if self.session_ttl is None or (not force and now - self._last_sweep < SWEEP_INTERVAL):
+                return []
+            self._last_sweep = now
+            in_use = {namespace for namespace, count in self._in_use.items() if count}
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return []
+
+        expired = []
+        for entry in entries:
+            namespace = entry.name
+            if not entry.is_dir() or not _SESSION_NAMESPACE.match(namespace) or namespace in in_use:
+                continue
+            last_used = max(entry.stat().st_mtime, self._last_used.get(namespace, 0.0))
+            if now - last_used > self.session_ttl and self.drop(namespace):
+                expired.append(namespace)
+        if expired:
+            print(f"Deleted {len(expired)} FAISS namespace(s) idle for more than {self.session_ttl / 3600:.1f} hours")
+        return expired
+
+    def memory(self, namespace: str) -> Dict[str, int]:
+        """
+        Returns the memory estimate of a namespace's open store, as of its last change.
+
+        Args:
+            namespace (str): Session id or tenant name.
+
+        Returns:
+            Dict[str, int]: "resident_bytes" and "mapped_bytes" (both 0 if it is not open).
+        """
+        with self._lock:
+            return dict(self._memory.get(namespace, {"resident_bytes": 0, "mapped_bytes": 0}))
+
+    def usage(self) -> List[Dict[str, Any]]:
+        """
+        Reports the open stores, most recently used first.
+
+        Returns:
+            List[Dict[str, Any]]: One row per namespace with "namespace", "vectors",
+                "resident_bytes", "mapped_bytes" (as of the store's last change) and
+                "last_used" (epoch seconds).
+        """
+        with self._lock:
+            rows = []
+            for namespace, store in reversed(self._stores.items()):
+                vectors = store.vector_store.index.ntotal if store.vector_store is not None else 0
+                rows.append({
+                    "namespace": namespace,
+                    "vectors": vectors,
+                    **self._memory[namespace],
+                    "last_used": self._last_used.get(namespace),
+                })
+            return rows
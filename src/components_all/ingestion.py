@@ -1,19 +1,23 @@
-from typing import List, Any
-from PyPDF2 import PdfReader
+from typing import List, Any, Dict, Iterator
+import fitz
 import streamlit as st
 # from utils import clean_text  # Import the clean_text function
 from components_all.utils import clean_text
 
 
-def ingest_pdf_data(pdf_docs: List[Any]) -> str:
+def ingest_pdf_data(pdf_docs: List[Any]) -> List[Dict[str, Any]]:
     """
     Ingests PDF data from uploaded files. This is the first stage of the pipeline.
 
+    Each upload is parsed with PyMuPDF straight from its bytes in memory, and every page
+    becomes its own record, so later stages keep track of where each chunk came from.
+
     Args:
         pdf_docs (List[Any]): List of uploaded PDF files. Use 'Any' for Streamlit file type.
 
     Returns:
-        str: Extracted text from all PDF documents.  Returns empty string if no valid PDFs.
+        List[Dict[str, Any]]: One record per non-empty page, with keys "text" (cleaned page
+            text), "pdf" (file name) and "page" (1-based page number). Empty if no valid PDFs.
 
     Raises:
         TypeError: If pdf_docs is not a list.
@@ -24,21 +28,37 @@ def ingest_pdf_data(pdf_docs: List[Any]) -> str:
     if not pdf_docs:
         raise ValueError("pdf_docs cannot be empty.")
 
-    text = ""
+    pages = []
     for pdf in pdf_docs:
         try:
-            # Check file type before attempting to read with PdfReader
+            # Check file type before attempting to parse it
             if not pdf.name.lower().endswith(".pdf"):
                 st.error(f"File '{pdf.name}' is not a PDF file. Please upload only PDF files.")
                 continue  # Skip to the next file
-            pdf_reader = PdfReader(pdf)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text() or ""
-                text += clean_text(page_text)  # Use the clean_text function
+            pages.extend(pdf_pages(pdf))
         except Exception as e:
             st.error(f"An unexpected error occurred while processing file '{pdf.name}': {e}")
             raise  # Re-raise other exceptions to stop the pipeline
-    return text
+    return pages
+
+
+def pdf_pages(pdf: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Parses one uploaded PDF page by page, without touching the Streamlit UI, so it can run
+    outside the script thread (see `jobs`).
+
+    Args:
+        pdf (Any): Uploaded PDF file (or any object with `name` and getvalue/read).
+
+    Yields:
+        Dict[str, Any]: The page records of `ingest_pdf_data`, one per non-empty page.
+    """
+    data = pdf.getvalue() if hasattr(pdf, "getvalue") else pdf.read()
+    with fitz.open(stream=data, filetype="pdf") as document:
+        for page in document:
+            page_text = clean_text(page.get_text())  # Use the clean_text function
+            if page_text.strip():
+                yield {"text": page_text, "pdf": pdf.name, "page": page.number + 1}
 
 # def ingest_pdf_data(pdf_docs: List[Any]) -> str:
 #     """
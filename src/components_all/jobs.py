@@ -0,0 +1,339 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from components_all.faiss_store import IncrementalFaissStore
+from components_all.index_manager import IndexManager
+from components_all.ingestion import pdf_pages
+from components_all.processing import process_text_data
+from components import metrics
+
+# Uploads indexed at the same time (across all sessions of the process).
+JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+# Chunks per embedding call: progress and cancellation are checked between calls.
+EMBED_BATCH_SIZE = 256
+# Finished jobs kept for the UI; older ones are forgotten.
+MAX_FINISHED_JOBS = 50
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's worker when the job was cancelled."""
+
+
+class UploadedPdf:
+    """
+    An upload's name and contents, copied out of the Streamlit session so a job can outlive
+    the script run (and the page) that submitted it.
+
+    Attributes:
+        name (str): File name.
+        data (bytes): File contents.
+    """
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+
+    def getvalue(self) -> bytes:
+        return self.data
+
+
+class IngestJob:
+    """
+    One background indexing of uploads into a namespace's FAISS index. The worker updates
+    the counters while it runs; the UI reads them with `progress`.
+
+    Attributes:
+        id (str): Job id.
+        namespace (str): Namespace whose index is updated.
+        fingerprints (Dict[str, str]): File name -> content hash of the files to index.
+        status (str): QUEUED, RUNNING, DONE, FAILED or CANCELLED.
+        phase (str): What a running job is doing: "parsing", "embedding" or "indexing".
+        files_total (int): Number of files.
+        files_parsed (int): Files parsed and split so far.
+        pages_parsed (int): Non-empty pages parsed so far.
+        chunks_total (int): Chunks to embed (known once every file is parsed).
+        chunks_embedded (int): Chunks embedded so far.
+        error (Optional[str]): Why the job failed.
+        skipped (List[str]): Uploads that produced no chunks (not PDFs, or PDFs without
+            extractable text); they are not recorded in the index.
+    """
+
+    def __init__(self, namespace: str, uploads: List[UploadedPdf], fingerprints: Dict[str, str]):
+        self.id = uuid.uuid4().hex[:12]
+        self.namespace = namespace
+        self.uploads = uploads
+        self.fingerprints = fingerprints
+        self.status = QUEUED
+        self.phase = QUEUED
+        self.files_total = len(uploads)
+        self.files_parsed = 0
+        self.pages_parsed = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.error = None
+        self.skipped = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def is_final(self) -> bool:
+        """True once the job is done, failed or cancelled."""
+        return self.status in FINAL_STATUSES
+
+    def cancel(self) -> bool:
+        """
+        Asks the job to stop. It stops at its next check (between pages or embedding calls);
+        once it started swapping in the new index, it completes instead.
+
+        Returns:
+            bool: False if the job had already finished.
+        """
+        if self.is_final:
+            return False
+        self._cancel.set()
+        return True
+
+    def check_cancelled(self) -> None:
+        """Raises JobCancelled if the job was cancelled (called by the worker)."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the job finished.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait.
+
+        Returns:
+            bool: True if the job finished.
+        """
+        return self._done.wait(timeout)
+
+    def fraction(self) -> float:
+        """Estimated completion between 0 and 1 (parsing 30%, embedding 60%, indexing the rest)."""
+        if self.status == DONE:
+            return 1.0
+        parsed = self.files_parsed / self.files_total if self.files_total else 1.0
+        embedded = self.chunks_embedded / self.chunks_total if self.chunks_total else float(self.phase == "indexing")
+        return 0.3 * parsed + 0.6 * embedded
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the job for display.
+
+        Returns:
+            Dict[str, Any]: "id", "files", "status", "phase", "fraction", "files_parsed",
+                "files_total", "pages_parsed", "chunks_embedded", "chunks_total", "error",
+                "skipped" and "seconds" (running time so far, or total once finished).
+        """
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "files": sorted(self.fingerprints),
+            "status": self.status,
+            "phase": self.phase,
+            "fraction": self.fraction(),
+            "files_parsed": self.files_parsed,
+            "files_total": self.files_total,
+            "pages_parsed": self.pages_parsed,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_total": self.chunks_total,
+            "error": self.error,
+            "skipped": list(self.skipped),
+            "seconds": end - self.started if self.started else 0.0,
+        }
+
+
+class JobQueue:
+    """
+    Process-wide pool that indexes uploads in the background, so the Streamlit script thread
+    (and chat against the current index) is never blocked by an upload. Jobs are kept per
+    namespace, so a session finds its jobs again after a page reload.
+
+    A job parses, splits and embeds without holding the namespace; only the final step takes
+    the namespace lock, applies the chunks to a fresh copy of the persisted store, saves it
+    and swaps it in with `IndexManager.swap`. Searches keep using the previous store until
+    then, and a cancelled or failed job leaves the index untouched.
+
+    Attributes:
+        manager (IndexManager): Owner of the namespaces' stores.
+    """
+
+    def __init__(self, manager: IndexManager, workers: int = JOB_WORKERS):
+        """
+        Args:
+            manager (IndexManager): Owner of the namespaces' stores.
+            workers (int, optional): Jobs run at the same time. Defaults to JOB_WORKERS.
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        self.manager = manager
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job")
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, namespace: str, pdf_docs: List[Any]) -> Optional[IngestJob]:
+        """
+        Queues the uploads that are new or changed (and not already queued) for indexing.
+
+        Args:
+            namespace (str): Namespace whose index is updated.
+            pdf_docs (List[Any]): Uploaded files; their contents are copied.
+
+        Returns:
+            Optional[IngestJob]: The job, or None if there is nothing to index.
+        """
+        uploads = [UploadedPdf(pdf.name, pdf.getvalue() if hasattr(pdf, "getvalue") else pdf.read()) for pdf in pdf_docs]
+        changed = self.manager.get(namespace).changed_files(uploads)
+        with self._lock:
+            pending = {
+                (name, sha256)
+                for job in self._jobs.values() if job.namespace == namespace and not job.is_final
+                for name, sha256 in job.fingerprints.items()
+            }
+            changed = {name: sha256 for name, sha256 in changed.items() if (name, sha256) not in pending}
+            if not changed:
+                return None
+            job = IngestJob(namespace, [upload for upload in uploads if upload.name in changed], changed)
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job)
+        return job
+
+    def jobs(self, namespace: Optional[str] = None) -> List[IngestJob]:
+        """
+        Lists the known jobs, newest first.
+
+        Args:
+            namespace (str, optional): Only the jobs of this namespace.
+
+        Returns:
+            List[IngestJob]: The jobs.
+        """
+        with self._lock:
+            jobs = list(reversed(self._jobs.values()))
+        return [job for job in jobs if namespace is None or job.namespace == namespace]
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Returns a job by id, or None if it is unknown (or was forgotten)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job (see `IngestJob.cancel`).
+
+        Returns:
+            bool: False if the job is unknown or already finished.
+        """
+        job = self.get(job_id)
+        return job.cancel() if job is not None else False
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancels every unfinished job and stops the workers."""
+        for job in self.jobs():
+            job.cancel()
+        self._pool.shutdown(wait=wait)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_final]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestJob) -> None:
+        job.started = time.time()
+        job.status = RUNNING
+        try:
+            with metrics.trace("ingest", path="faiss", mode="job"):
+                job.check_cancelled()
+                chunks = self._parse(job)
+                vectors = self._embed(job, chunks)
+                self._apply(job, chunks, vectors)
+            job.status = DONE
+            print(f"Ingest job {job.id}: indexed {job.files_total} file(s), {len(chunks)} chunks")
+        except JobCancelled:
+            job.status = CANCELLED
+            print(f"Ingest job {job.id} cancelled")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            print(f"Ingest job {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            job.uploads = []  # release the file contents
+            job._done.set()
+
+    def _parse(self, job: IngestJob) -> List[Dict[str, Any]]:
+        job.phase = "parsing"
+        chunks = []
+        for upload in job.uploads:
+            if not upload.name.lower().endswith(".pdf"):
+                job.skipped.append(upload.name)
+                job.files_parsed += 1
+                continue
+            pages = []
+            with metrics.span("extract"):
+                for page in pdf_pages(upload):
+                    job.check_cancelled()
+                    pages.append(page)
+                    job.pages_parsed += 1
+            file_chunks = []
+            if pages:
+                with metrics.span("clean_split"):
+                    file_chunks = process_text_data(pages)
+            if not file_chunks:
+                job.skipped.append(upload.name)
+            chunks.extend(file_chunks)
+            job.files_parsed += 1
+        job.chunks_total = len(chunks)
+        return chunks
+
+    def _embed(self, job: IngestJob, chunks: List[Dict[str, Any]]) -> List[List[float]]:
+        job.phase = "embedding"
+        embeddings = self.manager.embeddings_factory()
+        texts = [chunk["chunk_text"] for chunk in chunks]
+        vectors = []
+        with metrics.span("embed"):
+            for start in range(0, len(texts), EMBED_BATCH_SIZE):
+                job.check_cancelled()
+                vectors.extend(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+                job.chunks_embedded = len(vectors)
+        return vectors
+
+    def _apply(self, job: IngestJob, chunks: List[Dict[str, Any]], vectors: List[List[float]]) -> None:
+        job.check_cancelled()
+        job.phase = "indexing"
+        with self.manager.locked(job.namespace):
+            # Changed on a copy: the served store is left alone until the new one is saved.
+            store = IncrementalFaissStore.load(
+                self.manager.index_dir(job.namespace), self.manager.embeddings_factory(), self.manager.index_type
+            )
+            # Only files that produced chunks are recorded, so a skipped file is tried again
+            # when it is uploaded again. Another job may have indexed the same contents meanwhile.
+            produced = {chunk["pdf"] for chunk in chunks}
+            fingerprints = {
+                name: sha256 for name, sha256 in job.fingerprints.items()
+                if name in produced and store.files.get(name, {}).get("sha256") != sha256
+            }
+            if not fingerprints:
+                return
+            keep = [i for i, chunk in enumerate(chunks) if chunk["pdf"] in fingerprints]
+            store.add_chunks([chunks[i] for i in keep], fingerprints, [vectors[i] for i in keep])
+            with metrics.span("save"):
+                store.save()
+            self.manager.swap(job.namespace, store)
@@ -3,18 +3,13 @@ from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_core.prompts import load_prompt
-from components.retriever import Retriever
-from dotenv import load_dotenv
-
-load_dotenv()
 EMBEDDING_MODEL_NAME = "models/embedding-001"  # Define the embedding model name
 
 
 
 
 
-def get_conversational_chain():
-    prompt_template = """
+QA_PROMPT_TEMPLATE = """
     Answer the question as detailed as possible from the provided context.
 
     Context:
@@ -24,6 +19,13 @@ def get_conversational_chain():
 
     Answer:
     """
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    return load_qa_chain(model, chain_type="stuff", prompt=prompt)
+
+
+def get_qa_prompt():
+    return PromptTemplate(template=QA_PROMPT_TEMPLATE, input_variables=["context", "question"])
+
+
+def get_conversational_chain(model=None):
+    if model is None:
+        model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3)
+    return load_qa_chain(model, chain_type="stuff", prompt=get_qa_prompt())
@@ -0,0 +1,134 @@
+import os
+import re
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Recent turns kept verbatim; older ones are folded into the summary.
+MEMORY_WINDOW = int(os.getenv("MEMORY_WINDOW", "4"))
+SUMMARY_MAX_CHARS = 1500
+ANSWER_GIST_CHARS = 200
+
+# Follow-ups like "and what about chapter 2?" need the previous question to be searchable.
+_FOLLOW_UP = re.compile(r"\b(it|its|this|that|these|those|they|them|he|she|his|her|there|above|previous|same)\b", re.I)
+FOLLOW_UP_MAX_WORDS = 8
+
+
+def _gist(answer: str) -> str:
+    """First sentence of an answer, capped at ANSWER_GIST_CHARS."""
+    answer = " ".join(answer.split())
+    sentence = re.split(r"(?<=[.!?])\s", answer, maxsplit=1)[0]
+    return sentence[:ANSWER_GIST_CHARS]
+
+
+def extractive_summary(summary: str, user: str, bot: str) -> str:
+    """
+    Folds one turn into the rolling summary without a model call: the question and the
+    first sentence of the answer are appended, and the oldest lines are dropped once the
+    summary is longer than SUMMARY_MAX_CHARS.
+
+    Args:
+        summary (str): Current summary.
+        user (str): The turn's question.
+        bot (str): The turn's answer.
+
+    Returns:
+        str: New summary.
+    """
+    lines = summary.splitlines() if summary else []
+    lines.append(f"- Asked: {' '.join(user.split())} -> {_gist(bot)}")
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    Bounded memory of one chat: the last `window` turns verbatim and a rolling summary of
+    everything older, so prompts stop growing with the conversation. The retrieval query is
+    kept apart from the generation context: only the question (plus the previous question for
+    short follow-ups) is embedded and searched, while the summary and recent turns go to the
+    model with the retrieved context.
+
+    Attributes:
+        window (int): Number of recent turns kept verbatim.
+        summary (str): Summary of the turns that left the window.
+        turns (deque): Recent turns as {"user", "bot"} dicts.
+    """
+
+    def __init__(self, window: int = MEMORY_WINDOW, summarize: Callable[[str, str, str], str] = extractive_summary):
+        """
+        Args:
+            window (int, optional): Recent turns kept verbatim. Defaults to MEMORY_WINDOW.
+            summarize (Callable[[str, str, str], str], optional): Folds (summary, user, bot)
+                into a new summary. Defaults to `extractive_summary`.
+        """
+        self.window = window
+        self.summarize = summarize
+        self.summary = ""
+        self.turns: deque = deque()
+
+    def add(self, user: str, bot: str) -> None:
+        """
+        Records a finished turn, folding the oldest one into the summary if the window is full.
+
+        Args:
+            user (str): The question.
+            bot (str): The answer.
+        """
+        self.turns.append({"user": user, "bot": bot})
+        while len(self.turns) > self.window:
+            oldest = self.turns.popleft()
+            self.summary = self.summarize(self.summary, oldest["user"], oldest["bot"])
+
+    def clear(self) -> None:
+        """Forgets the conversation."""
+        self.summary = ""
+        self.turns.clear()
+
+    def retrieval_query(self, question: str) -> str:
+        """
+        Builds the text that is embedded and searched for a question.
+
+        Args:
+            question (str): The new question.
+
+        Returns:
+            str: The question, prefixed with the previous question if it looks like a
+                short follow-up that refers back to it.
+        """
+        if self.turns and len(question.split()) <= FOLLOW_UP_MAX_WORDS and _FOLLOW_UP.search(question):
+            return f"{self.turns[-1]['user']} {question}"
+        return question
+
+    def conversation(self) -> Optional[str]:
+        """
+        Builds the conversation context for the generation prompt.
+
+        Returns:
+            Optional[str]: The summary and the recent turns, or None for a new conversation.
+        """
+        if not self.summary and not self.turns:
+            return None
+        parts: List[str] = []
+        if self.summary:
+            parts.append(f"Earlier in this conversation:\n{self.summary}")
+        for turn in self.turns:
+            parts.append(f"User: {turn['user']}\nBot: {turn['bot']}")
+        return "\n".join(parts)
+
+    @classmethod
+    def from_history(cls, history: List[Dict[str, str]], window: int = MEMORY_WINDOW) -> "ConversationMemory":
+        """
+        Rebuilds the memory from a chat history list of {"user", "bot"} dicts.
+
+        Args:
+            history (List[Dict[str, str]]): Chat history, oldest first.
+            window (int, optional): Recent turns kept verbatim. Defaults to MEMORY_WINDOW.
+
+        Returns:
+            ConversationMemory: The memory.
+        """
+        memory = cls(window)
+        for turn in history:
+            memory.add(turn["user"], turn["bot"])
+        return memory
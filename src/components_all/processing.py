@@ -1,30 +1,42 @@
-from typing import List
+from typing import Any, Dict, List, Union
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-# from utils import clean_text  # Import the clean_text function
-from components_all.utils import clean_text
 
-def process_text_data(text: str) -> List[str]:
+def process_text_data(
+    text: Union[str, List[Dict[str, Any]]]
+) -> Union[List[str], List[Dict[str, Any]]]:
     """
-    Processes the ingested text data.  This includes cleaning and chunking.
+    Processes the ingested text data into chunks. The text is expected to come from
+    `ingest_pdf_data`, which already cleans every page, so it is not cleaned a second time.
+
+    Page records are split page by page, so no chunk spans two pages and every chunk keeps
+    the "pdf" and "page" of its source.
 
     Args:
-        text (str): The raw text data.
+        text (Union[str, List[Dict[str, Any]]]): The page records produced by
+            `ingest_pdf_data`, or a single string.
 
     Returns:
-        List[str]: A list of text chunks.
+        Union[List[str], List[Dict[str, Any]]]: For page records, one record per chunk with
+            keys "chunk_text", "pdf" and "page"; for a string, a list of text chunks.
 
     Raises:
-        TypeError: If text is not a string.
+        TypeError: If text is neither a string nor a list.
         ValueError: If text is empty.
     """
-    if not isinstance(text, str):
-        raise TypeError("text must be a string.")
+    if not isinstance(text, (str, list)):
+        raise TypeError("text must be a string or a list of page records.")
     if not text:
         raise ValueError("text cannot be empty.")
 
-    cleaned_text = clean_text(text)  # Use the clean_text function
-    text_chunks = split_text_into_chunks(cleaned_text)
-    return text_chunks
+    if isinstance(text, str):
+        return split_text_into_chunks(text)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    return [
+        {"chunk_text": chunk, "pdf": page["pdf"], "page": page["page"]}
+        for page in text
+        for chunk in splitter.split_text(page["text"])
+    ]
 
 
 
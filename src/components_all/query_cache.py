@@ -0,0 +1,207 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+ANSWER_CACHE_SIZE = 1000
+SIMILARITY_THRESHOLD = 0.95
+
+
+def _hit_rate(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    Exact-match LRU in front of an embedding model's `embed_query`, so a repeated question
+    (and the second embedding of the same question in one request) costs no API call.
+    Document embeddings pass straight through.
+
+    Attributes:
+        embeddings (Embeddings): The wrapped model.
+        max_entries (int): LRU capacity.
+        hits (int): Queries served from the cache.
+        misses (int): Queries sent to the model.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            vector = self._entries.get(text)
+            if vector is not None:
+                self._entries.move_to_end(text)
+                self.hits += 1
+                return vector
+            self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._entries[text] = vector
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds many queries, sending only the uncached ones to the model in batches.
+
+        Args:
+            texts (List[str]): Query texts.
+
+        Returns:
+            List[List[float]]: One vector per query, in input order.
+        """
+        with self._lock:
+            vectors = [self._entries.get(text) for text in texts]
+            misses = sorted({text for text, vector in zip(texts, vectors) if vector is None})
+            self.hits += len(texts) - sum(vector is None for vector in vectors)
+            self.misses += len(misses)
+        if misses:
+            # Imported here so the FAISS path does not load the Milvus client.
+            from components.retriever import embed_queries
+
+            embedded = dict(zip(misses, embed_queries(self.embeddings, misses)))
+            with self._lock:
+                for text, vector in embedded.items():
+                    self._entries[text] = vector
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            vectors = [vector if vector is not None else embedded[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hits, misses, hit_rate and entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+                "entries": len(self._entries),
+            }
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by query embedding: a new query whose embedding has cosine similarity of
+    at least `threshold` with a cached query in the same scope and context gets the cached
+    answer without search or generation. Each scope (a Milvus collection or a FAISS index)
+    carries the version of its contents (see `components.index_version`); a newer version
+    drops the scope's entries, while lookups and answers carrying an older one (generated
+    before the change) are ignored. The context (e.g. a digest of the conversation) keeps
+    answers to the same question in different conversations apart.
+
+    Attributes:
+        threshold (float): Minimum cosine similarity for a hit.
+        max_entries (int): Capacity per scope (least recently used entries go first).
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that were not.
+        invalidations (int): Scopes dropped because their version changed.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # scope -> (version, unit query vectors, answers, contexts, last-used ticks)
+        self._scopes: Dict[str, Tuple[int, np.ndarray, List[str], List[Optional[str]], List[int]]] = {}
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def _scope(
+        self, scope: str, version: int, dim: int
+    ) -> Optional[Tuple[int, np.ndarray, List[str], List[Optional[str]], List[int]]]:
+        # None when the caller's version is older than the cached one.
+        entry = self._scopes.get(scope)
+        if entry is not None and entry[0] > version:
+            return None
+        if entry is not None and entry[0] < version:
+            self.invalidations += 1
+            entry = None
+        if entry is None:
+            entry = (version, np.zeros((0, dim), dtype=np.float32), [], [], [])
+            self._scopes[scope] = entry
+        return entry
+
+    def lookup(self, scope: str, version: int, vector: List[float], context: Optional[str] = None) -> Optional[str]:
+        """
+        Finds a cached answer for a query.
+
+        Args:
+            scope (str): Collection or index the answer was generated from.
+            version (int): Current version of its contents.
+            vector (List[float]): Query embedding.
+            context (str, optional): Only answers stored with the same context match.
+
+        Returns:
+            Optional[str]: The cached answer, or None.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            entry = self._scope(scope, version, len(query))
+            if entry is not None and entry[2]:
+                _, vectors, answers, contexts, used = entry
+                similarities = vectors @ query
+                similarities[[c != context for c in contexts]] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._tick += 1
+                    used[best] = self._tick
+                    self.hits += 1
+                    return answers[best]
+            self.misses += 1
+            return None
+
+    def store(
+        self, scope: str, version: int, vector: List[float], answer: str, context: Optional[str] = None
+    ) -> None:
+        """
+        Caches an answer. Answers generated from an older version than the cached one are
+        dropped.
+
+        Args:
+            scope (str): Collection or index the answer was generated from.
+            version (int): Version of its contents when the answer was generated.
+            vector (List[float]): Query embedding.
+            answer (str): The answer.
+            context (str, optional): Context the answer depends on (see `lookup`).
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            entry = self._scope(scope, version, len(query))
+            if entry is None:
+                return
+            _, vectors, answers, contexts, used = entry
+            self._tick += 1
+            if len(answers) >= self.max_entries:
+                oldest = int(np.argmin(used))
+                vectors = np.delete(vectors, oldest, axis=0)
+                del answers[oldest], contexts[oldest], used[oldest]
+            self._scopes[scope] = (
+                version, np.vstack([vectors, query[None, :]]), answers + [answer], contexts + [context], used + [self._tick]
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hits, misses, hit_rate, invalidations and entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+                "invalidations": self.invalidations,
+                "entries": sum(len(entry[2]) for entry in self._scopes.values()),
+            }
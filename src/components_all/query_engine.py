@@ -0,0 +1,462 @@
+import time
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, Tuple
+from components_all.context import ContextBudgeter
+from components_all.query_cache import QueryEmbeddingCache, SemanticAnswerCache
+from components import metrics
+from components.index_version import current_version
+from components.milvus_config import connection_args, load_index_config
+
+# The Gemini clients are imported when an engine is built without its own models (the tests
+# and benchmarks pass local fakes), and langchain's prompts and documents on first use.
+# Only type checkers see these imports.
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+CHAT_MODEL_NAME = "gemini-1.5-flash"
+TEMPLATE_PATH = "template.json"
+# Chunks retrieved from a FAISS index (langchain's default).
+FAISS_K = 4
+
+
+class GenerationStats:
+    """
+    Timings of one answer generation. For streamed answers they are filled in while the
+    stream is consumed; for blocking calls the first token arrives with the whole answer.
+
+    Attributes:
+        ttft (Optional[float]): Seconds from the request to the first token.
+        total (Optional[float]): Seconds from the request to the last token.
+        chunks (int): Number of streamed chunks received.
+        cached (bool): The answer came from the semantic answer cache.
+    """
+
+    def __init__(self, ttft: Optional[float] = None, total: Optional[float] = None, cached: bool = False):
+        self.ttft = ttft
+        self.total = total
+        self.chunks = 0
+        self.cached = cached
+
+    def __repr__(self) -> str:
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "-"
+        total = f"{self.total:.2f}s" if self.total is not None else "-"
+        return f"GenerationStats(ttft={ttft}, total={total}, chunks={self.chunks}, cached={self.cached})"
+
+
+def stream_text(chunks: Iterable[Any], stats: GenerationStats) -> Iterator[str]:
+    """
+    Yields the text of streamed message chunks, recording time to first token and total time.
+
+    Args:
+        chunks (Iterable[Any]): Message chunks from `chat_model.stream(...)`.
+        stats (GenerationStats): Filled in as the stream is consumed.
+
+    Yields:
+        str: Text of each chunk.
+    """
+    # The request is only sent when the stream is first iterated, so timing starts here.
+    start = time.perf_counter()
+    for chunk in chunks:
+        if stats.ttft is None:
+            stats.ttft = time.perf_counter() - start
+        stats.chunks += 1
+        yield chunk.content
+    stats.total = time.perf_counter() - start
+    print(f"Generation: first token {stats.ttft or 0:.2f}s, total {stats.total:.2f}s, {stats.chunks} chunks")
+
+
+def with_conversation(question: str, conversation: Optional[str]) -> str:
+    """Prefixes a question with the conversation context for the generation prompt."""
+    if not conversation:
+        return question
+    return f"{conversation}\n\nCurrent question: {question}"
+
+
+class QueryEngine:
+    """
+    Long-lived holder of everything the query paths need: the Milvus connection, the
+    retriever (with its loaded collection), the embedding and chat model clients, the parsed
+    prompt and the FAISS QA chain. Built once per process and shared by every Streamlit
+    session, so a question only pays for embedding, search and generation.
+
+    Attributes:
+        collection_name (str): Milvus collection queried by `query_milvus`.
+        embeddings (QueryEmbeddingCache): Embedding model client behind an exact-match
+            query embedding LRU.
+        chat_model (ChatGoogleGenerativeAI): Chat model client.
+        milvus_prompt: Prompt template loaded from `template.json`.
+        qa_chain: QA chain used for FAISS queries (built on first use).
+        retriever (Retriever): Milvus retriever (built on first use).
+        context_budgeter (ContextBudgeter): Merges, dedupes and packs retrieved chunks.
+        answer_cache (SemanticAnswerCache): Answers of earlier, near-identical questions.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_model_name: str,
+        search_params: Optional[dict] = None,
+        alias: str = "default",
+        milvus_args: Optional[dict] = None,
+        chat_model: Optional[Any] = None,
+        context_budgeter: Optional[ContextBudgeter] = None,
+        embeddings: Optional[Any] = None,
+    ):
+        """
+        Builds the model clients and prompts. The Milvus client and the FAISS QA chain are
+        imported and built on first use, so each path only pays for its own stack (and the
+        FAISS path works without a Milvus server).
+
+        Args:
+            collection_name (str): Milvus collection to query.
+            embedding_model_name (str): Name of the embedding model.
+            search_params (dict, optional): Milvus search parameters. Defaults to the ones
+                chosen by `components/milvus_tuner.py` (nprobe 20 until it ran).
+            alias (str, optional): pymilvus connection alias. Defaults to "default", which
+                langchain's Milvus reuses for the same address.
+            milvus_args (dict, optional): Milvus connection arguments. Defaults to the ones of
+                `milvus_config.connection_args` (MILVUS_URI, or MILVUS_HOST/MILVUS_PORT), the
+                same as the retriever and the ingestion writers.
+            chat_model (optional): Chat model to use instead of Gemini (e.g. a local fake).
+            context_budgeter (ContextBudgeter, optional): Assembles retrieved chunks into the
+                prompt context. Defaults to a ContextBudgeter with the default budget.
+            embeddings (optional): Embedding model to use instead of Gemini (e.g. a local fake).
+        """
+        from langchain_core.prompts import load_prompt
+
+        if embeddings is None:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            embeddings = GoogleGenerativeAIEmbeddings(model=embedding_model_name)
+        if chat_model is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            chat_model = ChatGoogleGenerativeAI(model=CHAT_MODEL_NAME, temperature=0.3)
+        self.milvus_args = milvus_args or connection_args()
+        self.alias = alias
+        self.collection_name = collection_name
+        self.search_params = search_params or load_index_config()["search_params"]
+        self.embeddings = QueryEmbeddingCache(embeddings)
+        self.answer_cache = SemanticAnswerCache()
+        self.chat_model = chat_model
+        self.milvus_prompt = load_prompt(TEMPLATE_PATH)
+        self.context_budgeter = context_budgeter or ContextBudgeter()
+        self._qa_chain = None
+        self._qa_prompt = None
+        self._retriever = None
+        self._lock = threading.Lock()
+        self._connected = False
+
+    @property
+    def qa_chain(self) -> Any:
+        """The FAISS QA chain (langchain's chains are only imported for the FAISS path)."""
+        if self._qa_chain is None:
+            from components_all.llm_chain import get_conversational_chain
+
+            self._qa_chain = get_conversational_chain(self.chat_model)
+        return self._qa_chain
+
+    @property
+    def qa_prompt(self) -> Any:
+        """The prompt of the FAISS QA chain, for streamed answers."""
+        if self._qa_prompt is None:
+            from components_all.llm_chain import get_qa_prompt
+
+            self._qa_prompt = get_qa_prompt()
+        return self._qa_prompt
+
+    @property
+    def retriever(self) -> Any:
+        """The Milvus retriever (the Milvus client is only imported for the Milvus path)."""
+        if self._retriever is None:
+            from components.retriever import Retriever
+
+            self._retriever = Retriever(
+                self.collection_name, self.embeddings, self.search_params, milvus_args=self.milvus_args
+            )
+        return self._retriever
+
+    def connect(self) -> None:
+        """Opens (or reopens) the Milvus connection."""
+        from pymilvus import connections
+
+        with self._lock, metrics.span("connect"):
+            connections.connect(alias=self.alias, **self.milvus_args)
+            self._connected = True
+
+    def health_check(self) -> bool:
+        """
+        Checks that the Milvus server answers on the connection the retriever searches with.
+
+        Returns:
+            bool: True if the server is reachable.
+        """
+        from pymilvus import utility
+
+        try:
+            utility.get_server_version(using=self.retriever.alias or self.alias)
+            return True
+        except Exception:
+            return False
+
+    def reconnect(self) -> None:
+        """Drops the connection and the cached collection handle, then connects again."""
+        from pymilvus import connections
+
+        with self._lock:
+            for alias in {self.alias, self.retriever.alias or self.alias}:
+                try:
+                    connections.disconnect(alias)
+                except Exception:
+                    pass
+            self.retriever.reset()
+            self._connected = False
+        self.connect()
+
+    def _search(
+        self, query: str, k: int, pdfs: Optional[List[str]] = None, pages: Optional[Any] = None
+    ) -> Tuple[List[str], List[dict]]:
+        if not self._connected:
+            self.connect()
+        try:
+            return self.retriever.search(query, k, pdfs, pages)
+        except RuntimeError:
+            # A broken connection shows up as a failed search; reconnect once and retry.
+            if self.health_check():
+                raise
+            self.reconnect()
+            return self.retriever.search(query, k, pdfs, pages)
+
+    def _milvus_prompt(
+        self, query: str, k: int, conversation: Optional[str], pdfs: Optional[List[str]], pages: Optional[Any]
+    ) -> Any:
+        content, metadata = self._search(query, k, pdfs, pages)
+        with metrics.span("assemble"):
+            content, metadata, _ = self.context_budgeter.assemble(content, metadata)
+            metadata_str = ", ".join([f"{k}: {v}" for k, v in metadata.items()]) if isinstance(metadata, dict) else str(metadata)
+            query = with_conversation(query, conversation)
+            return self.milvus_prompt.invoke({'retrieved_info': content, 'query': query, 'metadata': metadata_str})
+
+    def _cached_answer(
+        self, scope: Optional[str], query: str, conversation: Optional[str], expr: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[tuple]]:
+        """
+        Looks a question up in the semantic answer cache. Answers of filtered searches are
+        cached apart from unfiltered ones but share the version of `scope`, and answers given
+        within a conversation only match the same conversation (by digest).
+
+        Returns:
+            Tuple[Optional[str], Optional[tuple]]: The cached answer (or None), and the key to
+                store a fresh answer under with `_store_answer` (None if it must not be cached).
+        """
+        if scope is None:
+            return None, None
+        version = current_version(scope)
+        with metrics.span("embed"):
+            vector = self.embeddings.embed_query(query)
+        if expr:
+            scope = f"{scope}?{expr}"
+        context = hashlib.sha1(conversation.encode("utf-8")).hexdigest() if conversation else None
+        with metrics.span("cache_lookup") as labels:
+            answer = self.answer_cache.lookup(scope, version, vector, context)
+            labels["hit"] = answer is not None
+        return answer, (scope, version, vector, context)
+
+    def _store_answer(self, key: Optional[tuple], answer: str) -> None:
+        if key is not None:
+            scope, version, vector, context = key
+            self.answer_cache.store(scope, version, vector, answer, context)
+
+    def _generate(self, prompt: Any) -> Tuple[str, GenerationStats]:
+        with metrics.span("generate"):
+            start = time.perf_counter()
+            result = self.chat_model.invoke(prompt)
+            duration = time.perf_counter() - start
+        return result.content, GenerationStats(duration, duration)
+
+    def _stream(self, prompt: Any, key: Optional[tuple]) -> Tuple[Iterator[str], GenerationStats]:
+        stats = GenerationStats()
+        # The generation outlives the query trace, so the trace is finished with the stream.
+        current = metrics.current_trace()
+        if current is not None:
+            current.defer()
+        return self._store_stream(stream_text(self.chat_model.stream(prompt), stats), key, stats, current), stats
+
+    def _store_stream(
+        self, chunks: Iterator[str], key: Optional[tuple], stats: GenerationStats, current: Optional[Any]
+    ) -> Iterator[str]:
+        # Caches a streamed answer and records its timings once it is complete.
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self._store_answer(key, "".join(parts))
+        metrics.record("first_token", stats.ttft or 0.0, current=current)
+        metrics.record("generate", stats.total or 0.0, current=current)
+        if current is not None:
+            metrics.finish(current)
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the hit rates of both cache tiers.
+
+        Returns:
+            dict: "query_embeddings" and "answers" stats (hits, misses, hit_rate, entries).
+        """
+        return {"query_embeddings": self.embeddings.stats(), "answers": self.answer_cache.stats()}
+
+    def query_milvus(
+        self,
+        query: str,
+        k: int = 20,
+        conversation: Optional[str] = None,
+        pdfs: Optional[List[str]] = None,
+        pages: Optional[Any] = None,
+    ) -> Tuple[str, GenerationStats]:
+        """
+        Answers a query from the Milvus collection.
+
+        Args:
+            query (str): The query (embedded and searched).
+            k (int, optional): Number of chunks to retrieve. Defaults to 20.
+            conversation (str, optional): Conversation context for the generation prompt only.
+            pdfs (List[str], optional): Only search these PDF file names.
+            pages (optional): Only search this (first, last) page range, or a list of ranges.
+
+        Returns:
+            Tuple[str, GenerationStats]: The answer and its generation timings.
+        """
+        from components.retriever import filter_expr
+
+        with metrics.trace("query", path="milvus"):
+            answer, key = self._cached_answer(self.collection_name, query, conversation, filter_expr(pdfs, pages))
+            if answer is not None:
+                return answer, GenerationStats(0, 0, cached=True)
+
+            prompt = self._milvus_prompt(query, k, conversation, pdfs, pages)
+            answer, stats = self._generate(prompt)
+            self._store_answer(key, answer)
+            return answer, stats
+
+    def stream_milvus(
+        self,
+        query: str,
+        k: int = 20,
+        conversation: Optional[str] = None,
+        pdfs: Optional[List[str]] = None,
+        pages: Optional[Any] = None,
+    ) -> Tuple[Iterator[str], GenerationStats]:
+        """
+        Answers a query from the Milvus collection, streaming the answer as it is generated.
+
+        Args:
+            query (str): The query (embedded and searched).
+            k (int, optional): Number of chunks to retrieve. Defaults to 20.
+            conversation (str, optional): Conversation context for the generation prompt only.
+            pdfs (List[str], optional): Only search these PDF file names.
+            pages (optional): Only search this (first, last) page range, or a list of ranges.
+
+        Returns:
+            Tuple[Iterator[str], GenerationStats]: The answer text chunks, and the timings,
+                which are complete once the iterator is exhausted.
+        """
+        from components.retriever import filter_expr
+
+        with metrics.trace("query", path="milvus"):
+            answer, key = self._cached_answer(self.collection_name, query, conversation, filter_expr(pdfs, pages))
+            if answer is not None:
+                return iter([answer]), GenerationStats(0, 0, cached=True)
+
+            prompt = self._milvus_prompt(query, k, conversation, pdfs, pages)
+            return self._stream(prompt, key)
+
+    def _faiss_context(self, vector_store: Any, user_question: str) -> List["Document"]:
+        from langchain_core.documents import Document
+        from components_all.faiss_index import index_kind
+
+        # Embedded through the query cache, which the answer cache lookup has usually filled already.
+        with metrics.span("embed"):
+            vector = self.embeddings.embed_query(user_question)
+        index = vector_store.index
+        with metrics.span("search", k=FAISS_K, size=metrics.size_bucket(index.ntotal), index=index_kind(index)):
+            docs = vector_store.similarity_search_by_vector(vector, k=FAISS_K)
+        if not docs:
+            return docs
+        with metrics.span("assemble"):
+            texts, metadatas, _ = self.context_budgeter.assemble(
+                [doc.page_content for doc in docs], [doc.metadata for doc in docs]
+            )
+        return [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+
+    def query_vector_store(
+        self,
+        vector_store: Any,
+        user_question: str,
+        conversation: Optional[str] = None,
+        cache_scope: Optional[str] = None,
+    ) -> Tuple[str, GenerationStats]:
+        """
+        Answers a question from a FAISS index.
+
+        Args:
+            vector_store (FAISS): FAISS index to query.
+            user_question (str): The question (embedded and searched).
+            conversation (str, optional): Conversation context for the generation prompt only.
+            cache_scope (str, optional): Version key of the index (see
+                `IncrementalFaissStore.version_key`); answers are cached only if it is given.
+
+        Returns:
+            Tuple[str, GenerationStats]: The answer and its generation timings.
+        """
+        with metrics.trace("query", path="faiss"):
+            answer, key = self._cached_answer(cache_scope, user_question, conversation)
+            if answer is not None:
+                return answer, GenerationStats(0, 0, cached=True)
+
+            docs = self._faiss_context(vector_store, user_question)
+            if not docs:
+                return "No matching documents found.", GenerationStats(0, 0)
+
+            with metrics.span("generate"):
+                start = time.perf_counter()
+                question = with_conversation(user_question, conversation)
+                response = self.qa_chain({"input_documents": docs, "question": question}, return_only_outputs=True)
+                duration = time.perf_counter() - start
+            self._store_answer(key, response["output_text"])
+            return response["output_text"], GenerationStats(duration, duration)
+
+    def stream_vector_store(
+        self,
+        vector_store: Any,
+        user_question: str,
+        conversation: Optional[str] = None,
+        cache_scope: Optional[str] = None,
+    ) -> Tuple[Iterator[str], GenerationStats]:
+        """
+        Answers a question from a FAISS index, streaming the answer as it is generated.
+
+        Args:
+            vector_store (FAISS): FAISS index to query.
+            user_question (str): The question (embedded and searched).
+            conversation (str, optional): Conversation context for the generation prompt only.
+            cache_scope (str, optional): Version key of the index (see
+                `IncrementalFaissStore.version_key`); answers are cached only if it is given.
+
+        Returns:
+            Tuple[Iterator[str], GenerationStats]: The answer text chunks, and the timings,
+                which are complete once the iterator is exhausted.
+        """
+        with metrics.trace("query", path="faiss"):
+            answer, key = self._cached_answer(cache_scope, user_question, conversation)
+            if answer is not None:
+                return iter([answer]), GenerationStats(0, 0, cached=True)
+
+            docs = self._faiss_context(vector_store, user_question)
+            if not docs:
+                return iter(["No matching documents found."]), GenerationStats(0, 0)
+
+            # Same prompt as the "stuff" QA chain: the documents joined by blank lines.
+            context = "\n\n".join(doc.page_content for doc in docs)
+            prompt = self.qa_prompt.format(context=context, question=with_conversation(user_question, conversation))
+            return self._stream(prompt, key)
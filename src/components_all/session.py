@@ -1,5 +1,10 @@
+import uuid
 import streamlit as st
-from typing import Dict, List, Any
+from typing import Dict, Any, Optional
+from components_all.memory import ConversationMemory
+
+# Seconds between refreshes of the background job progress.
+JOB_POLL_SECONDS = 1.0
 
 def init_session_state() -> None:
     """Initializes the chat history and other session state variables."""
@@ -12,10 +17,35 @@ def init_session_state() -> None:
         st.session_state.current_mode = "Upload and Query (FAISS)"
     if "uploaded_files" not in st.session_state:
         st.session_state.uploaded_files = []
-    if "vector_store" not in st.session_state:  # Add this line
-        st.session_state.vector_store = None
+    if "memory" not in st.session_state:
+        st.session_state.memory = {
+            mode: ConversationMemory.from_history(history)
+            for mode, history in st.session_state.chat_history.items()
+        }
+
+
+def get_memory(mode: str) -> ConversationMemory:
+    """Returns the bounded conversation memory of a mode (see `memory.ConversationMemory`)."""
+    return st.session_state.memory[mode]
 
 
+def get_namespace() -> str:
+    """
+    Returns the FAISS index namespace of this session: the `tenant` query parameter if it is
+    given, otherwise a per-session id that is kept in the URL (`ns`), so a page reload finds
+    the same index.
+    """
+    if "namespace" not in st.session_state:
+        # The index manager imports the FAISS stack, which the Milvus mode never needs.
+        from components_all.index_manager import validate_namespace
+
+        namespace = st.query_params.get("tenant") or st.query_params.get("ns")
+        if not namespace:
+            namespace = uuid.uuid4().hex
+            st.query_params["ns"] = namespace
+        st.session_state.namespace = validate_namespace(namespace)
+    return st.session_state.namespace
+
 
 def display_chat(mode: str) -> None:
     """
@@ -33,12 +63,103 @@ def display_chat(mode: str) -> None:
                 st.markdown(f"**🧑 You:**\n{chat['user']}")
             with st.chat_message("ai"):
                 st.markdown(f"**🤖 Gemini:**\n{chat['bot']}")
+                if chat.get("total") is not None:
+                    st.caption(timing_caption(chat.get("ttft"), chat["total"], chat.get("cached", False)))
+
+
+def timing_caption(ttft: Optional[float], total: float, cached: bool = False) -> str:
+    """Formats the generation timings shown under an answer."""
+    if cached:
+        return "⚡ answered from cache"
+    first = f"first token {ttft:.2f}s · " if ttft is not None else ""
+    return f"⏱️ {first}total {total:.2f}s"
+
+
+def display_trace(trace: Optional[Any]) -> None:
+    """
+    Shows the per-stage latency breakdown of a query trace in a sidebar expander.
 
+    Args:
+        trace (Optional[metrics.Trace]): The trace (see `metrics.last_trace`); nothing is
+            shown if it is None.
+    """
+    if trace is None:
+        return
+    with st.sidebar.expander("🔬 Last query breakdown"):
+        rows = [
+            {
+                "stage": span["stage"],
+                "ms": round(span["seconds"] * 1000, 1),
+                "labels": ", ".join(f"{k}={v}" for k, v in span["labels"].items() if v is not None),
+            }
+            for span in trace.spans
+        ]
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.caption(f"{trace.labels.get('path', '')} · total {trace.total * 1000:.0f} ms")
 
-def construct_prompt(user_question: str, chat_history: List[dict]) -> str:
-    """Construct a prompt that includes chat history."""
-    history_text = "\n".join(
-        [f"User: {entry['user']}\nBot: {entry['bot']}" for entry in chat_history]
-    )
-    prompt = f"{history_text}\nUser: {user_question}\nBot:"
-    return prompt
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def display_jobs(queue: Any, namespace: str) -> None:
+    """
+    Shows the background ingestion jobs of a namespace with their progress and a cancel
+    button. Only this fragment reruns while polling; when a job finishes the whole app reruns
+    once, so the document list and the index in use are refreshed.
+
+    Args:
+        queue (jobs.JobQueue): The process-wide job queue.
+        namespace (str): Namespace whose jobs are shown.
+    """
+    jobs = queue.jobs(namespace)
+    seen = st.session_state.setdefault("job_statuses", {})
+    finished_now = False
+    for job in jobs[:5]:
+        progress = job.progress()
+        files = ", ".join(progress["files"])
+        if not job.is_final:
+            st.progress(
+                progress["fraction"],
+                text=(
+                    f"{files}: {progress['phase']} · {progress['pages_parsed']} pages, "
+                    f"{progress['chunks_embedded']}/{progress['chunks_total']} chunks embedded"
+                ),
+            )
+            if st.button("Cancel", key=f"cancel-{job.id}"):
+                job.cancel()
+        elif progress["status"] == "done":
+            st.caption(f"✅ Indexed {files} in {progress['seconds']:.0f}s")
+        elif progress["status"] == "cancelled":
+            st.caption(f"⏹️ Cancelled indexing of {files}")
+        else:
+            st.caption(f"❌ Indexing {files} failed: {progress['error']}")
+        if progress["skipped"] and job.is_final:
+            st.caption(f"Skipped (not a PDF, or no text found): {', '.join(progress['skipped'])}")
+        # A job seen running in an earlier poll has just finished.
+        finished_now |= job.is_final and seen.get(job.id) in ("queued", "running")
+        seen[job.id] = progress["status"]
+    if finished_now:
+        st.rerun()
+
+
+def display_startup(report: Dict[str, Any]) -> None:
+    """
+    Shows the startup report (time to first render and the slowest imports) in a sidebar
+    expander.
+
+    Args:
+        report (Dict[str, Any]): `startup.ImportProfiler.report()`.
+    """
+    if report["first_render"] is None:
+        return
+    title = f"🚀 Startup {report['first_render']:.2f}s" + (" (over budget)" if report["over_budget"] else "")
+    with st.sidebar.expander(title):
+        for caption, key in (("Imports before the first render", "startup_imports"), ("Imported on first use", "lazy_imports")):
+            if report[key]:
+                st.caption(caption)
+                st.dataframe(
+                    [
+                        {"module": record["module"], "ms": round(record["seconds"] * 1000, 1), "from": record["importer"]}
+                        for record in report[key]
+                    ],
+                    hide_index=True,
+                    use_container_width=True,
+                )
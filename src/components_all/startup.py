@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import builtins
+import argparse
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional
+from components import metrics
+
+# Time-to-first-render budget in seconds; a slower start is reported as over budget. Unset: no cap.
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "0")) or None
+# Imports made by modules of these packages are timed (the rest are counted in their importer).
+APP_MODULES = ("__main__", "pipeline", "components", "components_all")
+
+
+def _is_app_module(name: str) -> bool:
+    return any(name == app or name.startswith(app + ".") for app in APP_MODULES)
+
+
+class ImportProfiler:
+    """
+    Times the imports made by the app's own modules, from the start of the process (or
+    `install`) to the first rendered page, including the imports made lazily by a mode
+    later on. Each record is cumulative: it includes everything the import pulled in.
+
+    Attributes:
+        started (float): `time.perf_counter()` when the profiler was created.
+        records (List[Dict[str, Any]]): {"module", "importer", "seconds", "after_render"}
+            dicts, in import order.
+        first_render (Optional[float]): Seconds from `started` to the first rendered page.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = []
+        self.first_render = None
+        self._original_import = None
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        """Starts timing imports (idempotent, as Streamlit reruns the app script)."""
+        with self._lock:
+            if self._original_import is None:
+                self._original_import = builtins.__import__
+                builtins.__import__ = self._import
+
+    def uninstall(self) -> None:
+        """Stops timing imports."""
+        with self._lock:
+            if self._original_import is not None:
+                builtins.__import__ = self._original_import
+                self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        importer = (globals or {}).get("__name__", "")
+        targets = [name] + [f"{name}.{item}" for item in fromlist or () if item != "*"]
+        new = [target for target in targets if target not in sys.modules]
+        # Cached modules, relative imports and third-party internals go straight through.
+        if level or not new or not _is_app_module(importer):
+            return original(name, globals, locals, fromlist, level)
+
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            seconds = time.perf_counter() - start
+            loaded = [target for target in new if target in sys.modules]
+            if loaded:
+                module = name if name in loaded else ", ".join(loaded)
+                with self._lock:
+                    self.records.append({
+                        "module": module,
+                        "importer": importer,
+                        "seconds": seconds,
+                        "after_render": self.first_render is not None,
+                    })
+                metrics.record("import", seconds, module=module)
+
+    def mark_rendered(self) -> Optional[float]:
+        """
+        Records the time to the first rendered page, once per process, and prints the report.
+
+        Returns:
+            Optional[float]: Seconds to the first render, or None if it was already recorded.
+        """
+        with self._lock:
+            if self.first_render is not None:
+                return None
+            self.first_render = time.perf_counter() - self.started
+        metrics.record("first_render", self.first_render)
+        print(format_report(self.report()))
+        return self.first_render
+
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        """
+        Summarizes the startup.
+
+        Args:
+            top (int, optional): Number of slowest imports listed. Defaults to 15.
+
+        Returns:
+            Dict[str, Any]: "first_render" (seconds or None), "budget" (seconds or None),
+                "over_budget", "startup_imports" (slowest imports before the first render) and
+                "lazy_imports" (imports made by a mode after it).
+        """
+        with self._lock:
+            records = list(self.records)
+        by_time = sorted(records, key=lambda record: record["seconds"], reverse=True)
+        return {
+            "first_render": self.first_render,
+            "budget": STARTUP_BUDGET_S,
+            "over_budget": bool(
+                STARTUP_BUDGET_S and self.first_render is not None and self.first_render > STARTUP_BUDGET_S
+            ),
+            "startup_imports": [record for record in by_time if not record["after_render"]][:top],
+            "lazy_imports": [record for record in by_time if record["after_render"]][:top],
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formats `ImportProfiler.report` for the console."""
+    first_render = report["first_render"]
+    lines = [f"Time to first render: {first_render:.2f}s" if first_render is not None else "Not rendered yet"]
+    if report["over_budget"]:
+        lines[0] += f" (over the {report['budget']:.2f}s budget)"
+    for title, key in (("Slowest startup imports", "startup_imports"), ("Lazy imports", "lazy_imports")):
+        if report[key]:
+            lines.append(f"{title}:")
+            lines.extend(
+                f"  {record['seconds']:7.3f}s  {record['module']}  (from {record['importer']})"
+                for record in report[key]
+            )
+    return "\n".join(lines)
+
+
+profiler = ImportProfiler()
+
+
+def _importtime(code: str) -> List[Dict[str, Any]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"Running {code!r} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            # The module name is indented by two spaces per nesting level.
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_seconds": int(self_us) / 1e6,
+            "seconds": int(cumulative_us) / 1e6,
+        })
+    return rows
+
+
+def importtime_breakdown(modules: List[str], depth: int = 1) -> List[Dict[str, Any]]:
+    """
+    Imports modules in a fresh interpreter with `-X importtime` and returns the cost of each
+    module imported up to `depth` levels below them. Modules the bare interpreter imports
+    anyway are left out.
+
+    Args:
+        modules (List[str]): Modules to import, in order (e.g. "pipeline").
+        depth (int, optional): Deepest nesting level listed (0 lists only the modules imported
+            directly). Defaults to 1.
+
+    Returns:
+        List[Dict[str, Any]]: {"module", "depth", "self_seconds", "seconds"} dicts, where
+            "seconds" is cumulative, slowest first.
+
+    Raises:
+        RuntimeError: If the import fails.
+    """
+    baseline = {row["module"] for row in _importtime("pass")}
+    rows = _importtime("; ".join(f"import {module}" for module in modules))
+    rows = [row for row in rows if row["depth"] <= depth and row["module"] not in baseline]
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Import-time breakdown of the app, to track and cap its cold start (run from src)."
+    )
+    parser.add_argument("modules", nargs="*", default=["pipeline"],
+                        help="Modules to import, e.g. 'pipeline components_all.query_engine' for the first query.")
+    parser.add_argument("--depth", type=int, default=1, help="Deepest nesting level listed.")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules listed.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S,
+                        help="Exit with status 1 when the imports take longer (seconds).")
+    args = parser.parse_args()
+
+    rows = importtime_breakdown(args.modules, args.depth)
+    total = sum(row["seconds"] for row in rows if row["depth"] == 0)
+    for row in rows[:args.top]:
+        print(f"{row['seconds']:8.3f}s {row['self_seconds']:8.3f}s  {'  ' * row['depth']}{row['module']}")
+    print(f"Total import time: {total:.3f}s")
+    if args.budget and total > args.budget:
+        print(f"Over the {args.budget:.3f}s budget.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
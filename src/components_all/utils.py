@@ -1,16 +1,16 @@
-import re
+from components.text_normalizer import strip_unsafe
 
 def clean_text(text: str) -> str:
     """
     Cleans text by encoding, decoding, and removing unwanted characters.
 
+    Removes control characters and characters outside the Basic Multilingual Plane and
+    replaces unencodable surrogates with '?', in a single `str.translate` pass.
+
     Args:
         text (str): Input text.
 
     Returns:
         str: Cleaned text.
     """
-    text = text.encode('utf-8', 'replace').decode('utf-8')
-    text = ''.join(c for c in text if ord(c) <= 0xFFFF)
-    text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
-    return text
\ No newline at end of file
+    return strip_unsafe(text)
\ No newline at end of file
@@ -1,86 +1,197 @@
 import os
 import shutil
 import streamlit as st
-from typing import Optional, List
-from langchain.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from pymilvus import connections, Collection, utility
-from components_all.llm_chain import get_conversational_chain
-from components.retriever import Retriever
-from langchain_core.prompts import load_prompt
-import time
-from dotenv import load_dotenv
-
-load_dotenv()
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, Tuple, Union
+from components_all.session import get_namespace
+from components import metrics
+
+# The FAISS and Milvus stacks (langchain, faiss, pymilvus, the Gemini clients) are imported
+# inside the functions of their mode, so the app starts without loading either and a
+# session only pays for the one it uses. Only type checkers see these imports.
+if TYPE_CHECKING:
+    from langchain.vectorstores import FAISS
+    from components_all.query_engine import GenerationStats, QueryEngine
+    from components_all.faiss_store import IncrementalFaissStore
+    from components_all.index_manager import IndexManager
+    from components_all.jobs import IngestJob, JobQueue
+    from components.embedding_scheduler import EmbeddingScheduler
+    from components.embedding_cache import EmbeddingCache
 
 # Constants
-FAISS_INDEX_DIR = "faiss_index"
 MILVUS_COLLECTION_NAME = "pdf_embeddings1"
-MILVUS_HOST = "localhost"
-MILVUS_PORT = "19530"
 EMBEDDING_MODEL_NAME = "models/embedding-001"  # Define the embedding model name
+# "auto" (by corpus size) or one of faiss_index.INDEX_TYPES: flat, hnsw, ivf_flat, ivf_pq, sq8, sqfp16
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+FAISS_NAMESPACES_DIR = "faiss_indexes"  # one index per session/tenant namespace
+FAISS_MEMORY_BUDGET_MB = int(os.getenv("FAISS_MEMORY_BUDGET_MB", "1024"))
+# Indexes of browser sessions unused for this long are deleted (tenant indexes are kept). 0: never.
+FAISS_SESSION_TTL_HOURS = float(os.getenv("FAISS_SESSION_TTL_HOURS", "168"))
+# Serve the stage latency histograms on http://0.0.0.0:METRICS_PORT/metrics when set.
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+
+@st.cache_resource
+def get_embedding_cache() -> "EmbeddingCache":
+    """Returns the process-wide embedding cache shared by the FAISS and Milvus paths."""
+    from components.embedding_cache import EmbeddingCache
+
+    return EmbeddingCache()
+
+
+@st.cache_resource
+def get_query_engine() -> "QueryEngine":
+    """
+    Returns the process-wide query engine. Streamlit keeps it alive across reruns and shares it
+    between sessions, so connections, model clients and prompts are built only once.
+    """
+    from components_all.query_engine import QueryEngine
+
+    return QueryEngine(MILVUS_COLLECTION_NAME, EMBEDDING_MODEL_NAME)
+
+
+@st.cache_resource
+def start_metrics_server() -> Optional[Any]:
+    """
+    Starts the process-wide Prometheus endpoint once if METRICS_PORT is set (Streamlit
+    reruns the script on every interaction).
+
+    Returns:
+        Optional[ThreadingHTTPServer]: The server, or None if METRICS_PORT is not set.
+    """
+    if not METRICS_PORT:
+        return None
+    return metrics.serve(int(METRICS_PORT))
 
 
 # FAISS Functions
-def create_vector_store(text_chunks: List[str]) -> FAISS:
+def get_embeddings() -> "EmbeddingScheduler":
+    """Returns the embedding client used for FAISS indexing, behind the shared cache."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from components.embedding_scheduler import EmbeddingScheduler
+
+    return EmbeddingScheduler(
+        GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME), cache=get_embedding_cache()
+    )
+
+
+@st.cache_resource
+def get_index_manager() -> "IndexManager":
+    """
+    Returns the process-wide FAISS index manager, which keeps the stores of all namespaces
+    within FAISS_MEMORY_BUDGET_MB, evicts the least recently used ones, and deletes the
+    indexes of sessions idle for FAISS_SESSION_TTL_HOURS.
     """
-    Creates a FAISS index from text chunks.
+    from components_all.index_manager import IndexManager
+
+    return IndexManager(
+        FAISS_NAMESPACES_DIR, get_embeddings, FAISS_INDEX_TYPE, FAISS_MEMORY_BUDGET_MB * 2**20,
+        session_ttl=FAISS_SESSION_TTL_HOURS * 3600 or None,
+    )
+
+
+def get_faiss_store(namespace: Optional[str] = None) -> "IncrementalFaissStore":
+    """
+    Returns the FAISS store of a namespace, opening the persisted index if it is not in memory.
+    Do not keep the result in session state: the manager may evict it between reruns.
 
     Args:
-        text_chunks (List[str]): List of text chunks.
+        namespace (str, optional): Session id or tenant name. Defaults to this session's.
 
     Returns:
-        FAISS: The created FAISS index.
+        IncrementalFaissStore: The store.
+    """
+    return get_index_manager().get(namespace or get_namespace())
 
-    Raises:
-        TypeError: If text_chunks is not a list.
-        ValueError: If text_chunks is empty.
+
+@st.cache_resource
+def get_job_queue() -> "JobQueue":
+    """
+    Returns the process-wide background ingestion queue. It outlives sessions, so an upload
+    keeps being indexed after a page reload, and its jobs are found again by namespace.
     """
-    if not isinstance(text_chunks, list):
-        raise TypeError("text_chunks must be a list.")
-    if not text_chunks:
-        raise ValueError("text_chunks cannot be empty.")
+    from components_all.jobs import JobQueue
 
-    embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME)
-    vector_store = FAISS.from_texts(text_chunks, embeddings)
-    vector_store.save_local(FAISS_INDEX_DIR)
-    return vector_store
+    return JobQueue(get_index_manager())
 
 
-def load_vector_store(index_dir: str = FAISS_INDEX_DIR) -> Optional[FAISS]:
+def submit_ingest_job(pdf_docs: List[Any]) -> Optional["IngestJob"]:
     """
-    Loads the FAISS index from disk.
+    Queues the uploads that are new or changed since they were last indexed for background
+    indexing into this session's index, and returns at once. Files that are already indexed
+    with the same contents are not parsed or embedded.
 
     Args:
-        index_dir (str, optional): Directory where the FAISS index is stored.
-            Defaults to FAISS_INDEX_DIR.
+        pdf_docs (List[Any]): Uploaded PDF files.
 
     Returns:
-        Optional[FAISS]: Loaded FAISS index, or None if it doesn't exist.
+        Optional[IngestJob]: The job (poll `IngestJob.progress`), or None if every file is
+            already indexed or queued.
+    """
+    return get_job_queue().submit(get_namespace(), pdf_docs)
 
-     Raises:
-        TypeError: If index_dir is not a string
+
+def update_vector_store(pdf_docs: List[Any]) -> int:
     """
-    if not isinstance(index_dir, str):
-        raise TypeError("index_dir must be a string")
+    Indexes the uploads that are new or changed since they were last indexed and waits for
+    the job (see `submit_ingest_job`).
 
-    if not os.path.exists(os.path.join(index_dir, "index.faiss")):
-        return None
-    embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME)
-    return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    Args:
+        pdf_docs (List[Any]): Uploaded PDF files.
 
+    Returns:
+        int: The number of files indexed.
 
+    Raises:
+        RuntimeError: If the job failed.
+    """
+    job = submit_ingest_job(pdf_docs)
+    if job is None:
+        return 0
+    job.wait()
+    if job.error:
+        raise RuntimeError(job.error)
+    return job.files_total
+
+
+def remove_from_vector_store(file_name: str) -> int:
+    """
+    Removes one file's chunks from the FAISS index and saves it.
 
-def query_vector_store(vector_store: FAISS, user_question: str) -> str:
+    Args:
+        file_name (str): Name of the indexed file.
+
+    Returns:
+        int: Number of chunks removed.
+    """
+    with get_index_manager().locked(get_namespace()) as store:
+        removed = store.remove_file(file_name)
+        store.save()
+        return removed
+
+
+def query_vector_store(
+    vector_store: "FAISS",
+    user_question: str,
+    stream: bool = False,
+    conversation: Optional[str] = None,
+    cache_scope: Optional[str] = None,
+) -> Tuple[Union[str, Iterator[str]], "GenerationStats"]:
     """
     Queries the FAISS index and retrieves an answer.
 
     Args:
         vector_store (FAISS): FAISS index to query.
         user_question (str): The query.
+        stream (bool, optional): Return the answer as an iterator of text chunks that are
+            generated as they are consumed. Defaults to False.
+        conversation (str, optional): Conversation context (see `memory.ConversationMemory`),
+            added to the generation prompt but not to the search.
+        cache_scope (str, optional): Version key of the index (`IncrementalFaissStore.version_key`);
+            answers are cached under it (per conversation) until the index changes.
 
     Returns:
-        str: The answer from the FAISS index.
+        Tuple[Union[str, Iterator[str]], GenerationStats]: The answer from the FAISS index
+            (or its stream) and the generation timings.
 
     Raises:
         TypeError: If user_question is not a string.
@@ -91,27 +202,31 @@ def query_vector_store(vector_store: FAISS, user_question: str) -> str:
     if not user_question:
         raise ValueError("user_question cannot be empty.")
     if vector_store is None:
-        return "Vector DB not found. Please upload documents first.", 0
+        from components_all.query_engine import GenerationStats
 
-    docs = vector_store.similarity_search(user_question)
-    if not docs:
-        return "No matching documents found.", 0
+        message = "Vector DB not found. Please upload documents first."
+        return (iter([message]) if stream else message), GenerationStats(0, 0)
 
-    chain = get_conversational_chain() #moved to llm_chain.py
-    start = time.time()
-    response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
-    duration = time.time() - start
-    return response["output_text"], duration
+    engine = get_query_engine()
+    if stream:
+        return engine.stream_vector_store(vector_store, user_question, conversation, cache_scope)
+    return engine.query_vector_store(vector_store, user_question, conversation, cache_scope)
 
 
-def cleanup_vector_store(index_dir: str = FAISS_INDEX_DIR) -> None:
+def cleanup_vector_store(index_dir: Optional[str] = None) -> None:
     """
     Cleans up the FAISS index files.
 
     Args:
-        index_dir (str, optional): Directory where the FAISS index is stored.
-            Defaults to FAISS_INDEX_DIR.
+        index_dir (str, optional): Directory where the FAISS index is stored. Defaults to
+            this session's namespace, which is also dropped from the index manager.
     """
+    if index_dir is None:
+        if get_index_manager().drop(get_namespace()):
+            st.success("Deleted this session's FAISS index successfully.")
+        else:
+            st.warning("This session has no FAISS index.")
+        return
     if not isinstance(index_dir, str):
         raise TypeError("index_dir must be a string.")
 
@@ -133,7 +248,10 @@ def cleanup_milvus(collection_name: str = MILVUS_COLLECTION_NAME) -> None:
     """
     if not isinstance(collection_name, str):
         raise TypeError("collection_name must be a string.")
-    connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
+    from pymilvus import connections, Collection, utility
+    from components.milvus_config import connection_args
+
+    connections.connect("default", **connection_args())
     if utility.has_collection(collection_name):
         collection = Collection(collection_name)
         collection.drop()
@@ -143,15 +261,28 @@ def cleanup_milvus(collection_name: str = MILVUS_COLLECTION_NAME) -> None:
 
 
 
-def query_milvus(query: str) -> str:
+def query_milvus(
+    query: str,
+    stream: bool = False,
+    conversation: Optional[str] = None,
+    pdfs: Optional[List[str]] = None,
+    pages: Optional[Tuple[int, int]] = None,
+) -> Tuple[Union[str, Iterator[str]], "GenerationStats"]:
     """
     Queries the Milvus collection and retrieves an answer.
 
     Args:
         query (str): The query.
+        stream (bool, optional): Return the answer as an iterator of text chunks that are
+            generated as they are consumed. Defaults to False.
+        conversation (str, optional): Conversation context (see `memory.ConversationMemory`),
+            added to the generation prompt but not to the search.
+        pdfs (List[str], optional): Only search these PDF file names.
+        pages (Tuple[int, int], optional): Only search this page range (inclusive).
 
     Returns:
-        str: The answer from the Milvus collection.
+        Tuple[Union[str, Iterator[str]], GenerationStats]: The answer from the Milvus
+            collection (or its stream) and the generation timings.
 
     Raises:
         TypeError: If query is not a string.
@@ -162,18 +293,7 @@ def query_milvus(query: str) -> str:
     if not query:
         raise ValueError("query cannot be empty.")
 
-    connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
-    collection = MILVUS_COLLECTION_NAME
-    search_params = {"metric_type": "COSINE", "params": {"nprobe": 20}}
-    embedding_model = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME)
-    r = Retriever(collection, embedding_model, search_params)
-    content, metadata = r.search(query, 20)
-    metadata_str = ", ".join([f"{k}: {v}" for k, v in metadata.items()]) if isinstance(metadata, dict) else str(metadata)
-
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3) #moved to llm_chain.py
-    system_prompt = load_prompt("template.json") #moved to llm_chain.py
-    prompt = system_prompt.invoke({'retrieved_info': content, 'query': query, 'metadata': metadata_str}) #moved to llm_chain.py
-    start = time.time()
-    result = model.invoke(prompt)
-    duration = time.time() - start
-    return result.content, duration
\ No newline at end of file
+    engine = get_query_engine()
+    if stream:
+        return engine.stream_milvus(query, 20, conversation, pdfs, pages)
+    return engine.query_milvus(query, 20, conversation, pdfs, pages)
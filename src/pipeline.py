@@ -1,12 +1,26 @@
-import streamlit as st
+from dotenv import load_dotenv
+
+# The only place the app reads .env, before any module reads its settings from the environment.
+load_dotenv()
+
+# Started next, so the import report covers every app import after it.
+from components_all.startup import profiler
+profiler.install()
 
-from components_all.ingestion import ingest_pdf_data
+import streamlit as st
 
-from components_all.processing import process_text_data
+# Light on purpose: the FAISS and Milvus stacks are imported when their mode is first used.
+from components_all.vector_store import (
+    cleanup_vector_store, get_faiss_store, get_index_manager, get_job_queue, get_query_engine, query_milvus, query_vector_store,
+    remove_from_vector_store, start_metrics_server, submit_ingest_job,
+)
 
-from components_all.vector_store import *
+from components_all.session import (
+    init_session_state, display_chat, display_jobs, display_startup, display_trace, get_memory, get_namespace,
+    timing_caption,
+)
 
-from components_all.session import construct_prompt, init_session_state, display_chat
+from components import metrics
  
 # Constants for modes
 MODE_FAISS = "Upload and Query (FAISS)"
@@ -23,6 +37,7 @@ def main():
  
     init_session_state()
     st.session_state.current_mode = mode
+    start_metrics_server()
  
     # Display the subheaders at the top, based on the selected mode
     if mode == MODE_FAISS:
@@ -43,54 +58,130 @@ def main():
  
         if st.sidebar.button("Process and Save to FAISS"):
             if pdf_docs:
-                try:
-                    with st.spinner("Processing PDFs..."):
-                        raw_text = ingest_pdf_data(pdf_docs)  # Stage 1: Ingestion
-                        text_chunks = process_text_data(raw_text)  # Stage 2: Processing
-                        vector_store = create_vector_store(
-                            text_chunks
-                        )  # Stage 3: Vector Store Creation
-                        st.session_state.vector_store = (
-                            vector_store
-                        )  # Store for later queries
-                        st.success("Documents processed and saved to FAISS!")
-                except Exception as e:
-                    st.error(f"An error occurred during processing: {e}")
-                    # No return, allow user to try again.
+                # Only new or changed files are parsed and embedded, in the background: the
+                # chat keeps answering from the current index until the new one is swapped in.
+                job = submit_ingest_job(pdf_docs)
+                if job is not None:
+                    # Seen as unfinished, so the app reruns once it is done, however fast.
+                    st.session_state.setdefault("job_statuses", {})[job.id] = "queued"
+                    st.sidebar.success(f"Indexing {job.files_total} new or changed document(s) in the background.")
+                else:
+                    st.sidebar.info("All uploaded documents are already indexed or being indexed.")
             else:
                 st.sidebar.warning("Please upload at least one PDF.")
 
+        queue = get_job_queue()
+        if queue.jobs(get_namespace()):
+            with st.sidebar:
+                display_jobs(queue, get_namespace())
+
         
  
+        store = get_faiss_store()
+        indexed_files = sorted(store.files)
+        memory = get_index_manager().memory(get_namespace())
+        st.sidebar.caption(
+            f"Index namespace `{get_namespace()}`: {memory['resident_bytes'] / 2**20:.1f} MiB resident, "
+            f"{memory['mapped_bytes'] / 2**20:.1f} MiB mapped"
+        )
+        if indexed_files:
+            file_to_remove = st.sidebar.selectbox("Indexed documents", indexed_files)
+            if st.sidebar.button("🗑️ Remove from FAISS"):
+                with st.spinner(f"Removing {file_to_remove}..."):
+                    remove_from_vector_store(file_to_remove)
+                    st.rerun()
+
         if st.sidebar.button("🧹 Clean Up FAISS Index"):
             with st.spinner("Deleting FAISS index..."):
                 cleanup_vector_store()  # Stage 5: Cleanup
-                st.session_state.pop(
-                    "vector_store", None
-                )  # Remove from session state
                 st.rerun()
 
  
+    pdf_filter, page_filter = None, None
+    if mode == MODE_MILVUS:
+        # Per-book searches only touch the partitions of the selected documents.
+        names = st.sidebar.text_input("Only search these PDFs (comma-separated file names)")
+        pdf_filter = [name.strip() for name in names.split(",") if name.strip()] or None
+        pages = st.sidebar.text_input("Only search pages (e.g. 10-25)")
+        if pages.strip():
+            try:
+                first, _, last = pages.partition("-")
+                first, last = int(first), int(last or first)
+                if first < 1 or first > last:
+                    raise ValueError(pages)
+                page_filter = (first, last)
+            except ValueError:
+                st.sidebar.warning("Pages must look like 10-25 or 12, from page 1, first page before the last.")
+
     if st.sidebar.button("🧼 Reset Chat"):
         st.session_state.chat_history[mode] = []
+        get_memory(mode).clear()
         st.success("Chat history cleared.")
         st.rerun()
     
+    stream_answers = st.sidebar.checkbox("Stream answers", value=True)
+    if st.session_state.chat_history[mode]:
+        # The query engine exists once a question was answered; don't connect just for stats.
+        cache = get_query_engine().cache_stats()
+        st.sidebar.caption(
+            f"Cache hit rate: query embeddings {cache['query_embeddings']['hit_rate']:.0%}, "
+            f"answers {cache['answers']['hit_rate']:.0%}"
+        )
+
     user_question = st.chat_input("Ask something...")
     if user_question:
-        with st.spinner("Thinking..."):
-            chat_history = st.session_state.chat_history[mode]
-            prompt = construct_prompt(user_question, chat_history)
-            
-            if mode == MODE_FAISS:
-                vector_store = st.session_state['vector_store']
-                answer, duration = query_vector_store(vector_store, prompt)
-            elif mode == MODE_MILVUS:
-                answer, duration = query_milvus(prompt)
-            
-            # Update chat history
-            st.session_state.chat_history[mode].append({"user": user_question, "bot": answer})
-        display_chat(mode)
+        chat_history = st.session_state.chat_history[mode]
+        # Only the question (or a follow-up with its antecedent) is embedded and searched;
+        # the bounded conversation context goes to the generation prompt.
+        memory = get_memory(mode)
+        query = memory.retrieval_query(user_question)
+        conversation = memory.conversation()
+        if stream_answers:
+            # Show the conversation so far, then render the answer while it is generated.
+            display_chat(mode)
+            with st.chat_message("user"):
+                st.markdown(f"**🧑 You:**\n{user_question}")
+            with st.chat_message("ai"):
+                st.markdown("**🤖 Gemini:**")
+                with st.spinner("Searching..."):
+                    if mode == MODE_FAISS:
+                        store = get_faiss_store()
+                        stream, stats = query_vector_store(
+                            store.vector_store, query, stream=True, conversation=conversation,
+                            cache_scope=store.version_key,
+                        )
+                    elif mode == MODE_MILVUS:
+                        stream, stats = query_milvus(
+                            query, stream=True, conversation=conversation, pdfs=pdf_filter, pages=page_filter
+                        )
+                answer = st.write_stream(stream)
+                st.caption(timing_caption(stats.ttft, stats.total, stats.cached))
+            chat_history.append(
+                {"user": user_question, "bot": answer, "ttft": stats.ttft, "total": stats.total, "cached": stats.cached}
+            )
+            memory.add(user_question, answer)
+        else:
+            with st.spinner("Thinking..."):
+                if mode == MODE_FAISS:
+                    # Fetched from the index manager on every use (warm-started from disk, and
+                    # never pinned in session state, so it can be evicted under memory pressure).
+                    store = get_faiss_store()
+                    answer, stats = query_vector_store(
+                        store.vector_store, query, conversation=conversation, cache_scope=store.version_key
+                    )
+                elif mode == MODE_MILVUS:
+                    answer, stats = query_milvus(query, conversation=conversation, pdfs=pdf_filter, pages=page_filter)
+
+                # Update chat history
+                chat_history.append(
+                    {"user": user_question, "bot": answer, "ttft": stats.ttft, "total": stats.total, "cached": stats.cached}
+                )
+                memory.add(user_question, answer)
+            display_chat(mode)
+        st.session_state.last_trace = metrics.last_trace("query")
+    display_trace(st.session_state.get("last_trace"))
+    profiler.mark_rendered()
+    display_startup(profiler.report())
 
  
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The app imports `components.x` from src, while the ingestion modules import each other
+# flat from src/components (they are run as scripts from there), so both are on the path.
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path[:0] = [os.path.abspath(SRC), os.path.abspath(os.path.join(SRC, "components"))]
+
+
+@pytest.fixture(autouse=True)
+def index_version_dir(tmp_path, monkeypatch):
+    # Version counters default to src/index_versions; tests keep them out of the checkout.
+    directory = tmp_path / "index_versions"
+    monkeypatch.setenv("INDEX_VERSION_DIR", str(directory))
+    return directory
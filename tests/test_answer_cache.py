@@ -0,0 +1,76 @@
+import os
+import threading
+import multiprocessing
+from components.index_version import bump_version, current_version
+from components_all.query_cache import SemanticAnswerCache
+
+VECTOR = [1.0, 0.0, 0.0]
+NEAR = [0.99, 0.05, 0.0]
+
+
+def test_similar_questions_share_an_answer():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("docs", 1, VECTOR, "answer")
+
+    assert cache.lookup("docs", 1, NEAR) == "answer"
+    assert cache.lookup("docs", 1, [0.0, 1.0, 0.0]) is None
+
+
+def test_answers_only_match_their_conversation():
+    cache = SemanticAnswerCache()
+    cache.store("docs", 1, VECTOR, "first turn", context=None)
+    cache.store("docs", 1, VECTOR, "in conversation a", context="a")
+
+    assert cache.lookup("docs", 1, VECTOR) == "first turn"
+    assert cache.lookup("docs", 1, VECTOR, context="a") == "in conversation a"
+    assert cache.lookup("docs", 1, VECTOR, context="b") is None
+
+
+def test_newer_version_drops_the_scope():
+    cache = SemanticAnswerCache()
+    cache.store("docs", 1, VECTOR, "old")
+
+    assert cache.lookup("docs", 2, VECTOR) is None
+    assert cache.invalidations == 1
+
+
+def test_stale_writes_and_lookups_keep_the_newer_scope():
+    cache = SemanticAnswerCache()
+    cache.store("docs", 2, VECTOR, "new")
+
+    cache.store("docs", 1, NEAR, "generated before the change")
+    assert cache.lookup("docs", 1, VECTOR) is None
+    assert cache.lookup("docs", 2, NEAR) == "new"
+    assert cache.invalidations == 0
+    assert cache.stats()["entries"] == 1
+
+
+def _bump(directory, count):
+    for _ in range(count):
+        bump_version("collection", directory)
+
+
+def test_concurrent_bumps_are_not_lost(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_bump, args=(str(tmp_path), 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert current_version("collection", str(tmp_path)) == 100
+    assert current_version("other", str(tmp_path)) == 0
+
+
+def test_threads_share_counters_through_their_own_connections(tmp_path):
+    directory = str(tmp_path)
+    assert current_version("collection", directory) == 0
+    assert not os.path.exists(os.path.join(directory, "versions.sqlite"))
+
+    workers = [threading.Thread(target=_bump, args=(directory, 10)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+
+    assert current_version("collection", directory) == 40
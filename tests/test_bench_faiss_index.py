@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from fakes import FakeEmbeddings
+from components_all.bench_faiss_index import load_vectors
+from components_all.faiss_index import recall_report
+from components_all.faiss_store import IncrementalFaissStore
+
+
+def saved_store(directory, index_type):
+    embeddings = FakeEmbeddings(dim=8)
+    store = IncrementalFaissStore.load(str(directory), embeddings, index_type)
+    texts = [f"chunk {i}" for i in range(40)]
+    store.add_chunks([{"chunk_text": text, "pdf": "a.pdf", "page": 1} for text in texts], {"a.pdf": "a"})
+    store.save()
+    return embeddings.embed_documents(texts)
+
+
+def test_benches_a_saved_store(tmp_path):
+    vectors = saved_store(tmp_path, "flat")
+
+    loaded = load_vectors(str(tmp_path))
+
+    assert np.allclose(loaded, np.asarray(vectors, dtype=np.float32))
+    rows = recall_report(loaded, loaded[:5], ["flat"], k=3)
+    assert rows[0]["recall"] == 1.0
+
+
+def test_rejects_indexes_that_do_not_store_exact_vectors(tmp_path):
+    saved_store(tmp_path, "hnsw")
+
+    with pytest.raises(ValueError, match="hnsw"):
+        load_vectors(str(tmp_path))
@@ -0,0 +1,37 @@
+import pytest
+from components.retriever import embed_queries
+
+
+class TaskTypeModel:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts, task_type=None):
+        self.calls.append((list(texts), task_type))
+        return [[float(len(text))] for text in texts]
+
+
+class PlainModel:
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class BrokenModel:
+    def embed_documents(self, texts, task_type=None):
+        raise TypeError("bug inside the model")
+
+
+def test_models_with_task_type_embed_queries_as_queries():
+    model = TaskTypeModel()
+
+    assert embed_queries(model, ["a", "bb", "ccc"], batch_size=2) == [[1.0], [2.0], [3.0]]
+    assert model.calls == [(["a", "bb"], "retrieval_query"), (["ccc"], "retrieval_query")]
+
+
+def test_other_models_embed_queries_as_documents():
+    assert embed_queries(PlainModel(), ["a", "bb"]) == [[1.0], [2.0]]
+
+
+def test_errors_inside_the_model_are_not_swallowed():
+    with pytest.raises(TypeError, match="bug inside the model"):
+        embed_queries(BrokenModel(), ["a"])
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import numpy as np
+from embedding_cache import EmbeddingCache
+from fakes import FakeEmbeddings
+
+
+def vectors_for(texts, dim=8):
+    return FakeEmbeddings(dim=dim).embed_documents(texts)
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=10)
+    texts = ["a", "b", "c"]
+    cache.put_many("model", texts, vectors_for(texts))
+
+    found = cache.get_many("model", ["a", "x", "c"])
+
+    assert np.allclose(found[0], vectors_for(["a"])[0]) and np.allclose(found[2], vectors_for(["c"])[0])
+    assert found[1] is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_models_with_different_dimensions_share_a_directory(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=10)
+    cache.put_many("small", ["a"], vectors_for(["a"], dim=4))
+    cache.put_many("large", ["a"], vectors_for(["a"], dim=16))
+
+    assert len(cache.get_many("small", ["a"])[0]) == 4
+    assert len(cache.get_many("large", ["a"])[0]) == 16
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".f32")]) == 2
+
+
+def test_dimension_change_drops_the_old_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=10)
+    cache.put_many("model", ["a", "b"], vectors_for(["a", "b"], dim=4))
+    cache.put_many("model", ["c"], vectors_for(["c"], dim=6))
+
+    assert cache.get_many("model", ["a", "b"]) == [None, None]
+    assert len(cache.get_many("model", ["c"])[0]) == 6
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=3)
+    cache.put_many("model", ["a", "b", "c"], vectors_for(["a", "b", "c"]))
+    cache.get_many("model", ["a"])
+    cache.put_many("model", ["d"], vectors_for(["d"]))
+
+    assert cache.get_many("model", ["b"]) == [None]
+    assert all(v is not None for v in cache.get_many("model", ["a", "c", "d"]))
+
+
+def test_reopening_with_a_smaller_cap_shrinks_the_file(tmp_path):
+    texts = [str(i) for i in range(10)]
+    cache = EmbeddingCache(str(tmp_path), max_entries=10)
+    cache.put_many("model", texts, vectors_for(texts))
+    cache.close()
+
+    cache = EmbeddingCache(str(tmp_path), max_entries=4)
+    (path,) = [os.path.join(tmp_path, name) for name in os.listdir(tmp_path) if name.endswith(".f32")]
+
+    assert os.path.getsize(path) == 4 * 8 * 4
+    assert cache.stats()["entries"] == 4
+    assert sum(v is not None for v in cache.get_many("model", texts)) == 4
+
+
+def _fill(directory, worker, count, queue):
+    cache = EmbeddingCache(directory, max_entries=64)
+    texts = [f"worker {worker} text {i}" for i in range(count)]
+    for i in range(0, count, 5):
+        cache.put_many("model", texts[i:i + 5], vectors_for(texts[i:i + 5]))
+    # Re-read everything this process wrote: a slot taken over by another process shows up
+    # as a wrong vector.
+    wrong = sum(
+        found is not None and not np.allclose(found, expected)
+        for found, expected in zip(cache.get_many("model", texts), vectors_for(texts))
+    )
+    queue.put(wrong)
+
+
+def test_processes_sharing_the_cache_never_share_a_slot(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    workers = [context.Process(target=_fill, args=(str(tmp_path), w, 40, queue)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    wrong = [queue.get(timeout=120) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    assert wrong == [0, 0, 0, 0]
+    assert EmbeddingCache(str(tmp_path), max_entries=64).stats()["entries"] == 64
@@ -0,0 +1,183 @@
+import threading
+import pytest
+from embedding_scheduler import EmbeddingError, EmbeddingScheduler, TokenBucket, is_retryable
+from fakes import FakeEmbeddings, FakeRateLimitError
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """Fails the first `failures` requests with `error`, then behaves like FakeEmbeddings."""
+
+    def __init__(self, failures, error=FakeRateLimitError, **kwargs):
+        super().__init__(dim=8, **kwargs)
+        self.failures = failures
+        self.flaky_error = error
+
+    def embed_documents(self, texts):
+        with self._lock:
+            fail = self.failures > 0
+            self.failures -= fail
+        if fail:
+            raise self.flaky_error()
+        return super().embed_documents(texts)
+
+
+class ConcurrencyProbe(FakeEmbeddings):
+    """Records the largest number of requests running at the same time."""
+
+    def __init__(self, **kwargs):
+        super().__init__(dim=8, latency=0.02, **kwargs)
+        self.running = 0
+        self.peak = 0
+        self._probe_lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._probe_lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            return super().embed_documents(texts)
+        finally:
+            with self._probe_lock:
+                self.running -= 1
+
+
+class SkipBatch(FakeEmbeddings):
+    """Fails every request containing `bad` with a non-retryable error."""
+
+    def __init__(self, bad):
+        super().__init__(dim=8)
+        self.bad = bad
+
+    def embed_documents(self, texts):
+        if self.bad in texts:
+            raise ValueError("invalid input")
+        return super().embed_documents(texts)
+
+
+def texts(n):
+    return [f"chunk {i}" for i in range(n)]
+
+
+def test_batches_texts_and_keeps_input_order():
+    model = FakeEmbeddings(dim=8)
+    scheduler = EmbeddingScheduler(model, batch_size=10, max_in_flight=3, sleep=lambda _: None)
+
+    vectors = scheduler.embed_documents(texts(95))
+
+    assert model.calls == 10
+    assert scheduler.stats["requests"] == 10
+    assert vectors == FakeEmbeddings(dim=8).embed_documents(texts(95))
+
+
+def test_on_batch_receives_every_text_once():
+    scheduler = EmbeddingScheduler(FakeEmbeddings(dim=8), batch_size=7, sleep=lambda _: None)
+    seen = []
+
+    scheduler.embed_documents(texts(30), on_batch=lambda indexes, vectors: seen.extend(indexes))
+
+    assert sorted(seen) == list(range(30))
+
+
+def test_empty_input_makes_no_request():
+    model = FakeEmbeddings(dim=8)
+
+    assert EmbeddingScheduler(model).embed_documents([]) == []
+    assert model.calls == 0
+
+
+def test_retries_transient_errors_with_bounded_backoff():
+    delays = []
+    model = FlakyEmbeddings(failures=3)
+    scheduler = EmbeddingScheduler(
+        model, batch_size=100, max_retries=5, base_delay=0.5, max_delay=1.5, sleep=delays.append
+    )
+
+    vectors = scheduler.embed_documents(texts(5))
+
+    assert len(vectors) == 5 and all(vectors)
+    assert scheduler.stats["retries"] == 3
+    assert scheduler.stats["requests"] == 4
+    # Full jitter: each delay is drawn below min(max_delay, base_delay * 2 ** attempt).
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(1.5, 0.5 * 2 ** attempt)
+
+
+def test_non_retryable_errors_are_not_retried():
+    delays = []
+    scheduler = EmbeddingScheduler(
+        FlakyEmbeddings(failures=1, error=lambda: ValueError("bad request")), sleep=delays.append
+    )
+
+    with pytest.raises(EmbeddingError):
+        scheduler.embed_documents(texts(3))
+    assert scheduler.stats["retries"] == 0
+    assert delays == []
+
+
+class ApiError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (FakeRateLimitError(), True),
+    (ApiError("Service is unavailable", code=503), True),
+    (TimeoutError(), True),
+    (ApiError("Request payload is 5003 bytes, max 500 tokens", code=400), False),
+    (ValueError("document 503 is empty"), False),
+    (RuntimeError("Read timed out"), True),
+    (RuntimeError("Rate limit reached, retry later"), True),
+])
+def test_classifies_errors_by_status_not_by_numbers_in_the_message(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_gives_up_after_max_retries():
+    scheduler = EmbeddingScheduler(FlakyEmbeddings(failures=100), max_retries=2, sleep=lambda _: None)
+
+    with pytest.raises(EmbeddingError):
+        scheduler.embed_documents(texts(3))
+    assert scheduler.stats["requests"] == 3
+    assert scheduler.stats["failed_batches"] == 1
+
+
+def test_limits_requests_in_flight():
+    model = ConcurrencyProbe()
+    scheduler = EmbeddingScheduler(model, batch_size=1, max_in_flight=3, sleep=lambda _: None)
+
+    scheduler.embed_documents(texts(12))
+
+    assert model.peak == 3
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_refills():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+
+    # Two tokens are available at once; each further request waits half a second for a refill.
+    assert slept == [0.5, 0.5]
+
+
+def test_failure_reports_completed_and_failed_texts():
+    batch_texts = texts(9)
+    scheduler = EmbeddingScheduler(SkipBatch(bad="chunk 4"), batch_size=3, sleep=lambda _: None)
+    delivered = []
+
+    with pytest.raises(EmbeddingError) as excinfo:
+        scheduler.embed_documents(batch_texts, on_batch=lambda indexes, vectors: delivered.extend(indexes))
+
+    error = excinfo.value
+    assert error.failed == [3, 4, 5]
+    assert sorted(error.completed) == [0, 1, 2, 6, 7, 8]
+    assert sorted(delivered) == [0, 1, 2, 6, 7, 8]
+    assert "3 of 9 texts" in str(error)
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+import uuid
+from fakes import FakeEmbeddings
+from components_all import index_manager
+from components_all.index_manager import IndexManager
+
+
+def chunks(name, count=3):
+    return [{"chunk_text": f"{name} chunk {i}", "pdf": name, "page": 1} for i in range(count)]
+
+
+def manager(root, **kwargs):
+    return IndexManager(str(root), lambda: FakeEmbeddings(dim=8), "flat", **kwargs)
+
+
+def index(manager, namespace, name="a.pdf"):
+    with manager.locked(namespace) as store:
+        store.add_chunks(chunks(name), {name: name})
+        store.save()
+
+
+def test_drop_waits_for_a_change_in_progress(tmp_path):
+    indexes = manager(tmp_path)
+    namespace = uuid.uuid4().hex
+    index(indexes, namespace)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def change():
+        with indexes.locked(namespace) as store:
+            holding.set()
+            release.wait(5)
+            store.add_chunks(chunks("b.pdf"), {"b.pdf": "b"})
+            store.save()
+
+    worker = threading.Thread(target=change)
+    worker.start()
+    holding.wait(5)
+    dropper = threading.Thread(target=indexes.drop, args=(namespace,))
+    dropper.start()
+    time.sleep(0.1)
+    assert dropper.is_alive()
+
+    release.set()
+    worker.join(5)
+    dropper.join(5)
+    assert not os.path.exists(indexes.index_dir(namespace))
+
+
+def test_expires_idle_session_namespaces_only(tmp_path):
+    indexes = manager(tmp_path, session_ttl=3600)
+    idle, active, tenant = uuid.uuid4().hex, uuid.uuid4().hex, "library"
+    for namespace in (idle, active, tenant):
+        index(indexes, namespace)
+    old = time.time() - 7200
+    for namespace in (idle, tenant):
+        os.utime(indexes.index_dir(namespace), (old, old))
+    indexes.evict(idle)
+    indexes._last_used.pop(idle)
+
+    assert indexes.expire_idle(force=True) == [idle]
+    assert not os.path.exists(indexes.index_dir(idle))
+    assert os.path.exists(indexes.index_dir(active))
+    assert os.path.exists(indexes.index_dir(tenant))
+
+
+def test_namespaces_never_expire_without_a_ttl(tmp_path):
+    indexes = manager(tmp_path)
+    namespace = uuid.uuid4().hex
+    index(indexes, namespace)
+    old = time.time() - 10 ** 6
+    os.utime(indexes.index_dir(namespace), (old, old))
+
+    assert indexes.expire_idle(force=True) == []
+
+
+def test_saves_switch_a_pointer_and_keep_the_previous_version(tmp_path):
+    indexes = manager(tmp_path)
+    namespace = uuid.uuid4().hex
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        index(indexes, namespace, name)
+    index_dir = indexes.index_dir(namespace)
+
+    versions = sorted(name for name in os.listdir(index_dir) if name.startswith("v"))
+    with open(os.path.join(index_dir, "CURRENT"), encoding="utf-8") as f:
+        assert f.read() == versions[-1]
+    # The current version and the one before it, for readers that just resolved the pointer.
+    assert len(versions) == 2
+
+
+def test_get_reopens_a_store_saved_by_another_process(tmp_path):
+    namespace = uuid.uuid4().hex
+    serving, other = manager(tmp_path), manager(tmp_path)
+    index(serving, namespace, "a.pdf")
+    before = serving.get(namespace)
+
+    index(other, namespace, "b.pdf")
+    after = serving.get(namespace)
+
+    assert after is not before
+    assert sorted(after.files) == ["a.pdf", "b.pdf"]
+    assert after.vector_store.index.ntotal == 6
+
+
+def test_a_slow_load_does_not_block_other_namespaces(tmp_path, monkeypatch):
+    indexes = manager(tmp_path)
+    slow, fast = uuid.uuid4().hex, uuid.uuid4().hex
+    loading = threading.Event()
+    release = threading.Event()
+    load = index_manager.IncrementalFaissStore.load
+
+    def slow_load(index_dir, *args):
+        if index_dir == indexes.index_dir(slow):
+            loading.set()
+            release.wait(5)
+        return load(index_dir, *args)
+
+    monkeypatch.setattr(index_manager.IncrementalFaissStore, "load", slow_load)
+    worker = threading.Thread(target=indexes.get, args=(slow,))
+    worker.start()
+    loading.wait(5)
+    try:
+        started = time.time()
+        indexes.get(fast)
+        assert time.time() - started < 1
+        assert worker.is_alive()
+    finally:
+        release.set()
+        worker.join(5)
+
+
+def test_memory_is_estimated_on_changes_not_on_every_use(tmp_path, monkeypatch):
+    indexes = manager(tmp_path)
+    namespace = uuid.uuid4().hex
+    index(indexes, namespace)
+    calls = []
+    estimate = index_manager.estimate_memory
+    monkeypatch.setattr(index_manager, "estimate_memory", lambda store: calls.append(store) or estimate(store))
+
+    for _ in range(3):
+        indexes.get(namespace)
+    assert calls == []
+
+    index(indexes, namespace, "b.pdf")
+    assert calls
+    assert indexes.usage()[0]["resident_bytes"] > 0
+
+
+def test_budget_counts_resident_memory_only(tmp_path):
+    indexes = manager(tmp_path)
+    first, second = uuid.uuid4().hex, uuid.uuid4().hex
+    index(indexes, first)
+    index(indexes, second)
+    resident = sum(row["resident_bytes"] for row in indexes.usage())
+    indexes._memory[first]["mapped_bytes"] = 10 * resident
+
+    indexes.budget_bytes = resident
+    indexes.enforce_budget()
+    assert indexes.evictions == 0
+
+    indexes.budget_bytes = resident - 1
+    indexes.enforce_budget(keep=second)
+    assert indexes.evictions == 1
+    assert [row["namespace"] for row in indexes.usage()] == [second]
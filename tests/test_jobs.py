@@ -0,0 +1,32 @@
+import fitz
+from fakes import FakeEmbeddings
+from components_all.index_manager import IndexManager
+from components_all.jobs import DONE, JobQueue, UploadedPdf
+
+
+def pdf(name, text=None):
+    document = fitz.open()
+    page = document.new_page()
+    if text:
+        page.insert_text((72, 72), text)
+    return UploadedPdf(name, document.tobytes())
+
+
+def test_only_files_with_chunks_are_recorded(tmp_path):
+    indexes = IndexManager(str(tmp_path), lambda: FakeEmbeddings(dim=8), "flat")
+    queue = JobQueue(indexes, workers=1)
+    try:
+        uploads = [pdf("a.pdf", "lorem ipsum dolor sit amet"), UploadedPdf("b.txt", b"notes"), pdf("scan.pdf")]
+        job = queue.submit("library", uploads)
+        assert job.wait(30)
+
+        assert job.status == DONE
+        assert sorted(job.progress()["skipped"]) == ["b.txt", "scan.pdf"]
+        assert sorted(indexes.get("library").files) == ["a.pdf"]
+        # Skipped files are not taken for indexed when they are uploaded again.
+        retry = queue.submit("library", uploads)
+        assert retry is not None
+        assert sorted(retry.fingerprints) == ["b.txt", "scan.pdf"]
+        assert retry.wait(30)
+    finally:
+        queue.shutdown()
@@ -0,0 +1,79 @@
+import os
+import pytest
+from fakes import FakeChatModel, FakeEmbeddings
+from components_all.query_engine import GenerationStats, QueryEngine, stream_text
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+ANSWER = "Streaming keeps the first words of the answer quick to arrive."
+
+
+class StubRetriever:
+    """Returns fixed chunks instead of searching Milvus."""
+
+    alias = None
+
+    def search(self, query, k, pdfs=None, pages=None):
+        return ["Chunks are embedded in batches.", "Answers are streamed."], [{"page": 1, "pdf": "a.pdf"}] * 2
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    def build(**delays):
+        # The prompt template is read from the working directory, as in the app.
+        monkeypatch.chdir(SRC)
+        engine = QueryEngine(
+            "test_collection", "fake", chat_model=FakeChatModel(response=ANSWER, **delays),
+            embeddings=FakeEmbeddings(dim=16),
+        )
+        engine._retriever = StubRetriever()
+        engine._connected = True
+        return engine
+
+    return build
+
+
+def test_stream_text_yields_chunks_in_order():
+    model = FakeChatModel(response=ANSWER)
+    stats = GenerationStats()
+
+    chunks = list(stream_text(model.stream("question"), stats))
+
+    # langchain may close the stream with an empty chunk.
+    words = ANSWER.split(" ")
+    assert [chunk for chunk in chunks if chunk] == [word + " " for word in words[:-1]] + words[-1:]
+    assert stats.chunks == len(chunks)
+
+
+def test_stream_text_records_time_to_first_token():
+    model = FakeChatModel(response=ANSWER, first_token_delay=0.05, token_delay=0.01)
+    stats = GenerationStats()
+    chunks = stream_text(model.stream("question"), stats)
+
+    # Nothing is timed until the stream is consumed.
+    assert stats.ttft is None
+    next(chunks)
+    assert stats.ttft >= 0.05 and stats.total is None
+    list(chunks)
+    assert stats.total >= stats.ttft + 0.01 * (len(ANSWER.split(" ")) - 1)
+
+
+def test_streamed_answer_matches_blocking_answer(engine):
+    blocking, blocking_stats = engine().query_milvus("How are answers delivered?")
+    chunks, stats = engine(first_token_delay=0.02).stream_milvus("How are answers delivered?")
+
+    streamed = list(chunks)
+    assert "".join(streamed) == blocking == ANSWER
+    assert len(streamed) > 1
+    assert stats.ttft >= 0.02 and stats.total >= stats.ttft
+    assert not stats.cached and not blocking_stats.cached
+
+
+def test_streamed_answer_is_cached_once_complete(engine):
+    engine = engine()
+    chunks, _ = engine.stream_milvus("How are answers delivered?")
+    list(chunks)
+
+    chunks, stats = engine.stream_milvus("How are answers delivered?")
+
+    assert stats.cached
+    assert "".join(chunks) == ANSWER
@@ -0,0 +1,48 @@
+import pytest
+from bench_normalizer import legacy_faiss_clean, legacy_milvus_clean
+from text_normalizer import normalize_page, strip_unsafe
+
+SAMPLES = [
+    "",
+    "plain text",
+    "  leading and trailing  ",
+    "repeated   spaces\t\ttabs\n\nnewlines\r\n and  no-break em spaces",
+    "   \n\t  ",
+    "special-characters: next, to (spaces)!",
+    "a - b -- c ; d",
+    "quotes 'single' and \"double\" stay. Dots too...",
+    "emoji\U0001F600next to text \U0001F4DA and math \U0001D400",
+    "control\x00chars\x07in\x1bthe\x7fmiddle\x85and\x9fend\x1f",
+    "lone \ud800 high and \udfff low surrogates",
+    "surrogate\udc80next to text",
+    "accents café naïve über, CJK 中文, Greek αβ",
+    "underscore_words and digits 123 4.56",
+    "hyphen-\nated line break and ligature ﬁ",
+    "​zero width​ space ﻿BOM",
+    "mixed \t\x00 \U0001F600 \ud800 - 'end'.",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_normalize_page_matches_legacy_milvus_cleaning(text):
+    assert normalize_page(text) == legacy_milvus_clean(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_strip_unsafe_matches_legacy_faiss_cleaning(text):
+    assert strip_unsafe(text) == legacy_faiss_clean(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_cleaning_is_idempotent(text):
+    assert normalize_page(normalize_page(text)) == normalize_page(text)
+    assert strip_unsafe(strip_unsafe(text)) == strip_unsafe(text)
+
+
+def test_code_point_blocks_match_legacy():
+    # One string per block of code points, covering the control ranges, the surrogates and
+    # the first characters above U+FFFF.
+    for start in (0x0, 0x80, 0x2000, 0xD7F0, 0xD800, 0xDBF0, 0xDC00, 0xDFF0, 0xFFF0, 0x10000, 0x1F600):
+        text = " x".join(chr(code) for code in range(start, start + 0x40))
+        assert normalize_page(text) == legacy_milvus_clean(text)
+        assert strip_unsafe(text) == legacy_faiss_clean(text)